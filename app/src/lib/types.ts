@@ -30,6 +30,7 @@ export type SegmentMeta = {
 }
 
 export type RingSegment = {
+    kind?: 'segment' | 'label' | 'genomad'
     start: number
     end: number
     text: string
@@ -247,7 +248,8 @@ export enum TaskStatus {
     STARTED = "STARTED",
     SUCCESS = "SUCCESS",
     FAILURE = "FAILURE",
-    PROCESSING = "PROCESSING"
+    PROCESSING = "PROCESSING",
+    PROGRESS = "PROGRESS"
 }
 
 /*  ================
@@ -285,6 +287,13 @@ export type BlastRingSchema = {
     min_evalue: number
 } & RingSchema
 
+export type BlastRingBatchSchema = {
+    genome_ids: string[]
+    blast_method: BlastMethod
+    min_identity: number
+    min_alignment: number
+    min_evalue: number
+} & RingSchema
 
 export type GenomadRingSchema = {
     window_size: number
@@ -363,6 +372,29 @@ export type CreateRingResponse = {
     task_id: string
 } & ErrorResponse
 
+export type CreateRingBatchResponse = {
+    task_id: string
+    group_id: string
+} & ErrorResponse
+
+export type TaskProgressResponse = {
+    task_id: string
+    status: TaskStatus
+    progress: { [key: string]: number } | null
+} & ErrorResponse
+
+export type TaskGroupStatusResponse = {
+    group_id: string
+    status: TaskStatus
+    total: number
+    completed: number
+} & ErrorResponse
+
+export type BlastRingBatch = {
+    rings: BlastRing[]
+    errors: string[]
+}
+
 export enum TaskResultType {
     SESSION = 'SESSION',
     SESSION_FILE = 'SESSION_FILE',
@@ -370,13 +402,14 @@ export enum TaskResultType {
     ANNOTATION_RING = 'ANNOTATION_RING',
     LABEL_RING = 'LABEL_RING',
     REFERENCE_RING = 'REFERENCE_RING',
-    GENOMAD_RING = 'GENOMAD_RING'
+    GENOMAD_RING = 'GENOMAD_RING',
+    BLAST_RING_BATCH = 'BLAST_RING_BATCH'
 }
 
 export type TaskStatusResponse = {
     status: TaskStatus
     task_id: string
-    result: Session | SessionFile | BlastRing | AnnotationRing | LabelRing
+    result: Session | SessionFile | BlastRing | AnnotationRing | LabelRing | BlastRingBatch
     result_type: TaskResultType 
 } & ErrorResponse
 
@@ -9,7 +9,7 @@ export const load: PageServerLoad = async ({ depends }) => {
 
     depends("app:landing")
 
-    const response = await fetch(`${env.PRIVATE_DOCKER_API_URL}/sessions/default`);
+    const response = await fetch(`${env.PRIVATE_DOCKER_API_URL}/sessions/default?segments=true`);
 
     try {
         const sessionResponseData: SessionResponse = await response.json();
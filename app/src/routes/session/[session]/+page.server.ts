@@ -14,7 +14,7 @@ export const load: PageServerLoad = async ({ depends, params }) => {
         throw error(400, 'Invalid URL');
     }
 
-    const response = await fetch(`${env.PRIVATE_DOCKER_API_URL}/sessions/${params.session}`);
+    const response = await fetch(`${env.PRIVATE_DOCKER_API_URL}/sessions/${params.session}?segments=true`);
 
     try {
         const sessionResponseData: SessionResponse = await response.json();
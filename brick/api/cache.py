@@ -0,0 +1,363 @@
+import os
+import uuid
+import fcntl
+import shutil
+import hashlib
+import logging
+import contextlib
+
+from pathlib import Path
+from typing import Callable, Generator, List, Tuple
+
+from .core.config import settings
+from ..utils import FastaIndex, read_fasta_sequence_bytes
+
+
+def hash_file(file_path: Path, chunk_size: int = 8 * 1024**2) -> str:
+    """SHA-256 hex digest of the file contents"""
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_file_hash_file(file_path: Path) -> Path:
+    """Path of the hash file next to a file (<file>.sha256)"""
+    return file_path.with_name(f"{file_path.name}.sha256")
+
+
+def get_file_hash(file_path: Path) -> str:
+    """
+    SHA-256 hex digest of the file contents, stored next to the file so that
+    session files are hashed once unless they are modified
+    """
+
+    hash_file_path = get_file_hash_file(file_path)
+    try:
+        if hash_file_path.stat().st_mtime >= file_path.stat().st_mtime:
+            digest = hash_file_path.read_text().strip()
+            if is_sha256_digest(digest):
+                return digest
+    except FileNotFoundError:
+        pass
+
+    # Hash files are replaced atomically so that concurrent readers never read
+    # an empty or partial digest, which would key different files to one entry
+    digest = hash_file(file_path)
+    tmp_file_path = hash_file_path.with_name(
+        f".{hash_file_path.name}.{uuid.uuid4().hex}"
+    )
+    try:
+        tmp_file_path.write_text(digest)
+        os.replace(tmp_file_path, hash_file_path)
+    except OSError:
+        logging.warning(f"Could not store file hash: {hash_file_path}")
+        tmp_file_path.unlink(missing_ok=True)
+    return digest
+
+
+def is_sha256_digest(digest: str) -> bool:
+    return len(digest) == 64 and all(c in "0123456789abcdef" for c in digest)
+
+
+def get_directory_size(directory: Path) -> int:
+    """Total size of the files in a directory in bytes"""
+    return sum(file.stat().st_size for file in directory.glob("**/*") if file.is_file())
+
+
+@contextlib.contextmanager
+def file_lock(lock_file: Path, operation: int) -> Generator[bool, None, None]:
+    """
+    Advisory lock on a file shared between processes (`fcntl.flock`), yields
+    whether the lock was acquired which is always the case unless the operation
+    is non-blocking (`fcntl.LOCK_NB`). Lock files may be removed by the holder
+    of an exclusive lock, the lock is then acquired on the new lock file
+    """
+
+    while True:
+        with lock_file.open("a") as lock:
+            try:
+                fcntl.flock(lock, operation)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                if is_open_file(lock, lock_file):
+                    yield True
+                    return
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def is_open_file(file, file_path: Path) -> bool:
+    """Whether an open file is the file at the path (not removed or replaced)"""
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        return False
+    open_stat = os.fstat(file.fileno())
+    return (stat.st_dev, stat.st_ino) == (open_stat.st_dev, open_stat.st_ino)
+
+
+class ContentCache:
+    """
+    Content-addressed cache of files derived from an input file, entries are keyed
+    by the SHA-256 of the input file contents so that identical files uploaded to
+    different sessions (or rehydrated sessions) share an entry.
+
+    Entries are built once across processes: builders hold an exclusive lock on the
+    entry and build into a temporary directory that is renamed into place, users of
+    an entry hold a shared lock for as long as they read from it. Least recently
+    used entries that are not in use are evicted when the cache exceeds its size,
+    or when the disk of the cache is used above the high watermark (fraction of the
+    disk) until its usage is below the low watermark. The cache only grows when
+    entries are built, so that eviction runs after builds and not after each use.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_size_mb: float,
+        disk_watermarks: Tuple[float, float] | None = None,
+    ):
+        self.directory = directory
+        self.max_size_mb = max_size_mb
+        self.disk_watermarks = disk_watermarks
+
+    def get_entry_directory(self, key: str) -> Path:
+        return self.directory / key
+
+    def get_lock_file(self, key: str) -> Path:
+        return self.directory / f"{key}.lock"
+
+    @contextlib.contextmanager
+    def entry(
+        self, file_path: Path, build: Callable[[Path, Path], None]
+    ) -> Generator[Path, None, None]:
+        """
+        Entry directory for the contents of a file, the entry is built with
+        `build(file_path, entry_directory)` if it does not exist
+
+        :param file_path: Path to the input file of the entry
+        :param build: Function writing the derived files into a directory
+        :return: Path to the entry directory, valid within the context
+        """
+
+        with self.keyed_entry(
+            key=get_file_hash(file_path),
+            build=lambda entry_directory: build(file_path, entry_directory),
+        ) as entry_directory:
+            yield entry_directory
+
+    @contextlib.contextmanager
+    def keyed_entry(
+        self, key: str, build: Callable[[Path], None]
+    ) -> Generator[Path, None, None]:
+        """
+        Entry directory for a key derived from file contents (e.g. hashes of
+        multiple input files), the entry is built with `build(entry_directory)`
+        if it does not exist
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        entry_directory = self.get_entry_directory(key)
+        lock_file = self.get_lock_file(key)
+
+        built = False
+        if not entry_directory.exists():
+            with file_lock(lock_file, fcntl.LOCK_EX):
+                if not entry_directory.exists():
+                    self.build_entry(entry_directory, build)
+                    built = True
+
+        with file_lock(lock_file, fcntl.LOCK_SH):
+            if not entry_directory.exists():
+                # evicted before the shared lock was acquired
+                self.build_entry(entry_directory, build)
+                built = True
+
+            os.utime(entry_directory)  # last use for eviction
+            yield entry_directory
+
+        if built:
+            self.evict()
+
+    @contextlib.contextmanager
+    def lookup(self, key: str) -> Generator[Path | None, None, None]:
+        """Entry directory for a key if it exists, None otherwise"""
+
+        if not self.get_entry_directory(key).exists():
+            yield None
+            return
+
+        entry_directory = self.get_entry_directory(key)
+        with file_lock(self.get_lock_file(key), fcntl.LOCK_SH):
+            if not entry_directory.exists():
+                yield None  # evicted before the shared lock was acquired
+                return
+
+            os.utime(entry_directory)
+            yield entry_directory
+
+    def build_entry(self, entry_directory: Path, build: Callable[[Path], None]):
+        build_directory = self.directory / f"{entry_directory.name}.{uuid.uuid4()}.tmp"
+        build_directory.mkdir()
+        try:
+            build(build_directory)
+            os.rename(build_directory, entry_directory)
+        except OSError:
+            if not entry_directory.exists():
+                raise
+        finally:
+            shutil.rmtree(build_directory, ignore_errors=True)
+
+    def get_entries(self) -> List[Tuple[Path, float, int]]:
+        """Entry directories with time of last use and size in bytes, least recently used first"""
+
+        entries = []
+        for path in self.directory.iterdir():
+            if path.is_dir() and not path.name.endswith(".tmp"):
+                try:
+                    entries.append(
+                        (path, path.stat().st_mtime, get_directory_size(path))
+                    )
+                except FileNotFoundError:
+                    continue  # evicted by another process
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def get_excess_size(self, cache_size: int) -> int:
+        """Bytes to evict for the cache size and the disk watermarks"""
+
+        excess = cache_size - self.max_size_mb * 1024**2
+        if self.disk_watermarks is not None:
+            low, high = self.disk_watermarks
+            disk = shutil.disk_usage(self.directory)
+            if disk.used > high * disk.total:
+                excess = max(excess, disk.used - low * disk.total)
+        return excess
+
+    def evict(self) -> int:
+        """
+        Removes least recently used entries that are not in use until the cache
+        is within its size and the disk watermarks, returns the number of
+        removed entries
+        """
+
+        if not self.directory.exists():
+            return 0
+
+        removed = 0
+        with file_lock(
+            self.directory / "evict.lock", fcntl.LOCK_EX | fcntl.LOCK_NB
+        ) as acquired:
+            if not acquired:
+                return 0  # another process is evicting
+
+            entries = self.get_entries()
+            excess = self.get_excess_size(sum(size for _, _, size in entries))
+            for entry_directory, _, size in entries:
+                if excess <= 0:
+                    break
+                lock_file = self.get_lock_file(entry_directory.name)
+                with file_lock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB) as acquired:
+                    if not acquired:
+                        continue  # in use or being built
+                    shutil.rmtree(entry_directory, ignore_errors=True)
+                    lock_file.unlink(missing_ok=True)
+                    logging.info(f"Evicted cache entry: {entry_directory}")
+                    excess -= size
+                    removed += 1
+
+        return removed
+
+
+def get_cache_disk_watermarks() -> Tuple[float, float]:
+    return settings.CACHE_DISK_LOW_WATERMARK, settings.CACHE_DISK_HIGH_WATERMARK
+
+
+def get_blast_database_cache() -> ContentCache:
+    """Cache of BLAST databases built from reference files in the working directory"""
+    return ContentCache(
+        directory=settings.WORK_DIRECTORY / "cache" / "blastdb",
+        max_size_mb=settings.BLAST_DATABASE_CACHE_MB,
+        disk_watermarks=get_cache_disk_watermarks(),
+    )
+
+
+def get_blast_hits_cache() -> ContentCache:
+    """Cache of unfiltered BLAST hits of genome and reference files in the working directory"""
+    return ContentCache(
+        directory=settings.WORK_DIRECTORY / "cache" / "blasthits",
+        max_size_mb=settings.BLAST_HITS_CACHE_MB,
+        disk_watermarks=get_cache_disk_watermarks(),
+    )
+
+
+def get_genomad_cache() -> ContentCache:
+    """Cache of unfiltered geNomad outputs of sequences in the working directory"""
+    return ContentCache(
+        directory=settings.WORK_DIRECTORY / "cache" / "genomad",
+        max_size_mb=settings.GENOMAD_CACHE_MB,
+        disk_watermarks=get_cache_disk_watermarks(),
+    )
+
+
+def get_blast_hits_key(
+    reference_fasta: Path, query_fasta: Path, sequence_id: str | None = None
+) -> str:
+    """
+    Cache key of the hits of a query genome against a reference genome, or
+    against a single sequence of the reference genome
+    """
+
+    key = f"{get_file_hash(reference_fasta)}_{get_file_hash(query_fasta)}"
+    if sequence_id:
+        key += f"_{hashlib.sha256(sequence_id.encode()).hexdigest()}"
+    return key
+
+
+def get_sequence_hash(
+    fasta_file: Path, seq_id: str, chunk_size: int = 8 * 1024**2
+) -> str:
+    """
+    SHA-256 hex digest of the bases of a sequence in a FASTA file, identical
+    sequences in different files or with different identifiers share the digest.
+    Bases are hashed in chunks read from the index next to the file if available
+    so that the sequence is not held in memory.
+    """
+
+    digest = hashlib.sha256()
+    if FastaIndex.available(fasta_file):
+        with FastaIndex(fasta_file) as fasta:
+            if seq_id in fasta:
+                for start in range(0, fasta.length(seq_id), chunk_size):
+                    digest.update(
+                        fasta.fetch_bytes(seq_id, start=start, end=start + chunk_size)
+                    )
+                return digest.hexdigest()
+    else:
+        for sequence_id, bases in read_fasta_sequence_bytes(fasta_file, [seq_id]):
+            if sequence_id == seq_id:
+                digest.update(bases)
+                return digest.hexdigest()
+
+    raise ValueError(f"Sequences not found in FASTA file: {seq_id}")
+
+
+def get_genomad_key(
+    sequence_hash: str, window_size: int, version: str, flags: List[str]
+) -> str:
+    """
+    Cache key of the geNomad output of the windows of a reference sequence, score
+    thresholds are not part of the key as they are applied to the cached output
+
+    :param sequence_hash: Digest of the bases of the sequence (`get_sequence_hash`)
+    :param version: Versions of geNomad and its database
+    :param flags: Command line flags of geNomad that change its outputs
+    """
+
+    components = [sequence_hash, str(window_size), version]
+    return hashlib.sha256("\t".join(components + flags).encode()).hexdigest()
@@ -14,9 +14,12 @@ class ApiClient:
         self.base_url = base_url
         self.client = httpx.AsyncClient()
 
-    async def get_session_ids(self):
+    async def get_session_ids(self, before: datetime | None = None):
         try:
-            response = await self.client.get(f"{self.base_url}/sessions/identifiers")
+            response = await self.client.get(
+                f"{self.base_url}/sessions/identifiers",
+                params={} if before is None else {"before": before.isoformat()},
+            )
             if response.status_code == 200:
                 return response.json()
             else:
@@ -58,12 +61,14 @@ class ApiClient:
 
 
 async def fetch_sessions_generator(
-    api_client: ApiClient, logger: logging.Logger | None = None
+    api_client: ApiClient,
+    logger: logging.Logger | None = None,
+    before: datetime | None = None,
 ) -> AsyncGenerator[Session, None]:
     if logger:
         logger.info(f"Requesting session identifiers from API")
 
-    session_ids = await api_client.get_session_ids()
+    session_ids = await api_client.get_session_ids(before=before)
 
     if logger:
         logger.info(f"Obtained {len(session_ids)} session identifiers from API")
@@ -81,7 +86,10 @@ async def check_and_delete_expired_sessions(
     current_datetime = datetime.now()
     expiration_datetime = current_datetime - timedelta(days=expire_days)
 
-    async for session in fetch_sessions_generator(api_client=api_client, logger=logger):
+    # Only sessions created before the expiration date are requested
+    async for session in fetch_sessions_generator(
+        api_client=api_client, logger=logger, before=expiration_datetime
+    ):
         session_date = datetime.fromisoformat(session.date)
         if session_date < expiration_datetime:
             if logger:
@@ -1,4 +1,7 @@
+import logging
+
 from celery import Celery
+from celery.signals import worker_init
 from .config import settings
 
 celery_app = Celery(
@@ -35,3 +38,14 @@ celery_app.conf.task_annotations = {
         "rate_limit": "100/m"
     },  # Less strict, runs with minimal resources
 }
+
+
+@worker_init.connect
+def ensure_database_indexes(**_):
+    from .db import ensure_indexes  # database clients are configured from settings
+
+    try:
+        ensure_indexes()
+    except Exception as e:
+        # Sessions are still queried without indexes (collection scans)
+        logging.error(f"Failed to create database indexes: {str(e)}")
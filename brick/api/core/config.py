@@ -21,6 +21,9 @@ class Settings(BaseSettings):
     API_PREFIX: str = "/api"
     DEBUG_MODE: bool = False
 
+    # Admin endpoints (database index usage) are not served unless enabled
+    ADMIN_ENDPOINTS: bool = False
+
     # Secret key for instance
     SECRET_KEY: str = "CURRENTLY_NOT_USED"
 
@@ -28,6 +31,31 @@ class Settings(BaseSettings):
     WORK_DIRECTORY: Path = Path(f"/tmp/brick-work")
     WORK_DISK_SPACE_GB: float = 5
 
+    # Content-addressed caches in the working directory
+    BLAST_DATABASE_CACHE_MB: float = 2000
+    BLAST_HITS_CACHE_MB: float = 1000
+    GENOMAD_CACHE_MB: float = 1000
+
+    # Cache entries are evicted when the disk is used above the high watermark
+    # until its usage is below the low watermark (fractions of the disk)
+    CACHE_DISK_LOW_WATERMARK: float = 0.8
+    CACHE_DISK_HIGH_WATERMARK: float = 0.9
+
+    # Reference sequences up to this length are aligned with `blastn -subject`
+    BLAST_SUBJECT_MAX_LENGTH: int = 1_000_000
+
+    # Query genomes from this length are aligned in overlapping slices across workers
+    BLAST_QUERY_CHUNK_MIN_LENGTH: int = 20_000_000
+    BLAST_QUERY_CHUNK_SIZE: int = 5_000_000
+    BLAST_QUERY_CHUNK_OVERLAP: int = 10_000
+
+    # Alignments parsed per chunk of the `blastn` output stream
+    BLAST_STREAM_CHUNK_SIZE: int = 10_000
+
+    # Genomes per batch of BLAST rings and per multiplexed BLAST run in a batch
+    BLAST_BATCH_MAX_GENOMES: int = 100
+    BLAST_BATCH_GENOMES_PER_TASK: int = 10
+
     # Session directory limits
     SESSION_MAX_SIZE_MB: int = 200
     SESSION_MAX_FILES: int = 10000
@@ -49,11 +77,21 @@ class Settings(BaseSettings):
     MONGODB_PASSWORD: str = ""
     MONGODB_DATABASE: str = "brick"
     MONGODB_SESSION_COLLECTION: str = "sessions"
+    MONGODB_SEGMENT_COLLECTION: str = "segments"
+
+    # Segments of rings are stored outside of the session documents in chunks
+    # of segments so that documents stay well below the BSON document limit
+    RING_SEGMENT_CHUNK_SIZE: int = 10_000
 
     # Local database in the database:/data volume
     GENOMAD_DATABASE: Path = Path("/data/genomad_db")
     GENOMAD_SPLITS_ARG: int | None = None
 
+    # Windows of long reference sequences are split into shards for geNomad across
+    # workers, one shard for each minimum length up to the workers available
+    GENOMAD_SHARD_MIN_LENGTH: int = 1_000_000
+    GENOMAD_SHARD_WORKERS: int = 4
+
     class ConfigDict:
         case_sensitive = True
 
@@ -147,5 +185,33 @@ async def lifespan(_: FastAPI):
     DEFAULT_SESSIONS["default"] = read_default_session(
         path=Path("default.json")  # /app in container
     )
+
+    # database clients are configured from settings
+    from .db import migrate_segment_kinds
+    from .db import migrate_ring_segments, migrate_segment_bounds, ensure_indexes_motor
+
+    try:
+        await ensure_indexes_motor()
+    except Exception as e:
+        # Sessions are still queried without indexes (collection scans)
+        logging.error(f"Failed to create database indexes: {str(e)}")
+
+    try:
+        await migrate_segment_kinds()
+    except Exception as e:
+        # Sessions with untagged segments are still validated on load
+        logging.error(f"Failed to migrate session segment kinds: {str(e)}")
+
+    try:
+        await migrate_ring_segments()
+    except Exception as e:
+        # Segments stored in sessions are still read from the sessions
+        logging.error(f"Failed to migrate ring segments of sessions: {str(e)}")
+
+    try:
+        await migrate_segment_bounds()
+    except Exception as e:
+        # Chunks without bounds are still read by windowed segment queries
+        logging.error(f"Failed to migrate segment chunk bounds: {str(e)}")
     yield
     DEFAULT_SESSIONS.clear()
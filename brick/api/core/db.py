@@ -1,7 +1,9 @@
 import motor.motor_asyncio
 import logging
+import uuid
 
-from pymongo import MongoClient
+from typing import Dict, List
+from pymongo import MongoClient, IndexModel, ASCENDING
 from .config import settings
 
 # Client for use in FastAPI endpoints (async)
@@ -27,3 +29,455 @@ async def get_session_collection_motor():
 def get_session_collection_pymongo():
     db = client[settings.MONGODB_DATABASE]
     return db[settings.MONGODB_SESSION_COLLECTION]
+
+
+async def get_segment_collection_motor():
+    db = async_client[settings.MONGODB_DATABASE]
+    return db[settings.MONGODB_SEGMENT_COLLECTION]
+
+
+def get_segment_collection_pymongo():
+    db = client[settings.MONGODB_DATABASE]
+    return db[settings.MONGODB_SEGMENT_COLLECTION]
+
+
+# Segments of rings are stored in a separate collection in documents of at most
+# `RING_SEGMENT_CHUNK_SIZE` segments keyed by session and ring identifier, ring
+# metadata is stored in the session documents and segments are assembled into
+# rings only when they are requested
+#
+# Chunks are written under a generation that is set on the ring in the session
+# document (`generation`) only after all chunks are written, so that segments
+# are replaced by a single update of the session: readers only read chunks of
+# the generation of the ring and chunks of the replaced generation are deleted
+# after the update. Rings stored before generations were introduced have no
+# generation and read chunks without generation.
+#
+# Chunks hold the lowest lower and highest upper coordinate of their segments
+# (`start_min`, `end_max`) so that windowed queries read only the chunks that
+# overlap the window.
+
+SESSION_METADATA_PROJECTION = {"_id": 0, "rings.data": 0}
+
+
+def new_segment_generation() -> str:
+    return uuid.uuid4().hex
+
+
+def chunk_ring_segments(
+    session_id: str,
+    ring_id: str,
+    segments: List[dict],
+    generation: str | None = None,
+    first_chunk: int = 0,
+) -> List[dict]:
+    """Segment chunk documents of a ring in the order of its segments"""
+
+    chunk_size = settings.RING_SEGMENT_CHUNK_SIZE
+    return [
+        {
+            "session_id": session_id,
+            "ring_id": ring_id,
+            "generation": generation,
+            "chunk": first_chunk + i // chunk_size,
+            **get_segment_bounds(segments[i : i + chunk_size]),
+            "data": segments[i : i + chunk_size],
+        }
+        for i in range(0, len(segments), chunk_size)
+    ]
+
+
+def get_segment_bounds(segments: List[dict]) -> dict:
+    """Lowest lower and highest upper coordinate of segments (may be reversed)"""
+    return {
+        "start_min": min(min(s["start"], s["end"]) for s in segments),
+        "end_max": max(max(s["start"], s["end"]) for s in segments),
+    }
+
+
+def group_ring_segments(chunks: List[dict]) -> Dict[str, List[dict]]:
+    """Segments of rings from their chunk documents sorted by ring and chunk"""
+
+    segments = {}
+    for chunk in chunks:
+        segments.setdefault(chunk["ring_id"], []).extend(chunk["data"])
+    return segments
+
+
+def get_ring_generations(rings: List[dict]) -> Dict[str, str | None]:
+    """Generations of the stored segments of rings by ring identifier"""
+    return {ring["id"]: ring.get("generation") for ring in rings}
+
+
+def get_ring_segment_filter(session_id: str, ring_ids: List[str] | None) -> dict:
+    if ring_ids is None:
+        return {"session_id": session_id}
+    return {"session_id": session_id, "ring_id": {"$in": ring_ids}}
+
+
+def get_ring_generation_filter(
+    session_id: str, generations: Dict[str, str | None]
+) -> dict:
+    """Chunks of the given generation of each ring (`generation: None` matches missing)"""
+
+    if not generations:
+        return get_ring_segment_filter(session_id, ring_ids=[])
+    return {
+        "session_id": session_id,
+        "$or": [
+            {"ring_id": ring_id, "generation": generation}
+            for ring_id, generation in generations.items()
+        ],
+    }
+
+
+LEGACY_CHUNK_FILTER = {"start_min": {"$exists": False}}
+
+
+def get_ring_window_filter(start: int, end: int) -> dict:
+    """Chunks with segments that may overlap the half-open window [start, end)"""
+    return {
+        "$or": [
+            {"start_min": {"$lt": end}, "end_max": {"$gte": start}},
+            LEGACY_CHUNK_FILTER,  # chunks are read until they are bounded
+        ]
+    }
+
+
+RING_SEGMENT_SORT = [("ring_id", 1), ("chunk", 1)]
+
+
+def store_ring_segments(session_id: str, ring_id: str, segments: List[dict]) -> str:
+    """
+    Stores the segments of a ring under a new generation and returns the generation,
+    segments are read once the generation is set on the ring in the session
+    """
+
+    generation = new_segment_generation()
+    chunks = chunk_ring_segments(session_id, ring_id, segments, generation)
+    if chunks:
+        get_segment_collection_pymongo().insert_many(chunks)
+    return generation
+
+
+def append_ring_segments(
+    session_id: str, ring_id: str, generation: str | None, segments: List[dict]
+) -> None:
+    """
+    Appends segments to the stored segments of a ring with atomic updates: segments
+    are pushed into the last chunk (sorted by start) if it has room for them, else
+    they are stored in new chunks after the last chunk
+    """
+
+    if not segments:
+        return
+
+    collection = get_segment_collection_pymongo()
+    chunk_size = settings.RING_SEGMENT_CHUNK_SIZE
+    bounds = get_segment_bounds(segments)
+
+    last_chunk = collection.find_one(
+        {"session_id": session_id, "ring_id": ring_id, "generation": generation},
+        {"chunk": 1},
+        sort=[("chunk", -1)],
+    )
+    if last_chunk is not None and len(segments) <= chunk_size:
+        # Chunk has room if it has no segment at the last index that fits
+        result = collection.update_one(
+            {
+                "_id": last_chunk["_id"],
+                f"data.{chunk_size - len(segments)}": {"$exists": False},
+            },
+            {
+                "$push": {"data": {"$each": segments, "$sort": {"start": 1}}},
+                "$min": {"start_min": bounds["start_min"]},
+                "$max": {"end_max": bounds["end_max"]},
+            },
+        )
+        if result.modified_count:
+            return
+
+    first_chunk = 0 if last_chunk is None else last_chunk["chunk"] + 1
+    collection.insert_many(
+        chunk_ring_segments(session_id, ring_id, segments, generation, first_chunk)
+    )
+
+
+def load_ring_segments(
+    session_id: str, generations: Dict[str, str | None]
+) -> Dict[str, List[dict]]:
+    """Stored segments of rings of a session by their identifier and generation"""
+
+    collection = get_segment_collection_pymongo()
+    return group_ring_segments(
+        collection.find(
+            get_ring_generation_filter(session_id, generations), {"_id": 0}
+        ).sort(RING_SEGMENT_SORT)
+    )
+
+
+def delete_ring_segment_generations(
+    session_id: str, generations: Dict[str, str | None]
+) -> None:
+    """Deletes the chunks of the given generation of each ring"""
+
+    if generations:
+        get_segment_collection_pymongo().delete_many(
+            get_ring_generation_filter(session_id, generations)
+        )
+
+
+async def store_ring_segments_motor(
+    session_id: str, ring_id: str, segments: List[dict]
+) -> str:
+    generation = new_segment_generation()
+    chunks = chunk_ring_segments(session_id, ring_id, segments, generation)
+    if chunks:
+        collection = await get_segment_collection_motor()
+        await collection.insert_many(chunks)
+    return generation
+
+
+async def load_ring_segments_motor(
+    session_id: str,
+    generations: Dict[str, str | None],
+    start: int | None = None,
+    end: int | None = None,
+) -> Dict[str, List[dict]]:
+    """Stored segments of rings, only of chunks overlapping the window if given"""
+
+    query = get_ring_generation_filter(session_id, generations)
+    if start is not None and end is not None:
+        query = {"$and": [query, get_ring_window_filter(start, end)]}
+
+    collection = await get_segment_collection_motor()
+    cursor = collection.find(query, {"_id": 0}).sort(RING_SEGMENT_SORT)
+    return group_ring_segments([chunk async for chunk in cursor])
+
+
+async def count_ring_segments_motor(
+    session_id: str, ring_id: str, generation: str | None, before_chunk: int
+) -> int:
+    """Number of segments in the chunks of a ring before a chunk (chunks may be partial)"""
+
+    collection = await get_segment_collection_motor()
+    cursor = collection.aggregate(
+        [
+            {
+                "$match": {
+                    "session_id": session_id,
+                    "ring_id": ring_id,
+                    "generation": generation,
+                    "chunk": {"$lt": before_chunk},
+                }
+            },
+            {"$group": {"_id": None, "count": {"$sum": {"$size": "$data"}}}},
+        ]
+    )
+    result = await cursor.to_list(length=1)
+    return result[0]["count"] if result else 0
+
+
+async def delete_ring_segment_generations_motor(
+    session_id: str, generations: Dict[str, str | None]
+) -> None:
+    if generations:
+        collection = await get_segment_collection_motor()
+        await collection.delete_many(
+            get_ring_generation_filter(session_id, generations)
+        )
+
+
+async def delete_ring_segments_motor(
+    session_id: str, ring_ids: List[str] | None = None
+) -> None:
+    """Deletes the chunks of all generations of the rings of a session"""
+
+    collection = await get_segment_collection_motor()
+    await collection.delete_many(get_ring_segment_filter(session_id, ring_ids))
+
+
+# Segments stored before the `kind` tag was introduced are tagged from
+# their subclass specific fields in a single server-side pipeline update
+LEGACY_SEGMENT_FILTER = {
+    "rings": {"$elemMatch": {"data": {"$elemMatch": {"kind": {"$exists": False}}}}}
+}
+
+
+def _has_field(path: str) -> dict:
+    return {"$ne": [{"$type": path}, "missing"]}
+
+
+LEGACY_SEGMENT_KIND = {
+    "$switch": {
+        "branches": [
+            {"case": _has_field("$$segment.textSize"), "then": "label"},
+            {"case": _has_field("$$segment.plasmid"), "then": "genomad"},
+        ],
+        "default": "segment",
+    }
+}
+
+LEGACY_SEGMENT_DATA = {
+    "$map": {
+        "input": {"$ifNull": ["$$ring.data", []]},
+        "as": "segment",
+        # existing kind takes precedence
+        "in": {"$mergeObjects": [{"kind": LEGACY_SEGMENT_KIND}, "$$segment"]},
+    }
+}
+
+LEGACY_SEGMENT_KIND_PIPELINE = [
+    {
+        "$set": {
+            "rings": {
+                "$map": {
+                    "input": "$rings",
+                    "as": "ring",
+                    "in": {"$mergeObjects": ["$$ring", {"data": LEGACY_SEGMENT_DATA}]},
+                }
+            }
+        }
+    }
+]
+
+
+async def migrate_segment_kinds() -> int:
+    collection = await get_session_collection_motor()
+    result = await collection.update_many(
+        LEGACY_SEGMENT_FILTER, LEGACY_SEGMENT_KIND_PIPELINE
+    )
+    if result.modified_count:
+        logging.info(f"Tagged segment kinds in {result.modified_count} sessions")
+    return result.modified_count
+
+
+# Segments of rings stored in the session documents before the segment store
+# was introduced are moved into the segment store session by session
+
+LEGACY_RING_SEGMENT_FILTER = {"rings": {"$elemMatch": {"data.0": {"$exists": True}}}}
+
+
+async def migrate_ring_segments() -> int:
+    collection = await get_session_collection_motor()
+
+    migrated = 0
+    async for session in collection.find(
+        LEGACY_RING_SEGMENT_FILTER,
+        {"_id": 0, "id": 1, "rings.id": 1, "rings.generation": 1, "rings.data": 1},
+    ):
+        for ring in session["rings"]:
+            if ring.get("data"):
+                generation = await store_ring_segments_motor(
+                    session_id=session["id"], ring_id=ring["id"], segments=ring["data"]
+                )
+                # Segments are moved with the generation in a single update
+                await collection.update_one(
+                    {"id": session["id"], "rings.id": ring["id"]},
+                    {
+                        "$set": {"rings.$.generation": generation},
+                        "$unset": {"rings.$.data": ""},
+                    },
+                )
+                await delete_ring_segment_generations_motor(
+                    session_id=session["id"],
+                    generations={ring["id"]: ring.get("generation")},
+                )
+        migrated += 1
+
+    if migrated:
+        logging.info(f"Moved ring segments of {migrated} sessions to segment store")
+    return migrated
+
+
+# Chunks stored before their bounds were introduced are bounded from their
+# segments in a single server-side pipeline update
+
+
+def _segment_bound(accumulator: str, bound: str) -> dict:
+    return {
+        accumulator: {
+            "$map": {
+                "input": "$data",
+                "as": "segment",
+                "in": {bound: ["$$segment.start", "$$segment.end"]},
+            }
+        }
+    }
+
+
+LEGACY_CHUNK_BOUNDS_PIPELINE = [
+    {
+        "$set": {
+            "start_min": _segment_bound("$min", "$min"),
+            "end_max": _segment_bound("$max", "$max"),
+        }
+    }
+]
+
+
+async def migrate_segment_bounds() -> int:
+    collection = await get_segment_collection_motor()
+    result = await collection.update_many(
+        LEGACY_CHUNK_FILTER, LEGACY_CHUNK_BOUNDS_PIPELINE
+    )
+    if result.modified_count:
+        logging.info(f"Set segment bounds of {result.modified_count} chunks")
+    return result.modified_count
+
+
+# Indexes of the session and segment collections are created on startup of the API
+# and of the workers, creating an index that exists is a no-op so that processes
+# can bootstrap the indexes concurrently
+
+SESSION_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id", unique=True),
+    IndexModel([("rings.id", ASCENDING)], name="rings_id"),
+    IndexModel([("date", ASCENDING)], name="date"),
+]
+
+SEGMENT_INDEXES = [
+    IndexModel(
+        [("session_id", ASCENDING), ("ring_id", ASCENDING), ("chunk", ASCENDING)],
+        name="session_ring_chunk",
+    ),
+    IndexModel(
+        [
+            ("session_id", ASCENDING),
+            ("ring_id", ASCENDING),
+            ("generation", ASCENDING),
+            ("start_min", ASCENDING),
+            ("end_max", ASCENDING),
+        ],
+        name="session_ring_window",
+    ),
+]
+
+
+def ensure_indexes() -> List[str]:
+    """Creates the session and segment collection indexes, returns their names"""
+
+    return get_session_collection_pymongo().create_indexes(
+        SESSION_INDEXES
+    ) + get_segment_collection_pymongo().create_indexes(SEGMENT_INDEXES)
+
+
+async def ensure_indexes_motor() -> List[str]:
+    session_collection = await get_session_collection_motor()
+    segment_collection = await get_segment_collection_motor()
+    return await session_collection.create_indexes(
+        SESSION_INDEXES
+    ) + await segment_collection.create_indexes(SEGMENT_INDEXES)
+
+
+async def get_index_stats_motor() -> List[dict]:
+    """Usage of the indexes of the session and segment collections (`$indexStats`)"""
+
+    stats = []
+    for collection in (
+        await get_session_collection_motor(),
+        await get_segment_collection_motor(),
+    ):
+        async for index in collection.aggregate([{"$indexStats": {}}]):
+            stats.append({"collection": collection.name, **index})
+    return stats
@@ -0,0 +1,68 @@
+from typing import List
+
+from .db import SESSION_METADATA_PROJECTION
+from ..schemas import Session, SessionFile, RingHeader
+
+# Partial loaders of session documents read only the fields of a session that
+# are returned, with the narrowest projection for their use, so that reads do
+# not grow with the files and rings of a session. Loaders take the session
+# collection (`get_session_collection_motor`) and return None if the session
+# does not exist
+
+RING_HEADER_PROJECTION = {
+    "_id": 0,
+    "rings.id": 1,
+    "rings.index": 1,
+    "rings.type": 1,
+    "rings.generation": 1,
+}
+
+
+async def session_exists(collection, session_id: str) -> bool:
+    """Whether a session exists, reads only the document identifier"""
+
+    return await collection.find_one({"id": session_id}, {"_id": 1}) is not None
+
+
+async def load_session(collection, session_id: str) -> Session | None:
+    """Session with its files and the metadata of its rings without segments"""
+
+    data = await collection.find_one({"id": session_id}, SESSION_METADATA_PROJECTION)
+    return Session(**data) if data else None
+
+
+async def load_session_files(
+    collection, session_id: str, file_id: str | None = None
+) -> List[SessionFile] | None:
+    """Files of a session, or only the file with the identifier (`$elemMatch`)"""
+
+    files = 1 if file_id is None else {"$elemMatch": {"id": file_id}}
+    data = await collection.find_one({"id": session_id}, {"_id": 0, "files": files})
+    if data is None:
+        return None
+    return [SessionFile(**file) for file in data.get("files", [])]
+
+
+async def load_ring_headers(collection, session_id: str) -> List[RingHeader] | None:
+    """Identifiers, indices, types and segment generations of the rings of a session"""
+
+    data = await collection.find_one({"id": session_id}, RING_HEADER_PROJECTION)
+    if data is None:
+        return None
+    return [RingHeader(**ring) for ring in data.get("rings", [])]
+
+
+async def load_session_rings(
+    collection, session_id: str, ring_id: str | None = None
+) -> List[dict] | None:
+    """
+    Rings of a session, or only the ring with the identifier (`$elemMatch`), as
+    documents so that segments assembled from the segment store are validated
+    only where they are returned
+    """
+
+    rings = 1 if ring_id is None else {"$elemMatch": {"id": ring_id}}
+    data = await collection.find_one({"id": session_id}, {"_id": 0, "rings": rings})
+    if data is None:
+        return None
+    return data.get("rings", [])
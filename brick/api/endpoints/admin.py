@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from typing import List
+
+from ..schemas import IndexUsage
+from ..core.db import get_index_stats_motor
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+
+@router.get("/indexes", response_model=List[IndexUsage])
+async def get_index_usage():
+    """
+    Query usage of the indexes of the session and segment collections
+    """
+    return [
+        IndexUsage(
+            collection=index["collection"],
+            name=index["name"],
+            key=index["key"],
+            ops=index["accesses"]["ops"],
+            since=index["accesses"]["since"],
+        )
+        for index in await get_index_stats_motor()
+    ]
@@ -13,13 +13,13 @@ from ..schemas import (
     UploadFileResponse,
     FileFormat,
     FileType,
-    Session,
     SessionFile,
 )
 
 from ..core.config import settings
 
 from ..core.db import get_session_collection_motor
+from ..core.repository import load_session_files
 from ...utils import sanitize_input
 from ..tasks import process_file, rehydrate_session
 
@@ -33,12 +33,12 @@ router = APIRouter(
 async def get_files(session_id: str):
 
     collection = await get_session_collection_motor()
-    session_data = await collection.find_one({"id": session_id})
+    files = await load_session_files(collection, session_id=session_id)
 
-    if not session_data:
+    if files is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    return Session(**session_data).files
+    return files
 
 
 @router.post("/upload")
@@ -130,16 +130,13 @@ async def delete_file(session_id: str, file_id: str):
     # Get the collection from the database
     collection = await get_session_collection_motor()
 
-    # Retrieve the session data
-    session_data = await collection.find_one({"id": session_id})
-    if not session_data:
+    # Retrieve only the file to delete from the session
+    files = await load_session_files(collection, session_id=session_id, file_id=file_id)
+    if files is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    # Convert to Session model for ease of handling
-    session = Session(**session_data)
-
     # Find the file in the session
-    file_to_delete = next((file for file in session.files if file.id == file_id), None)
+    file_to_delete = next((file for file in files if file.id == file_id), None)
     if not file_to_delete:
         raise HTTPException(status_code=404, detail="File not found in session")
 
@@ -156,6 +153,8 @@ async def delete_file(session_id: str, file_id: str):
     # Delete the file from the filesystem
     if file_path.exists():
         file_path.unlink()
+        for sidecar_path in file_path.parent.glob(f"{file_path.name}.*"):
+            sidecar_path.unlink()  # index and hash files
     else:
         raise HTTPException(status_code=404, detail="File not found on disk")
 
@@ -1,17 +1,38 @@
+import uuid
+
+from celery import chord
 from fastapi.responses import JSONResponse
 from fastapi import APIRouter, HTTPException
 
-from ..schemas import BlastRingSchema, BlastRingResponse
+from ...rings import Ring
+from ..core.config import settings
+from ..cache import get_sequence_hash
+from ..schemas import BlastRingSchema, BlastRingResponse, BlastRingFilterSchema
+from ..schemas import BlastRingBatchSchema, BlastRingBatchResponse
 from ..schemas import AnnotationRingSchema, AnnotationRingResponse
 from ..schemas import LabelRingSchema, LabelRingResponse
 from ..schemas import ReferenceRingSchema, ReferenceRingResponse
 from ..schemas import GenomadRingSchema, GenomadRingResponse
 from ..tasks import (
     process_blast_ring,
+    process_blast_query_chunk,
+    process_blast_ring_chunks,
+    process_blast_hits,
+    process_blast_ring_batch,
     process_annotation_ring,
     process_label_ring,
     process_reference_ring,
     process_genomad_ring,
+    process_genomad_shard,
+    process_genomad_ring_shards,
+    filter_cached_blast_hits,
+    get_blast_chunks_directory,
+    get_genomad_shards_directory,
+    plan_blast_query_chunks,
+    plan_genomad_shards,
+    replace_ring_data,
+    update_rings_or_create_session,
+    store_zoom_pyramid,
 )
 
 
@@ -40,9 +61,36 @@ def create_blast_ring(ring_config: BlastRingSchema):
     _, reference_file, genome_file = ring_config.get_file_paths()
 
     try:
-        task = process_blast_ring.delay(
-            str(reference_file), str(genome_file), ring_config.model_dump()
+        # Large genomes are aligned in overlapping slices across workers
+        query_chunks = plan_blast_query_chunks(
+            reference_fasta=reference_file,
+            query_fasta=genome_file,
+            sequence_id=ring_config.reference.sequence.id,
         )
+
+        if len(query_chunks) > 1:
+            chunks_directory = get_blast_chunks_directory(str(uuid.uuid4()))
+            task = chord(
+                process_blast_query_chunk.s(
+                    str(reference_file),
+                    str(genome_file),
+                    ring_config.model_dump(),
+                    query_slices,
+                    str(chunks_directory / f"{i}.npz"),
+                )
+                for i, query_slices in enumerate(query_chunks)
+            )(
+                process_blast_ring_chunks.s(
+                    str(reference_file),
+                    str(genome_file),
+                    ring_config.model_dump(),
+                    str(chunks_directory),
+                )
+            )
+        else:
+            task = process_blast_ring.delay(
+                str(reference_file), str(genome_file), ring_config.model_dump()
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error initiating task: {str(e)}")
 
@@ -51,6 +99,96 @@ def create_blast_ring(ring_config: BlastRingSchema):
     )
 
 
+@router.post("/blast/batch", response_model=BlastRingBatchResponse)
+def create_blast_ring_batch(ring_config: BlastRingBatchSchema):
+    """
+    BLAST rings of multiple genomes against the same reference, genomes are
+    aligned in chunks with a single multiplexed BLAST run per chunk that are
+    distributed across workers and the rings are inserted into the session in
+    genome order when all runs have completed
+    """
+
+    _, reference_file, genome_files = ring_config.get_file_paths()
+    ring_schemas = ring_config.get_ring_schemas()
+
+    chunk_size = settings.BLAST_BATCH_GENOMES_PER_TASK
+    chunks = range(0, len(genome_files), chunk_size)
+
+    try:
+        task = chord(
+            process_blast_hits.s(
+                str(reference_file),
+                [str(file) for file in genome_files[i : i + chunk_size]],
+                [schema.model_dump() for schema in ring_schemas[i : i + chunk_size]],
+            )
+            for i in chunks
+        )(process_blast_ring_batch.s(ring_config.model_dump(), chunk_size))
+
+        task.parent.save()  # group result can be restored for progress
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error initiating task: {str(e)}")
+
+    return JSONResponse(
+        status_code=202,
+        content=BlastRingBatchResponse(
+            task_id=task.id, group_id=task.parent.id
+        ).model_dump(),
+    )
+
+
+@router.post("/blast/filter", response_model=Ring)
+def filter_blast_ring(ring_config: BlastRingFilterSchema):
+    """
+    Filters the cached unfiltered hits of a previous BLAST ring task without
+    running BLAST, creates a new ring or updates the ring with `ring_id`
+    """
+
+    _, reference_file, genome_file = ring_config.get_file_paths()
+
+    try:
+        ring = filter_cached_blast_hits(
+            reference_fasta=reference_file,
+            query_fasta=genome_file,
+            ring_schema=ring_config,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error filtering BLAST hits: {str(e)}"
+        )
+
+    if ring is None:
+        raise HTTPException(
+            status_code=404,
+            detail="BLAST hits not found for reference and genome files, they may have expired - please create a new BLAST ring",
+        )
+
+    if not ring.data:
+        raise HTTPException(
+            status_code=400, detail="No alignments were found with these filters"
+        )
+
+    session_id = ring_config.reference.session_id
+    try:
+        if ring_config.ring_id is not None:
+            ring.id = ring_config.ring_id
+            ring = replace_ring_data(session_id=session_id, ring=ring)
+        else:
+            # Ring index is modified for database in this function
+            ring = update_rings_or_create_session(session_id=session_id, ring=ring)
+
+        if ring is not None:
+            store_zoom_pyramid(ring=ring)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error storing BLAST ring: {str(e)}"
+        )
+
+    if ring is None:
+        raise HTTPException(status_code=404, detail="BLAST ring not found in session")
+
+    return JSONResponse(status_code=200, content=ring.model_dump())
+
+
 @router.post("/annotation", response_model=AnnotationRingResponse)
 def create_annotation_ring(ring_config: AnnotationRingSchema):
 
@@ -93,7 +231,40 @@ def create_label_ring(ring_config: GenomadRingSchema):
     _, reference_file = ring_config.get_file_paths()
 
     try:
-        task = process_genomad_ring.delay(str(reference_file), ring_config.model_dump())
+        # Windows of long sequences are classified in shards across workers
+        shards = plan_genomad_shards(
+            sequence_length=ring_config.reference.sequence.length,
+            window_size=ring_config.window_size,
+        )
+
+        if shards:
+            # Cache key of the output is derived from the bases of the sequence,
+            # hashed once for the shards and the callback
+            sequence_hash = get_sequence_hash(
+                fasta_file=reference_file, seq_id=ring_config.reference.sequence.id
+            )
+            shards_directory = get_genomad_shards_directory(str(uuid.uuid4()))
+            task = chord(
+                process_genomad_shard.s(
+                    str(reference_file),
+                    ring_config.model_dump(),
+                    region,
+                    str(shards_directory / f"{i}.tsv"),
+                    sequence_hash,
+                )
+                for i, region in enumerate(shards)
+            )(
+                process_genomad_ring_shards.s(
+                    str(reference_file),
+                    ring_config.model_dump(),
+                    str(shards_directory),
+                    sequence_hash,
+                )
+            )
+        else:
+            task = process_genomad_ring.delay(
+                str(reference_file), ring_config.model_dump()
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error initiating task: {str(e)}")
 
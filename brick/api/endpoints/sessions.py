@@ -1,13 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 
+from pathlib import Path
 from datetime import datetime
-from typing import List
+from typing import Dict, List
+from pymongo.errors import DuplicateKeyError
 
-from ...rings import Ring, RingType
-from ..schemas import Session, RingUpdate, LabelUpdate, SessionID
+from ...rings import Ring, RingType, SegmentIndex, ZoomPyramid
+from ..schemas import Session, RingUpdate, LabelUpdate, SessionID, RingSegmentPage
+from ..schemas import RingZoomLevel, RingHeader
+from ..tasks import get_zoom_pyramid_file
 from ..core.config import DEFAULT_SESSIONS
-from ..core.db import get_session_collection_motor
+from ..core.db import get_session_collection_motor, get_segment_collection_motor
+from ..core.db import load_ring_segments_motor, delete_ring_segments_motor
+from ..core.db import get_ring_generations, count_ring_segments_motor
+from ..core.repository import session_exists, load_session, load_ring_headers
+from ..core.repository import load_session_rings
 
 router = APIRouter(
     prefix="/sessions",
@@ -15,29 +24,51 @@ router = APIRouter(
 )
 
 
+# Sessions created before a date (e.g. expired sessions) are
+# selected in the database with the date index
+
+
 @router.get("/identifiers", response_model=List[SessionID])
-async def get_session_ids():
+async def get_session_ids(before: datetime | None = None):
     collection = await get_session_collection_motor()
-    cursor = collection.find({}, {"_id": 0, "id": 1})
+    query = {} if before is None else {"date": {"$lt": before.isoformat()}}
+    cursor = collection.find(query, {"_id": 0, "id": 1})
     session_ids = [doc["id"] async for doc in cursor]
 
     return session_ids
 
 
+# Sessions are returned with the metadata of their rings, segments of
+# the rings are assembled from the segment store only if requested
+
+
 @router.get("/{session_id}", response_model=Session)
-async def get_session(session_id: str, session_files_exist: bool = False):
+async def get_session(
+    session_id: str, session_files_exist: bool = False, segments: bool = False
+):
 
     if session_id in DEFAULT_SESSIONS:
         session_data = DEFAULT_SESSIONS[session_id]
+        if not segments:
+            session_data = {
+                **session_data,
+                "rings": [
+                    {**ring, "data": []} for ring in session_data.get("rings", [])
+                ],
+            }
         return Session(**session_data)
 
     collection = await get_session_collection_motor()
-    data = await collection.find_one({"id": session_id})
+    session = await load_session(collection, session_id=session_id)
 
-    if not data:
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    else:
-        session = Session(**data)
+
+    if segments:
+        # Rings are read with the generation of their segments
+        rings = await load_session_rings(collection, session_id=session_id)
+        rings = await load_ring_data(session_id=session_id, rings=rings or [])
+        session.rings = [Ring(**ring) for ring in rings]
 
     if session_files_exist:
         session.validate_file_paths()
@@ -45,18 +76,153 @@ async def get_session(session_id: str, session_files_exist: bool = False):
     return session
 
 
+# Windowed segment queries return only the segments of rings overlapping
+# the half-open window [start, end) of the reference sequence in pages
+
+
+@router.get("/{session_id}/rings/{ring_id}/segments", response_model=RingSegmentPage)
+async def get_ring_segments(
+    session_id: str,
+    ring_id: str,
+    start: int = Query(ge=0),
+    end: int = Query(gt=0),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=10000),
+):
+    check_segment_window(start=start, end=end)
+
+    if session_id in DEFAULT_SESSIONS:
+        rings = DEFAULT_SESSIONS[session_id].get("rings", [])
+    else:
+        collection = await get_session_collection_motor()
+        rings = await load_session_rings(
+            collection, session_id=session_id, ring_id=ring_id
+        )
+
+    ring = next((ring for ring in rings or [] if ring.get("id") == ring_id), None)
+    if ring is None:
+        raise HTTPException(status_code=404, detail="Ring not found in session")
+
+    (ring,) = await load_ring_data(
+        session_id=session_id, rings=[ring], start=start, end=end
+    )
+
+    return get_ring_segment_page(
+        ring=ring, start=start, end=end, offset=offset, limit=limit
+    )
+
+
+@router.get("/{session_id}/segments", response_model=List[RingSegmentPage])
+async def get_reference_segments(
+    session_id: str,
+    reference_id: str,
+    sequence_id: str,
+    start: int = Query(ge=0),
+    end: int = Query(gt=0),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=10000),
+):
+    check_segment_window(start=start, end=end)
+
+    if session_id in DEFAULT_SESSIONS:
+        rings = DEFAULT_SESSIONS[session_id].get("rings", [])
+    else:
+        collection = await get_session_collection_motor()
+        rings = await load_session_rings(collection, session_id=session_id)
+        if rings is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+    rings = [
+        ring
+        for ring in rings
+        if (ring.get("reference") or {}).get("reference_id") == reference_id
+        and (ring.get("reference") or {}).get("sequence", {}).get("id") == sequence_id
+    ]
+
+    # Pages are applied to each ring of the reference sequence
+    return [
+        get_ring_segment_page(
+            ring=ring, start=start, end=end, offset=offset, limit=limit
+        )
+        for ring in await load_ring_data(
+            session_id=session_id, rings=rings, start=start, end=end
+        )
+    ]
+
+
+# Zoom levels summarize ring segments in bins no larger than a pixel
+# of the requested view (`pixels` across the window or sequence)
+
+
+@router.get("/{session_id}/rings/{ring_id}/zoom", response_model=RingZoomLevel)
+async def get_ring_zoom_level(
+    session_id: str,
+    ring_id: str,
+    pixels: int = Query(gt=0),
+    start: int | None = Query(default=None, ge=0),
+    end: int | None = Query(default=None, gt=0),
+):
+    zoom_file = get_zoom_pyramid_file(session_id=session_id, ring_id=ring_id)
+
+    # Pyramids are read and built in the threadpool so that large
+    # rings do not block the event loop
+    if zoom_file.exists():
+        pyramid = await run_in_threadpool(ZoomPyramid.load, path=zoom_file)
+    else:
+        # Rings of default and rehydrated sessions have no stored pyramid
+        if session_id in DEFAULT_SESSIONS:
+            rings = DEFAULT_SESSIONS[session_id].get("rings", [])
+        else:
+            collection = await get_session_collection_motor()
+            rings = await load_session_rings(
+                collection, session_id=session_id, ring_id=ring_id
+            )
+
+        ring = next((ring for ring in rings or [] if ring.get("id") == ring_id), None)
+        if ring is None:
+            raise HTTPException(status_code=404, detail="Ring not found in session")
+
+        (ring,) = await load_ring_data(session_id=session_id, rings=[ring])
+
+        pyramid = await run_in_threadpool(
+            build_zoom_pyramid, ring=ring, zoom_file=zoom_file
+        )
+
+    start = 0 if start is None else start
+    end = pyramid.length if end is None else min(end, pyramid.length)
+    check_segment_window(start=start, end=end)
+
+    level = pyramid.select_level(bases_per_pixel=(end - start) / pixels)
+    bin_size = pyramid.bin_sizes[level]
+    first, last = start // bin_size, -(-end // bin_size)
+
+    return RingZoomLevel(
+        ring_id=ring_id,
+        level=level,
+        bin_size=bin_size,
+        length=pyramid.length,
+        start=first * bin_size,
+        end=min(last * bin_size, pyramid.length),
+        count=pyramid.count[level][first:last].tolist(),
+        coverage=pyramid.coverage[level][first:last].tolist(),
+        score=[
+            None if value != value else value  # NaN to None
+            for value in pyramid.score[level][first:last].tolist()
+        ],
+    )
+
+
 @router.delete("/{session_id}")
 async def delete_session(session_id: str, session_data: bool = True):
 
     collection = await get_session_collection_motor()
-    data = await collection.find_one({"id": session_id})
+    session = await load_session(collection, session_id=session_id)
 
-    if not data:
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    else:
-        session = Session(**data)
 
-    collection.delete_one({"id": session_id})
+    await collection.delete_one({"id": session_id})
+    await delete_ring_segments_motor(session_id=session_id)
 
     if session_data:
         if not session.delete_session_data():
@@ -69,28 +235,23 @@ async def delete_session(session_id: str, session_data: bool = True):
 async def update_session_ring(session_id: str, ring_update: RingUpdate):
 
     collection = await get_session_collection_motor()
-    existing_session: dict = await collection.find_one({"id": session_id})
+    rings = await load_ring_headers(collection, session_id=session_id)
 
-    if not existing_session:
+    if rings is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    else:
-        existing_session: Session = Session(**existing_session)
 
     # If an index update is requested we have to change the other ring
     # indices in the current filtered ring view (by reference sequence)
     # their identifiers are provided as `index_group`
 
     if ring_update.index_group:
-        updated_rings = update_ring_indices(
-            session=existing_session, ring_update=ring_update
-        )
+        updated_rings = update_ring_indices(rings=rings, ring_update=ring_update)
 
-        for ring in updated_rings:
-            await collection.update_one(
-                {"id": session_id, "rings.id": ring.id},
-                {"$set": {"rings.$[elem].index": ring.index}},
-                array_filters=[{"elem.id": ring.id}],
-            )
+        # Indices of all rings in the group are set in a single update
+        await collection.update_one(
+            {"id": session_id},
+            [get_ring_index_stage({ring.id: ring.index for ring in updated_rings})],
+        )
     else:
         update_data = {"$set": {}}
         for key, value in ring_update.model_dump(
@@ -121,42 +282,64 @@ async def update_session_ring(session_id: str, ring_update: RingUpdate):
 async def update_label(session_id: str, label_update: LabelUpdate):
 
     collection = await get_session_collection_motor()
-    existing_session: dict = await collection.find_one({"id": session_id})
+    rings = await load_ring_headers(collection, session_id=session_id)
 
-    if not existing_session:
+    if rings is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    else:
-        existing_session: Session = Session(**existing_session)
-
-    # Check that the label exists in the requested ring at the requested index
-    # and get the index for the update operation - for some reason array filter
-    # are not working?
-    ring_found, label_found, ring_index, label_index = False, False, None, None
-    for i, ring in enumerate(existing_session.rings):
-        if ring.id == label_update.ring_id:
-            ring_found = True
-            ring_index = i
-            for j, segment in enumerate(ring.data):
-                if segment.labelIdentifier == label_update.label_id:
-                    label_found = True
-                    label_index = j
-
-    if not ring_found or not label_found:
+
+    ring_index, ring = next(
+        ((i, ring) for i, ring in enumerate(rings) if ring.id == label_update.ring_id),
+        (None, None),
+    )
+
+    # Check that the label exists in the segment chunk of the requested ring
+    # and get its index in the chunk for the update operation
+    segment_collection = await get_segment_collection_motor()
+    chunk = None
+    if ring_index is not None:
+        chunk = await segment_collection.find_one(
+            {
+                "session_id": session_id,
+                "ring_id": label_update.ring_id,
+                "generation": ring.generation,
+                "data.labelIdentifier": label_update.label_id,
+            },
+            {"_id": 1, "chunk": 1, "data.labelIdentifier": 1},
+        )
+
+    if chunk is None:
         raise HTTPException(status_code=404, detail="Requested ring or label not found")
 
+    chunk_index = next(
+        j
+        for j, segment in enumerate(chunk["data"])
+        if segment.get("labelIdentifier") == label_update.label_id
+    )
+
+    # Index of the label in the ring as it is loaded, in chunk order
+    label_index = chunk_index + await count_ring_segments_motor(
+        session_id=session_id,
+        ring_id=label_update.ring_id,
+        generation=ring.generation,
+        before_chunk=chunk["chunk"],
+    )
+
     update_document = {}
     for field in label_update.model_dump(exclude_unset=True):
         if (
             field != "ring_id" and field != "label_id"
         ):  # Exclude these fields from the update
-            update_document[f"rings.{ring_index}.data.{label_index}.{field}"] = getattr(
-                label_update, field
-            )
+            update_document[f"data.$.{field}"] = getattr(label_update, field)
 
     if not update_document:
         raise HTTPException(status_code=400, detail="No update data provided")
 
-    result = await collection.update_one({"id": session_id}, {"$set": update_document})
+    # Label is updated by its identifier as labels appended to the
+    # chunk (`append_ring_segments`) may have moved it in the chunk
+    result = await segment_collection.update_one(
+        {"_id": chunk["_id"], "data.labelIdentifier": label_update.label_id},
+        {"$set": update_document},
+    )
 
     if not result.matched_count:
         raise HTTPException(
@@ -179,45 +362,49 @@ async def update_label(session_id: str, label_update: LabelUpdate):
 async def delete_session_ring(session_id: str, ring_update: RingUpdate):
     collection = await get_session_collection_motor()
 
-    # Retrieve the session
-    existing_session: dict = await collection.find_one({"id": session_id})
-    if not existing_session:
+    # Retrieve the ring indices of the session
+    rings = await load_ring_headers(collection, session_id=session_id)
+    if rings is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    else:
-        existing_session: Session = Session(**existing_session)
 
     # Check if the ring exists in the session
-    if not any(ring.id == ring_update.id for ring in existing_session.rings):
+    if not any(ring.id == ring_update.id for ring in rings):
         raise HTTPException(status_code=404, detail="Ring not found in session")
 
-    # Update the session to remove the specific ring
-    await collection.update_one(
-        {"id": session_id}, {"$pull": {"rings": {"id": ring_update.id}}}
-    )
-
-    # Filter and reindex only the rings in the index_group (which contains also the identifier of the deleted ring)
-    index_group_rings = {
-        ring.id: ring
-        for ring in existing_session.rings
-        if ring.id in ring_update.index_group and ring.id != ring_update.id
-    }
-
+    # Reindex only the rings in the index_group (which contains also the identifier of the deleted ring)
     reindexed_rings = sorted(
-        (ring for ring in index_group_rings.values() if ring.id != ring_update.id),
+        (
+            ring
+            for ring in rings
+            if ring.id in (ring_update.index_group or []) and ring.id != ring_update.id
+        ),
         key=lambda x: x.index,
     )
 
-    for i, ring in enumerate(reindexed_rings):
-        index_group_rings[ring.id].index = i
-
-    # Update the entire rings array in the session
-    updated_rings = [
-        index_group_rings.get(ring.id, ring).model_dump()
-        for ring in existing_session.rings
-        if ring.id != ring_update.id
-    ]
-
-    await collection.update_one({"id": session_id}, {"$set": {"rings": updated_rings}})
+    # Remove the ring and update the indices in a single update
+    await collection.update_one(
+        {"id": session_id},
+        [
+            {
+                "$set": {
+                    "rings": {
+                        "$filter": {
+                            "input": "$rings",
+                            "as": "ring",
+                            "cond": {"$ne": ["$$ring.id", ring_update.id]},
+                        }
+                    }
+                }
+            },
+            get_ring_index_stage(
+                {ring.id: i for i, ring in enumerate(reindexed_rings)}
+            ),
+        ],
+    )
+    await delete_ring_segments_motor(session_id=session_id, ring_ids=[ring_update.id])
+    get_zoom_pyramid_file(session_id=session_id, ring_id=ring_update.id).unlink(
+        missing_ok=True
+    )
 
     # Return standard JSON response for application
     return JSONResponse(
@@ -234,16 +421,19 @@ async def delete_session_ring(session_id: str, ring_update: RingUpdate):
 async def create_session(session_id: str):
 
     collection = await get_session_collection_motor()
-    session_data = await collection.find_one({"id": session_id})
 
-    if session_data:
+    if await session_exists(collection, session_id=session_id):
         raise HTTPException(status_code=409, detail="Session already exists")
 
     new_session = Session(
         id=session_id, date=datetime.now().isoformat(), files=[], rings=[]
     )
 
-    await collection.insert_one(new_session.model_dump())
+    try:
+        await collection.insert_one(new_session.model_dump())
+    except DuplicateKeyError:
+        # session was created by a concurrent request (unique index on `id`)
+        raise HTTPException(status_code=409, detail="Session already exists")
 
     return new_session
 
@@ -251,11 +441,39 @@ async def create_session(session_id: str):
 # Helper
 
 
-def update_ring_indices(session: Session, ring_update: RingUpdate) -> List[Ring]:
+def get_ring_index_stage(indices: Dict[str, int]) -> dict:
+    """Pipeline update stage setting the indices of rings by their identifier"""
+
+    ring_ids, ring_indices = list(indices), list(indices.values())
+
+    position = {"$indexOfArray": [{"$literal": ring_ids}, "$$ring.id"]}
+    index = {"$arrayElemAt": [ring_indices, "$$position"]}
+    ring = {
+        "$cond": [
+            {"$eq": ["$$position", -1]},
+            "$$ring",
+            {"$mergeObjects": ["$$ring", {"index": index}]},
+        ]
+    }
+
+    return {
+        "$set": {
+            "rings": {
+                "$map": {
+                    "input": "$rings",
+                    "as": "ring",
+                    "in": {"$let": {"vars": {"position": position}, "in": ring}},
+                }
+            }
+        }
+    }
+
+
+def update_ring_indices(
+    rings: List[RingHeader], ring_update: RingUpdate
+) -> List[RingHeader]:
     # Extract the subset of rings to be reindexed
-    subset_rings = [
-        ring for ring in session.rings if ring.id in ring_update.index_group
-    ]
+    subset_rings = [ring for ring in rings if ring.id in ring_update.index_group]
 
     # Sort the subset based on their current index
     subset_rings.sort(key=lambda ring: ring.index)
@@ -298,3 +516,65 @@ def update_ring_indices(session: Session, ring_update: RingUpdate) -> List[Ring]
             ring.index = i
 
     return subset_rings
+
+
+async def load_ring_data(
+    session_id: str, rings: List[dict], start: int | None = None, end: int | None = None
+) -> List[dict]:
+    """
+    Rings with their segments from the segment store, segments of rings that are
+    stored with the ring (default sessions) are kept. With a window, segments are
+    read only from the chunks overlapping the window
+    """
+
+    generations = get_ring_generations([ring for ring in rings if not ring.get("data")])
+    if not generations:
+        return rings
+
+    segments = await load_ring_segments_motor(
+        session_id=session_id, generations=generations, start=start, end=end
+    )
+    return [
+        ring if ring.get("data") else {**ring, "data": segments.get(ring["id"], [])}
+        for ring in rings
+    ]
+
+
+def build_zoom_pyramid(ring: dict, zoom_file: Path) -> ZoomPyramid:
+    """Zoom pyramid of a ring, stored if the session directory exists"""
+
+    pyramid = ZoomPyramid.from_ring(ring=Ring(**ring))
+    if zoom_file.parent.parent.exists():
+        zoom_file.parent.mkdir(exist_ok=True)
+        pyramid.save(path=zoom_file)
+    return pyramid
+
+
+def check_segment_window(start: int, end: int) -> None:
+    if end <= start:
+        raise HTTPException(
+            status_code=400, detail="Segment window end must be greater than start"
+        )
+
+
+def get_ring_segment_page(
+    ring: dict, start: int, end: int, offset: int, limit: int
+) -> RingSegmentPage:
+    # Only the segments of the requested page are validated into models,
+    # segments are stored sorted so that the index is built without sorting
+    data = ring.get("data", [])
+    selected = SegmentIndex.from_segments(data).query(start=start, end=end)
+
+    return RingSegmentPage(
+        ring=Ring(
+            **{
+                **ring,
+                "data": [data[i] for i in selected[offset : offset + limit].tolist()],
+            }
+        ),
+        start=start,
+        end=end,
+        offset=offset,
+        limit=limit,
+        total=len(selected),
+    )
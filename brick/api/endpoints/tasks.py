@@ -1,8 +1,9 @@
-from celery.result import AsyncResult
+from celery.result import AsyncResult, GroupResult
 from fastapi.responses import JSONResponse
 from fastapi import APIRouter, HTTPException
 
 from ..schemas import TaskStatus, TaskStatusResponse, TaskResultResponse
+from ..schemas import TaskGroupStatusResponse, TaskProgressResponse, BlastRingBatch
 from ..core.celery import celery_app
 from ..schemas import Session, SessionFile, FileFormat, TaskResultType
 from ...rings import (
@@ -30,6 +31,41 @@ def get_task_status(task_id: str):
     return {"task_id": task_id, "status": task_result.status}
 
 
+@router.get("/progress/{task_id}", response_model=TaskProgressResponse)
+def get_task_progress(task_id: str):
+    """
+    Query progress of a running task (e.g. BLAST hits parsed so far)
+    """
+    task_result = AsyncResult(task_id, app=celery_app)
+
+    progress = None
+    if task_result.status == TaskStatus.PROGRESS:
+        progress = task_result.info
+
+    return {"task_id": task_id, "status": task_result.status, "progress": progress}
+
+
+@router.get("/group/{group_id}", response_model=TaskGroupStatusResponse)
+def get_task_group_status(group_id: str):
+    """
+    Query progress of a group of tasks (e.g. BLAST runs of a batch of rings)
+    """
+    group_result = GroupResult.restore(group_id, app=celery_app)
+
+    if group_result is None:
+        raise HTTPException(status_code=404, detail="Task group not found")
+
+    completed = sum(result.ready() for result in group_result.results)
+    total = len(group_result.results)
+
+    return {
+        "group_id": group_id,
+        "status": TaskStatus.SUCCESS if completed == total else TaskStatus.PROCESSING,
+        "total": total,
+        "completed": completed,
+    }
+
+
 @router.get("/result/{task_id}")
 def get_task_result(task_id: str):
     """
@@ -88,6 +124,7 @@ def get_result_model(
     | ReferenceRing
     | GenomadRing
     | LabelRing
+    | BlastRingBatch
 ):
     """
     Identification of result models from a common result endpoint for tasks exceuted with Celery
@@ -109,5 +146,7 @@ def get_result_model(
         return GenomadRing(**result_data)
     elif "date" in result_data:
         return Session(**result_data)
+    elif "rings" in result_data:
+        return BlastRingBatch(**result_data)
     else:
         raise TypeError("Task result did not match a known model")
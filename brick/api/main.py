@@ -9,6 +9,7 @@ from .endpoints import files
 from .endpoints import sessions
 from .endpoints import tasks
 from .endpoints import rings
+from .endpoints import admin
 
 from ..utils import enough_disk_space
 
@@ -77,6 +78,9 @@ def init_api():
     app.include_router(tasks.router)
     app.include_router(rings.router)
 
+    if settings.ADMIN_ENDPOINTS:
+        app.include_router(admin.router)
+
     # CORS
     app.add_middleware(
         CORSMiddleware,
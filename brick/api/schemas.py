@@ -1,10 +1,11 @@
 import shutil
 
-from pydantic import BaseModel, field_validator, model_validator
-from typing import Optional, Annotated, Tuple, List
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Optional, Annotated, Tuple, List, Dict
 from strenum import StrEnum
 from pathlib import Path
 from uuid import UUID
+from datetime import datetime
 
 from .core.config import settings
 
@@ -137,6 +138,49 @@ class Session(BaseModel):
             return False
 
 
+# Identifier, position and type of a ring read without its metadata
+# and segments for operations on the ring order of a session
+class RingHeader(BaseModel):
+    id: str
+    index: int = -1
+    type: RingType = RingType.GENERIC
+    generation: str | None = None  # of the stored segments
+
+
+# Segments of a ring overlapping a window of the reference
+# sequence, the ring is returned with only the requested page
+# of overlapping segments in `ring.data`
+class RingSegmentPage(BaseModel):
+    ring: Ring
+    start: int
+    end: int
+    offset: int
+    limit: int
+    total: int
+
+
+# Zoom level of a ring summary pyramid matching a requested
+# pixel resolution with bins covering the requested window
+class RingZoomLevel(BaseModel):
+    ring_id: str
+    level: int
+    bin_size: int
+    length: int
+    start: int
+    end: int
+    count: List[int]
+    coverage: List[float]
+    score: List[float | None]
+
+
+# BLAST rings of a batch of genomes against the same reference in the
+# order of the requested genomes, genomes without rings are reported
+# with their error messages
+class BlastRingBatch(BaseModel):
+    rings: List[BlastRing]
+    errors: List[str] = []
+
+
 ##############
 # CELERY TASKS
 ##############
@@ -148,6 +192,7 @@ class TaskStatus(StrEnum):
     SUCCESS = "SUCCESS"
     FAILURE = "FAILURE"
     PROCESSING = "PROCESSING"
+    PROGRESS = "PROGRESS"
 
 
 class TaskResultType(StrEnum):
@@ -158,10 +203,17 @@ class TaskResultType(StrEnum):
     LABEL_RING = "LABEL_RING"
     REFERENCE_RING = "REFERENCE_RING"
     GENOMAD_RING = "GENOMAD_RING"
+    BLAST_RING_BATCH = "BLAST_RING_BATCH"
 
     def from_model(
         model: (
-            Session | SessionFile | BlastRing | AnnotationRing | LabelRing | GenomadRing
+            Session
+            | SessionFile
+            | BlastRing
+            | AnnotationRing
+            | LabelRing
+            | GenomadRing
+            | BlastRingBatch
         ),
     ):
         if isinstance(model, Session):
@@ -178,6 +230,8 @@ class TaskResultType(StrEnum):
             return TaskResultType.REFERENCE_RING
         elif isinstance(model, GenomadRing):
             return TaskResultType.GENOMAD_RING
+        elif isinstance(model, BlastRingBatch):
+            return TaskResultType.BLAST_RING_BATCH
         else:
             raise TypeError("Could not determine task result return type from model")
 
@@ -196,10 +250,24 @@ class TaskResultResponse(TaskStatusResponse):
         | LabelRing
         | ReferenceRing
         | GenomadRing
+        | BlastRingBatch
     ]
     result_type: Optional[TaskResultType]
 
 
+# Progress reported by a running task (e.g. the BLAST hits parsed so far)
+class TaskProgressResponse(TaskStatusResponse):
+    progress: Optional[Dict[str, int]] = None
+
+
+# Progress of a group of tasks (e.g. the BLAST runs of a batch)
+class TaskGroupStatusResponse(BaseModel):
+    group_id: CeleryTaskID
+    status: TaskStatus
+    total: int
+    completed: int
+
+
 ##############
 # RING SCHEMAS
 ##############
@@ -284,10 +352,72 @@ class BlastRingSchema(RingSchema):
         )
 
 
+class BlastRingFilterSchema(BlastRingSchema):
+    ring_id: str | None = None  # BLAST ring in the session to update
+
+    @field_validator("ring_id")
+    @classmethod
+    def check_ring_uuid_v4(cls, v: str | None):
+        if v is not None:
+            try:
+                UUID(v, version=4)
+            except ValueError:
+                raise ValueError(f"'{v}' is not a valid UUID4")
+        return v
+
+
+class BlastRingBatchSchema(RingSchema):
+    genome_ids: List[SessionFileID] = Field(
+        min_length=1, max_length=settings.BLAST_BATCH_MAX_GENOMES
+    )
+    blast_method: BlastMethod = BlastMethod.BLASTN
+    min_alignment: int = 0
+    min_identity: float = 0.0
+    min_evalue: float = 10.0
+
+    # Genomes and filters are validated by the schema of each ring
+
+    @model_validator(mode="after")
+    def check_ring_schemas(self) -> "BlastRingBatchSchema":
+        self.get_ring_schemas()
+        return self
+
+    def get_ring_schemas(self) -> List[BlastRingSchema]:
+        return [
+            BlastRingSchema(
+                reference=self.reference,
+                genome_id=genome_id,
+                blast_method=self.blast_method,
+                min_alignment=self.min_alignment,
+                min_identity=self.min_identity,
+                min_evalue=self.min_evalue,
+            )
+            for genome_id in self.genome_ids
+        ]
+
+    def get_file_paths(self) -> Tuple[Path, Path, List[Path]]:
+
+        return (
+            settings.WORK_DIRECTORY / self.reference.session_id,
+            settings.WORK_DIRECTORY
+            / self.reference.session_id
+            / self.reference.reference_id,
+            [
+                settings.WORK_DIRECTORY / self.reference.session_id / genome_id
+                for genome_id in self.genome_ids
+            ],
+        )
+
+
 class BlastRingResponse(BaseModel):
     task_id: CeleryTaskID
 
 
+class BlastRingBatchResponse(BaseModel):
+    task_id: CeleryTaskID  # result of the batch
+    group_id: CeleryTaskID  # progress of the BLAST runs
+
+
 class AnnotationRingSchema(RingSchema):
     genbank_id: SessionFileID | None = None
     tsv_id: SessionFileID | None = None
@@ -499,3 +629,16 @@ class LabelUpdate(BaseModel):
     text: str | None = None
     textSize: float | None = None
     textColor: str | None = None
+
+
+# Admin
+
+
+# Usage of a database index since it was created or the
+# database server was restarted (`$indexStats`)
+class IndexUsage(BaseModel):
+    collection: str
+    name: str
+    key: Dict[str, int]
+    ops: int
+    since: datetime
@@ -1,19 +1,32 @@
 import json
 import uuid
+import functools
 import shutil
 import pandas
 import tempfile
 import subprocess
 import contextlib
 
-from Bio import SeqIO
 from pathlib import Path
+from celery import current_task
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
-from typing import List, Tuple, Generator, Annotated, Optional
+from typing import IO, List, Tuple, Callable, Generator, Annotated, Optional
 
 from .core.config import settings
 from .core.celery import celery_app
-from .core.db import get_session_collection_pymongo
+from .core.db import get_session_collection_pymongo, SESSION_METADATA_PROJECTION
+from .core.db import store_ring_segments, load_ring_segments, append_ring_segments
+from .core.db import delete_ring_segment_generations, get_ring_generations
+from .cache import (
+    get_blast_database_cache,
+    get_blast_hits_cache,
+    get_blast_hits_key,
+    get_genomad_cache,
+    get_genomad_key,
+    get_sequence_hash,
+)
 
 from .schemas import (
     Session,
@@ -23,18 +36,35 @@ from .schemas import (
     Sequence,
     Selections,
     FileConfig,
+    TaskStatus,
 )
 from .schemas import (
     AnnotationRingSchema,
     LabelRingSchema,
     BlastRingSchema,
+    BlastRingBatchSchema,
+    BlastRingBatch,
     ReferenceRingSchema,
     GenomadRingSchema,
 )
 from ..rings import BlastRing, AnnotationRing, LabelRing, ReferenceRing, GenomadRing
 from ..rings import Ring, RingSegment, RingType, RingReference, LabelSegment
-
-from ..utils import slice_fasta_sequences
+from ..rings import ZoomPyramid, BLASTN_SEGMENT_COLUMNS, BLASTN_CHUNK_COLUMNS
+from ..rings import save_blastn_hits, load_blastn_hits
+from ..rings import read_blastn_stream, concat_blastn_hits, demultiplex_blastn_hits
+from ..rings import unchunk_blastn_hits
+
+from ..utils import (
+    FastaIndex,
+    multiplex_fasta_files,
+    plan_fasta_chunks,
+    scan_fasta_records,
+    stream_fasta_slices,
+    summarize_genbank_file,
+    write_fasta_index,
+    write_fasta_sequences,
+    write_fasta_slices,
+)
 
 
 # Uploaded file validation and session file storage
@@ -95,6 +125,8 @@ def process_file(
 
     except Exception as e:
         Path(file_path).unlink()  # delete for disk space
+        for sidecar_path in Path(file_path).parent.glob(f"{Path(file_path).name}.*"):
+            sidecar_path.unlink()  # index and hash files
         return {"success": False, "error": str(e)}
 
 
@@ -194,30 +226,146 @@ def process_blast_ring(
     blast_ring_schema: Annotated[dict, "Model dump of BlastRingSchema"],
 ):
 
+    try:
+        ring_schema = BlastRingSchema(**blast_ring_schema)
+
+        # BLAST is only executed if no unfiltered hits are cached for
+        # the contents of the reference and genome files
+        hits = get_blast_hits(
+            reference_fasta=Path(reference_file_path),
+            query_fasta=Path(genome_file_path),
+            sequence_id=ring_schema.reference.sequence.id,
+            progress=report_blast_progress,
+        )
+
+        ring: BlastRing = BlastRing.from_blast_hits(
+            hits=hits,
+            reference=ring_schema.reference,
+            min_identity=ring_schema.min_identity,
+            min_alignment=ring_schema.min_alignment,
+            min_evalue=ring_schema.min_evalue,
+        )
+
+        if not ring.data:
+            raise ValueError("BLAST executed correctly but no alignments were found")
+
+        # Ring index is modified for database in this function
+        ring = update_rings_or_create_session(
+            session_id=ring_schema.reference.session_id, ring=ring
+        )
+
+        # Summary levels for whole sequence views of the ring
+        store_zoom_pyramid(ring=ring)
+
+        return {"success": True, "result": ring.model_dump()}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def report_blast_progress(hits: int):
+    """Reports the hits parsed so far as progress state of the current task"""
+
+    if current_task and current_task.request.id:
+        current_task.update_state(state=TaskStatus.PROGRESS, meta={"hits": hits})
+
+
+# BLAST ring of a large query genome, BLAST is executed for overlapping
+# slices of the genome in a group of tasks and the hits of the slices
+# are merged into the ring in a chord callback
+
+
+@celery_app.task
+def process_blast_query_chunk(
+    reference_file_path: Annotated[
+        str, "Path to reference file in the session directory"
+    ],
+    genome_file_path: Annotated[str, "Path to genome file in the session directory"],
+    blast_ring_schema: Annotated[dict, "Model dump of BlastRingSchema"],
+    query_slices: Annotated[
+        List[Tuple[str, int, int]], "Sequence slices of the genome in the chunk"
+    ],
+    hits_file_path: Annotated[str, "Path to hits file of the chunk"],
+):
+
     try:
         ring_schema = BlastRingSchema(**blast_ring_schema)
 
         with create_tmp_directory(
             root_dir=settings.WORK_DIRECTORY
         ) as working_directory:
+            query_fasta = working_directory / "query.fasta"
+            write_fasta_slices(
+                fasta_file=Path(genome_file_path),
+                slices=query_slices,
+                outfile=query_fasta,
+            )
 
-            try:
-                output_file = run_blast(
-                    query_fasta=Path(genome_file_path),
-                    reference_fasta=Path(reference_file_path),
-                    working_directory=working_directory,
-                )
-            except:  # fails with generic message from subcommand exception even during timeout
-                shutil.rmtree(working_directory)
-                raise
+            hits = stream_blast(
+                query_fasta=query_fasta,
+                reference_fasta=Path(reference_file_path),
+                working_directory=working_directory,
+                sequence_id=ring_schema.reference.sequence.id,
+                columns=BLASTN_CHUNK_COLUMNS,
+                progress=report_blast_progress,
+            )
 
-            ring: BlastRing = BlastRing.from_blast_output(
-                file=output_file,
-                reference=ring_schema.reference,
-                min_identity=ring_schema.min_identity,
-                min_alignment=ring_schema.min_alignment,
-                min_evalue=ring_schema.min_evalue,
+        # Hits are passed to the callback through the working directory
+        Path(hits_file_path).parent.mkdir(parents=True, exist_ok=True)
+        save_blastn_hits(hits=hits, file_path=Path(hits_file_path))
+
+        return {"success": True, "result": {"hits": len(hits)}}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@celery_app.task
+def process_blast_ring_chunks(
+    results: Annotated[List[dict], "Results of process_blast_query_chunk"],
+    reference_file_path: Annotated[
+        str, "Path to reference file in the session directory"
+    ],
+    genome_file_path: Annotated[str, "Path to genome file in the session directory"],
+    blast_ring_schema: Annotated[dict, "Model dump of BlastRingSchema"],
+    chunks_directory: Annotated[str, "Directory of the hits files of the chunks"],
+):
+
+    try:
+        ring_schema = BlastRingSchema(**blast_ring_schema)
+
+        for result in results:
+            if not result["success"]:
+                raise ValueError(result["error"])
+
+        hits = unchunk_blastn_hits(
+            concat_blastn_hits(
+                (
+                    load_blastn_hits(file_path=Path(chunks_directory) / f"{i}.npz")
+                    for i in range(len(results))
+                ),
+                columns=BLASTN_CHUNK_COLUMNS,
             )
+        )[BLASTN_SEGMENT_COLUMNS]
+
+        # Merged hits are cached as the hits of the whole genome
+        with get_blast_hits_cache().keyed_entry(
+            key=get_blast_hits_key(
+                reference_fasta=Path(reference_file_path),
+                query_fasta=Path(genome_file_path),
+                sequence_id=ring_schema.reference.sequence.id,
+            ),
+            build=lambda entry_directory: save_blastn_hits(
+                hits=hits, file_path=entry_directory / "hits.npz"
+            ),
+        ):
+            pass
+
+        ring: BlastRing = BlastRing.from_blast_hits(
+            hits=hits,
+            reference=ring_schema.reference,
+            min_identity=ring_schema.min_identity,
+            min_alignment=ring_schema.min_alignment,
+            min_evalue=ring_schema.min_evalue,
+        )
 
         if not ring.data:
             raise ValueError("BLAST executed correctly but no alignments were found")
@@ -227,9 +375,108 @@ def process_blast_ring(
             session_id=ring_schema.reference.session_id, ring=ring
         )
 
+        # Summary levels for whole sequence views of the ring
+        store_zoom_pyramid(ring=ring)
+
         return {"success": True, "result": ring.model_dump()}
     except Exception as e:
         return {"success": False, "error": str(e)}
+    finally:
+        shutil.rmtree(chunks_directory, ignore_errors=True)
+
+
+# Batch of BLAST rings against the same reference, BLAST is executed for
+# chunks of genomes in a group of tasks (one multiplexed run per chunk) and
+# the rings are created from the hits cache and inserted into the session
+# in a chord callback
+
+
+@celery_app.task
+def process_blast_hits(
+    reference_file_path: Annotated[
+        str, "Path to reference file in the session directory"
+    ],
+    genome_file_paths: Annotated[
+        List[str], "Paths to genome files in the session directory"
+    ],
+    blast_ring_schemas: Annotated[List[dict], "Model dumps of BlastRingSchema"],
+):
+
+    try:
+        ring_schemas = [BlastRingSchema(**schema) for schema in blast_ring_schemas]
+
+        # Hits are passed to the callback through the cache
+        hits = cache_blast_hits(
+            reference_fasta=Path(reference_file_path),
+            query_fastas=[Path(path) for path in genome_file_paths],
+            sequence_id=ring_schemas[0].reference.sequence.id,
+            progress=report_blast_progress,
+        )
+
+        return {
+            "success": True,
+            "result": {
+                "genome_ids": [schema.genome_id for schema in ring_schemas],
+                "hits": hits,
+            },
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@celery_app.task
+def process_blast_ring_batch(
+    results: Annotated[List[dict], "Results of process_blast_hits in genome order"],
+    blast_ring_batch_schema: Annotated[dict, "Model dump of BlastRingBatchSchema"],
+    genomes_per_task: Annotated[int, "Genomes of each process_blast_hits task"] = 1,
+):
+
+    try:
+        batch_schema = BlastRingBatchSchema(**blast_ring_batch_schema)
+        _, reference_file, genome_files = batch_schema.get_file_paths()
+
+        rings, errors = [], []
+        for i, (ring_schema, genome_file) in enumerate(
+            zip(batch_schema.get_ring_schemas(), genome_files)
+        ):
+            result = results[i // genomes_per_task]
+            if not result["success"]:
+                errors.append(f"{ring_schema.genome_id}: {result['error']}")
+                continue
+
+            ring: BlastRing | None = filter_cached_blast_hits(
+                reference_fasta=reference_file,
+                query_fasta=genome_file,
+                ring_schema=ring_schema,
+            )
+            if ring is None:
+                errors.append(f"{ring_schema.genome_id}: BLAST hits are not cached")
+                continue
+            if not ring.data:
+                errors.append(
+                    f"{ring_schema.genome_id}: BLAST executed correctly but no alignments were found"
+                )
+                continue
+            rings.append(ring)
+
+        if not rings:
+            raise ValueError("; ".join(errors))
+
+        # Ring indices are modified for database in this function
+        rings = insert_rings_or_create_session(
+            session_id=batch_schema.reference.session_id, rings=rings
+        )
+
+        # Summary levels for whole sequence views of the rings
+        for ring in rings:
+            store_zoom_pyramid(ring=ring)
+
+        return {
+            "success": True,
+            "result": BlastRingBatch(rings=rings, errors=errors).model_dump(),
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
 
 # Genbank/TSV annotation extraction
@@ -268,6 +515,9 @@ def process_annotation_ring(
             session_id=ring_schema.reference.session_id, ring=ring
         )
 
+        # Summary levels for whole sequence views of the ring
+        store_zoom_pyramid(ring=ring)
+
         return {"success": True, "result": ring.model_dump()}
 
     except Exception as e:
@@ -348,61 +598,119 @@ def process_genomad_ring(
     try:
         ring_schema = GenomadRingSchema(**genomad_ring_schema)
 
-        storage_path = (
-            settings.WORK_DIRECTORY / ring_schema.reference.session_id / "storage"
-        )
-        storage_file = (
-            storage_path
-            / f"{ring_schema.reference.reference_id}__{ring_schema.reference.sequence.id}__{ring_schema.window_size}__{ring_schema.min_window_score}.tsv"
+        # geNomad is only executed if its output is not cached for the bases
+        # of the reference sequence, thresholds are applied to the output
+        with get_genomad_output(
+            fasta=Path(reference_file_path),
+            seq_id=ring_schema.reference.sequence.id,
+            window_size=ring_schema.window_size,
+        ) as output_file:
+            ring = create_genomad_ring(ring_schema=ring_schema, output_file=output_file)
+
+        if not ring.data:
+            raise ValueError("geNomad executed correctly but no outputs were found")
+
+        # Ring index is modified for database in this function
+        ring = update_rings_or_create_session(
+            session_id=ring_schema.reference.session_id, ring=ring
         )
 
+        # Summary levels for whole sequence views of the ring
+        store_zoom_pyramid(ring=ring)
+
+        return {"success": True, "result": ring.model_dump()}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+# geNomad ring of a long reference sequence, geNomad is executed for shards
+# of the sequence windows in a group of tasks and the aggregated outputs of
+# the shards are concatenated into the cached output in a chord callback
+
+
+@celery_app.task
+def process_genomad_shard(
+    reference_file_path: Annotated[
+        str, "Path to reference file in the session directory"
+    ],
+    genomad_ring_schema: Annotated[dict, "Model dump of GenomadRingSchema"],
+    region: Annotated[Tuple[int, int], "Start and end of the windows of the shard"],
+    output_file_path: Annotated[str, "Path to output file of the shard"],
+    sequence_hash: Annotated[str, "Digest of the bases of the reference sequence"],
+):
+
+    try:
+        ring_schema = GenomadRingSchema(**genomad_ring_schema)
+
+        # Shards are not executed if the output of the sequence is cached
+        with get_genomad_cache().lookup(
+            key=get_genomad_output_key(
+                sequence_hash=sequence_hash, window_size=ring_schema.window_size
+            )
+        ) as entry_directory:
+            if entry_directory is not None:
+                return {"success": True, "result": {"cached": True}}
+
         with create_tmp_directory(
             root_dir=settings.WORK_DIRECTORY
         ) as working_directory:
+            output_file = run_genomad(
+                fasta=Path(reference_file_path),
+                seq_id=ring_schema.reference.sequence.id,
+                window_size=ring_schema.window_size,
+                working_directory=working_directory,
+                region=region,
+            )
 
-            # Check if we have stored the output data already for this reference sequence
+            # Outputs are passed to the callback through the working directory
+            Path(output_file_path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(output_file, output_file_path)
 
-            if storage_file.exists():
-                output_file = storage_file
-            else:
-                try:
-                    output_file = run_genomad(
-                        fasta=Path(reference_file_path),
-                        seq_id=ring_schema.reference.sequence.id,
-                        window_size=ring_schema.window_size,
-                        working_directory=working_directory,
-                    )
-                except:  # fails with generic message from subcommand exception even during timeout
-                    shutil.rmtree(working_directory)
-                    raise
-
-                storage_path.mkdir(exist_ok=True)
-                shutil.copy(str(output_file), str(storage_file))
-
-            if ring_schema.ring_type == RingType.LABEL:
-                ring: LabelRing = LabelRing.from_genomad_output(
-                    file=output_file,
-                    reference=ring_schema.reference,
-                    min_window_score=ring_schema.min_window_score,
-                    min_segment_score=ring_schema.min_segment_score,
-                    min_segment_length=ring_schema.min_segment_length,
-                    prediction_classes=ring_schema.prediction_classes,
-                )
-            elif ring_schema.ring_type == RingType.ANNOTATION:
-                ring: AnnotationRing = AnnotationRing.from_genomad_output(
-                    file=output_file,
-                    reference=ring_schema.reference,
-                    min_window_score=ring_schema.min_window_score,
-                    min_segment_score=ring_schema.min_segment_score,
-                    min_segment_length=ring_schema.min_segment_length,
-                    prediction_classes=ring_schema.prediction_classes,
-                )
-            else:
-                ring: GenomadRing = GenomadRing.from_genomad_output(
-                    file=output_file,
-                    reference=ring_schema.reference,
-                    min_window_score=ring_schema.min_window_score,
-                )
+        return {"success": True, "result": {"cached": False}}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@celery_app.task
+def process_genomad_ring_shards(
+    results: Annotated[List[dict], "Results of process_genomad_shard"],
+    reference_file_path: Annotated[
+        str, "Path to reference file in the session directory"
+    ],
+    genomad_ring_schema: Annotated[dict, "Model dump of GenomadRingSchema"],
+    shards_directory: Annotated[str, "Directory of the output files of the shards"],
+    sequence_hash: Annotated[str, "Digest of the bases of the reference sequence"],
+):
+
+    try:
+        ring_schema = GenomadRingSchema(**genomad_ring_schema)
+
+        for result in results:
+            if not result["success"]:
+                raise ValueError(result["error"])
+
+        def build(entry_directory: Path):
+            output_files = [
+                Path(shards_directory) / f"{i}.tsv" for i in range(len(results))
+            ]
+            if not all(output_file.exists() for output_file in output_files):
+                raise ValueError("geNomad output of the shards could not be found")
+            concat_genomad_outputs(
+                output_files=output_files,
+                output_file=entry_directory / GENOMAD_OUTPUT_FILE,
+            )
+
+        # Output of the shards is cached as the output of the whole sequence
+        with get_genomad_cache().keyed_entry(
+            key=get_genomad_output_key(
+                sequence_hash=sequence_hash, window_size=ring_schema.window_size
+            ),
+            build=build,
+        ) as entry_directory:
+            ring = create_genomad_ring(
+                ring_schema=ring_schema,
+                output_file=entry_directory / GENOMAD_OUTPUT_FILE,
+            )
 
         if not ring.data:
             raise ValueError("geNomad executed correctly but no outputs were found")
@@ -412,18 +720,176 @@ def process_genomad_ring(
             session_id=ring_schema.reference.session_id, ring=ring
         )
 
+        # Summary levels for whole sequence views of the ring
+        store_zoom_pyramid(ring=ring)
+
         return {"success": True, "result": ring.model_dump()}
     except Exception as e:
         return {"success": False, "error": str(e)}
+    finally:
+        shutil.rmtree(shards_directory, ignore_errors=True)
+
+
+def create_genomad_ring(
+    ring_schema: GenomadRingSchema, output_file: Path
+) -> LabelRing | AnnotationRing | GenomadRing:
+    """Ring of the requested type from the aggregated output of geNomad"""
+
+    if ring_schema.ring_type == RingType.LABEL:
+        return LabelRing.from_genomad_output(
+            file=output_file,
+            reference=ring_schema.reference,
+            min_window_score=ring_schema.min_window_score,
+            min_segment_score=ring_schema.min_segment_score,
+            min_segment_length=ring_schema.min_segment_length,
+            prediction_classes=ring_schema.prediction_classes,
+        )
+    elif ring_schema.ring_type == RingType.ANNOTATION:
+        return AnnotationRing.from_genomad_output(
+            file=output_file,
+            reference=ring_schema.reference,
+            min_window_score=ring_schema.min_window_score,
+            min_segment_score=ring_schema.min_segment_score,
+            min_segment_length=ring_schema.min_segment_length,
+            prediction_classes=ring_schema.prediction_classes,
+        )
+    else:
+        return GenomadRing.from_genomad_output(
+            file=output_file,
+            reference=ring_schema.reference,
+            min_window_score=ring_schema.min_window_score,
+        )
+
+
+def plan_genomad_shards(
+    sequence_length: int, window_size: int
+) -> List[Tuple[int, int]]:
+    """
+    Regions of consecutive windows of a reference sequence for geNomad across workers,
+    the number of shards grows with the sequence length up to the number of workers
+    available for geNomad, no shards are planned for short sequences
+    """
+
+    windows = -(-sequence_length // window_size)
+    shards = min(
+        settings.GENOMAD_SHARD_WORKERS,
+        -(-sequence_length // settings.GENOMAD_SHARD_MIN_LENGTH),
+        windows,
+    )
+    if shards <= 1:
+        return []
+
+    windows_per_shard = -(-windows // shards)
+    return [
+        (
+            start * window_size,
+            min((start + windows_per_shard) * window_size, sequence_length),
+        )
+        for start in range(0, windows, windows_per_shard)
+    ]
+
+
+def get_genomad_shards_directory(run_id: str) -> Path:
+    """Directory of the output files of a sharded geNomad run"""
+    return settings.WORK_DIRECTORY / "chunks" / run_id
+
+
+def concat_genomad_outputs(output_files: List[Path], output_file: Path):
+    """Concatenates aggregated classification tables below the header of the first table"""
+
+    with output_file.open("wb") as concatenated:
+        for i, shard_output in enumerate(output_files):
+            with shard_output.open("rb") as shard:
+                header = shard.readline()
+                if i == 0:
+                    concatenated.write(header)
+                shutil.copyfileobj(shard, concatenated)
 
 
 # Subprocess helpers
 
+GENOMAD_OUTPUT_FILE = "aggregated_classification.tsv"
+
+
+@contextlib.contextmanager
+def get_genomad_output(
+    fasta: Path, seq_id: str, window_size: int
+) -> Generator[Path, None, None]:
+    """
+    Unfiltered geNomad output of the windows of a reference sequence from the geNomad
+    cache, geNomad is executed and its output is stored in the cache if it is not
+    cached, the output file is valid within the context
+    """
+
+    def build(entry_directory: Path):
+        with create_tmp_directory(
+            root_dir=settings.WORK_DIRECTORY
+        ) as working_directory:
+            output_file = run_genomad(
+                fasta=fasta,
+                seq_id=seq_id,
+                window_size=window_size,
+                working_directory=working_directory,
+            )
+            shutil.copy(output_file, entry_directory / GENOMAD_OUTPUT_FILE)
+
+    with get_genomad_cache().keyed_entry(
+        key=get_genomad_output_key(
+            sequence_hash=get_sequence_hash(fasta_file=fasta, seq_id=seq_id),
+            window_size=window_size,
+        ),
+        build=build,
+    ) as entry_directory:
+        yield entry_directory / GENOMAD_OUTPUT_FILE
+
+
+def get_genomad_output_key(sequence_hash: str, window_size: int) -> str:
+    """Cache key of the geNomad output with the geNomad version of the worker"""
+
+    return get_genomad_key(
+        sequence_hash=sequence_hash,
+        window_size=window_size,
+        version=get_genomad_version(),
+        flags=get_genomad_flags(),
+    )
+
+
+def get_genomad_flags() -> List[str]:
+    """Command line flags of geNomad that change its outputs"""
+    return ["--relaxed"]
+
+
+@functools.lru_cache
+def get_genomad_version() -> str:
+    """Versions of geNomad and its database, read once per worker process"""
+
+    try:
+        version = subprocess.run(
+            ["genomad", "--version"], check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except:
+        raise ValueError(
+            "Failed to run `genomad` command on worker"
+        )  # exception prevents command leakage on resource failure
+
+    database_version = settings.GENOMAD_DATABASE / "version.txt"
+    if database_version.exists():
+        version += f" (database {database_version.read_text().strip()})"
+
+    return version
+
 
 def run_genomad(
-    fasta: Path, seq_id: str, window_size: int, working_directory: Path
+    fasta: Path,
+    seq_id: str,
+    window_size: int,
+    working_directory: Path,
+    region: Tuple[int, int] | None = None,
 ) -> Path:
-    """Slices the reference into non overlapping sequences (window_size) and runs geNomad"""
+    """
+    Slices the reference into non overlapping sequences (window_size) and runs geNomad,
+    only the windows in a region of the sequence (multiples of window_size) if provided
+    """
 
     # Database is downloaded as part of the Docker build stage in Dockerfile.server
 
@@ -432,13 +898,14 @@ def run_genomad(
 
     sliced_fasta = working_directory / "sliced.fasta"
 
-    seq_slices = slice_fasta_sequences(
+    seq_slices = stream_fasta_slices(
         fasta_file=fasta,
+        outfile=sliced_fasta,
         slice_size=window_size,
         sequence_subset=[seq_id],
         name_split="__",
         range_split="..",
-        outfile=sliced_fasta,
+        region=region,
     )
 
     if not seq_slices:
@@ -450,7 +917,7 @@ def run_genomad(
         "--threads",
         str(settings.CELERY_THREADS_PER_PROCESS),
         "--cleanup",
-        "--relaxed",
+        *get_genomad_flags(),
     ]
     if settings.GENOMAD_SPLITS_ARG is not None:
         base_command += [
@@ -483,13 +950,226 @@ def run_genomad(
     return aggregated_output
 
 
-def run_blast(query_fasta: Path, reference_fasta: Path, working_directory: Path):
+def get_blast_hits(
+    reference_fasta: Path,
+    query_fasta: Path,
+    sequence_id: str | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> pandas.DataFrame:
+    """
+    Unfiltered hits of a query genome against a reference genome (or a sequence of
+    the reference genome) from the hits cache, BLAST is executed and its hits are
+    stored in the cache if they are not cached
+    """
+
+    def build(entry_directory: Path):
+        with create_tmp_directory(
+            root_dir=settings.WORK_DIRECTORY
+        ) as working_directory:
+            save_blastn_hits(
+                hits=stream_blast(
+                    query_fasta=query_fasta,
+                    reference_fasta=reference_fasta,
+                    working_directory=working_directory,
+                    sequence_id=sequence_id,
+                    columns=BLASTN_SEGMENT_COLUMNS,
+                    progress=progress,
+                ),
+                file_path=entry_directory / "hits.npz",
+            )
+
+    with get_blast_hits_cache().keyed_entry(
+        key=get_blast_hits_key(
+            reference_fasta=reference_fasta,
+            query_fasta=query_fasta,
+            sequence_id=sequence_id,
+        ),
+        build=build,
+    ) as entry_directory:
+        return load_blastn_hits(file_path=entry_directory / "hits.npz")
+
+
+def plan_blast_query_chunks(
+    reference_fasta: Path, query_fasta: Path, sequence_id: str | None = None
+) -> List[List[Tuple[str, int, int]]]:
+    """
+    Overlapping slices of a query genome in chunks for BLAST across workers, no
+    chunks are planned if the genome is small, not indexed or its hits are cached
+    """
+
+    if not FastaIndex.available(query_fasta):
+        return []
+
+    with FastaIndex(query_fasta) as fasta:
+        lengths = fasta.lengths()
+
+    if sum(lengths.values()) < settings.BLAST_QUERY_CHUNK_MIN_LENGTH:
+        return []
+
+    with get_blast_hits_cache().lookup(
+        key=get_blast_hits_key(
+            reference_fasta=reference_fasta,
+            query_fasta=query_fasta,
+            sequence_id=sequence_id,
+        )
+    ) as entry_directory:
+        if entry_directory is not None:
+            return []
+
+    return plan_fasta_chunks(
+        lengths=lengths,
+        chunk_size=settings.BLAST_QUERY_CHUNK_SIZE,
+        overlap=settings.BLAST_QUERY_CHUNK_OVERLAP,
+    )
+
+
+def get_blast_chunks_directory(run_id: str) -> Path:
+    """Directory of the hits files of a query-chunked BLAST run"""
+    return settings.WORK_DIRECTORY / "chunks" / run_id
+
+
+def cache_blast_hits(
+    reference_fasta: Path,
+    query_fastas: List[Path],
+    sequence_id: str | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> List[int]:
+    """
+    Stores the unfiltered hits of multiple query genomes against a reference genome
+    (or a sequence of the reference genome) in the hits cache, BLAST is executed in
+    a single multiplexed run for the genomes without cached hits
+
+    :return: Number of hits for each query genome
     """
-    Runs a nucleotide BLAST comparing a query genome in FASTA format with a reference genome.
+
+    hits_cache = get_blast_hits_cache()
+    keys = [
+        get_blast_hits_key(
+            reference_fasta=reference_fasta,
+            query_fasta=query_fasta,
+            sequence_id=sequence_id,
+        )
+        for query_fasta in query_fastas
+    ]
+
+    hit_counts, uncached = [0] * len(keys), []
+    for i, key in enumerate(keys):
+        with hits_cache.lookup(key=key) as entry_directory:
+            if entry_directory is None:
+                uncached.append(i)
+            else:
+                hit_counts[i] = len(
+                    load_blastn_hits(file_path=entry_directory / "hits.npz")
+                )
+
+    if uncached:
+        with create_tmp_directory(
+            root_dir=settings.WORK_DIRECTORY
+        ) as working_directory:
+            demultiplexed_hits = run_blast_multiplexed(
+                query_fastas=[query_fastas[i] for i in uncached],
+                reference_fasta=reference_fasta,
+                working_directory=working_directory,
+                sequence_id=sequence_id,
+                progress=progress,
+            )
+            for i, hits in zip(uncached, demultiplexed_hits):
+                with hits_cache.keyed_entry(
+                    key=keys[i],
+                    build=lambda entry_directory: save_blastn_hits(
+                        hits=hits[BLASTN_SEGMENT_COLUMNS],
+                        file_path=entry_directory / "hits.npz",
+                    ),
+                ):
+                    hit_counts[i] = len(hits)
+
+    return hit_counts
+
+
+def filter_cached_blast_hits(
+    reference_fasta: Path, query_fasta: Path, ring_schema: BlastRingSchema
+) -> BlastRing | None:
+    """
+    BLAST ring from cached unfiltered hits with the filters of the ring schema,
+    returns None if no hits are cached for the reference and genome files
+    """
+
+    with get_blast_hits_cache().lookup(
+        key=get_blast_hits_key(
+            reference_fasta=reference_fasta,
+            query_fasta=query_fasta,
+            sequence_id=ring_schema.reference.sequence.id,
+        )
+    ) as entry_directory:
+        if entry_directory is None:
+            return None
+        hits = load_blastn_hits(file_path=entry_directory / "hits.npz")
+
+    return BlastRing.from_blast_hits(
+        hits=hits,
+        reference=ring_schema.reference,
+        min_identity=ring_schema.min_identity,
+        min_alignment=ring_schema.min_alignment,
+        min_evalue=ring_schema.min_evalue,
+    )
+
+
+def stream_blast(
+    query_fasta: Path,
+    reference_fasta: Path,
+    working_directory: Path,
+    sequence_id: str | None = None,
+    use_database: bool = False,
+    columns: List[str] | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> pandas.DataFrame:
+    """
+    Runs a nucleotide BLAST comparing a query genome in FASTA format with a reference
+    genome, the tabular output is parsed from the `blastn` stdout while the alignment
+    is running and no output file is written.
 
     :param query_fasta: Path to the query genome FASTA file.
     :param reference_fasta: Path to the reference genome FASTA file.
-    :param output_file: Path to save the BLAST results.
+    :param working_directory: Path to the directory of the BLAST subject files.
+    :param sequence_id: Reference sequence to align against (whole reference if not provided).
+    :param use_database: Align against a database for multi-threaded runs on large queries.
+    :param columns: Subset of BlastnEntry fields to parse, all fields if not provided.
+    :param progress: Called with the number of hits parsed so far after each chunk.
+    :return: Hits as read by `read_blastn_output` from an output file.
+    """
+
+    with blast_subject(
+        query_fasta=query_fasta,
+        reference_fasta=reference_fasta,
+        working_directory=working_directory,
+        sequence_id=sequence_id,
+        use_database=use_database,
+    ) as subject:
+        chunks = []
+        with stream_blastn(query_fasta=query_fasta, **subject) as stdout:
+            hits = 0
+            for chunk in read_blastn_stream(
+                stdout, columns=columns, chunksize=settings.BLAST_STREAM_CHUNK_SIZE
+            ):
+                chunks.append(chunk)
+                hits += len(chunk)
+                if progress is not None:
+                    progress(hits)
+
+    return concat_blastn_hits(chunks, columns=columns)
+
+
+@contextlib.contextmanager
+def blast_subject(
+    query_fasta: Path,
+    reference_fasta: Path,
+    working_directory: Path,
+    sequence_id: str | None = None,
+    use_database: bool = False,
+) -> Generator[dict, None, None]:
+    """
+    Subject of a nucleotide BLAST against a reference genome (or a sequence of the
+    reference genome) as `stream_blastn` arguments, databases are valid within the context.
     """
 
     # Check if files exist
@@ -498,10 +1178,77 @@ def run_blast(query_fasta: Path, reference_fasta: Path, working_directory: Path)
     if not reference_fasta.exists():
         raise FileNotFoundError(f"Reference file not found: {reference_fasta}")
 
-    db_file = working_directory / "refdb"
-    output_file = working_directory / "results.tsv"
+    # Only the selected reference sequence is aligned against, hits
+    # on other sequences would be discarded by the ring filters
+    subject_length = None
+    if sequence_id:
+        subject_fasta = working_directory / "subject.fasta"
+        subject_length = write_fasta_sequences(
+            fasta_file=reference_fasta,
+            sequence_ids=[sequence_id],
+            outfile=subject_fasta,
+        )[sequence_id]
+        reference_fasta = subject_fasta
+
+    if (
+        not use_database
+        and subject_length is not None
+        and subject_length <= settings.BLAST_SUBJECT_MAX_LENGTH
+    ):
+        # Small subjects are aligned without building a database
+        yield {"subject_fasta": reference_fasta}
+    else:
+        # BLAST database from reference genome, shared across tasks
+        # with the same reference file contents
+        with get_blast_database_cache().entry(
+            file_path=reference_fasta, build=make_blast_database
+        ) as database_directory:
+            yield {"db_file": database_directory / "refdb"}
+
+
+def run_blast_multiplexed(
+    query_fastas: List[Path],
+    reference_fasta: Path,
+    working_directory: Path,
+    sequence_id: str | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> List[pandas.DataFrame]:
+    """
+    Runs a single multi-threaded nucleotide BLAST of multiple query genomes against a
+    reference genome, the query genomes are concatenated with identifier prefixes
+    and the hits are demultiplexed into the hits of each query genome
+
+    :param query_fastas: Paths to the query genome FASTA files.
+    :param reference_fasta: Path to the reference genome FASTA file.
+    :param working_directory: Path to the directory of the BLAST results.
+    :param sequence_id: Reference sequence to align against (whole reference if not provided).
+    :param progress: Called with the number of hits parsed so far during the alignment.
+    :return: Hits of each query genome in the order of the query genomes.
+    """
+
+    for query_fasta in query_fastas:
+        if not query_fasta.exists():
+            raise FileNotFoundError(f"Query file not found: {query_fasta}")
+
+    multiplexed_fasta = working_directory / "queries.fasta"
+    multiplex_fasta_files(fasta_files=query_fastas, outfile=multiplexed_fasta)
+
+    hits = stream_blast(
+        query_fasta=multiplexed_fasta,
+        reference_fasta=reference_fasta,
+        working_directory=working_directory,
+        sequence_id=sequence_id,
+        use_database=len(query_fastas) > 1,
+        columns=["query_id", *BLASTN_SEGMENT_COLUMNS],
+        progress=progress,
+    )
+
+    return demultiplex_blastn_hits(hits=hits, queries=len(query_fastas))
+
+
+def make_blast_database(reference_fasta: Path, database_directory: Path):
+    """Creates a nucleotide BLAST database (refdb) from a reference genome"""
 
-    # Create BLAST database from reference genome
     try:
         subprocess.run(
             [
@@ -511,7 +1258,7 @@ def run_blast(query_fasta: Path, reference_fasta: Path, working_directory: Path)
                 "-dbtype",
                 "nucl",
                 "-out",
-                str(db_file),
+                str(database_directory / "refdb"),
             ],
             check=True,
         )
@@ -520,83 +1267,114 @@ def run_blast(query_fasta: Path, reference_fasta: Path, working_directory: Path)
             "Failed to run `makeblastdb` command on worker"
         )  # exception prevents command leakage on resource failure
 
-    # Run BLASTn
+
+def get_blastn_command(
+    query_fasta: Path,
+    db_file: Path | None = None,
+    subject_fasta: Path | None = None,
+) -> List[str]:
+    """
+    BLASTn command of a query genome against a BLAST database or a subject
+    FASTA file without database (tabular output to stdout)
+    """
+
+    if subject_fasta is not None:
+        target = ["-subject", str(subject_fasta)]  # single-threaded
+    else:
+        target = [
+            "-num_threads",
+            str(settings.CELERY_THREADS_PER_PROCESS),
+            "-db",
+            str(db_file),
+        ]
+
+    return ["blastn", *target, "-query", str(query_fasta), "-outfmt", "6"]
+
+
+@contextlib.contextmanager
+def stream_blastn(
+    query_fasta: Path,
+    db_file: Path | None = None,
+    subject_fasta: Path | None = None,
+) -> Generator[IO[bytes], None, None]:
+    """
+    Runs BLASTn of a query genome against a BLAST database or a subject
+    FASTA file without database, yields the tabular output stream
+    """
+
     try:
-        subprocess.run(
-            [
-                "blastn",
-                "-num_threads",
-                str(settings.CELERY_THREADS_PER_PROCESS),
-                "-query",
-                str(query_fasta),
-                "-db",
-                str(db_file),
-                "-out",
-                str(output_file),
-                "-outfmt",
-                "6",
-            ],
-            check=True,
+        process = subprocess.Popen(
+            get_blastn_command(
+                query_fasta=query_fasta,
+                db_file=db_file,
+                subject_fasta=subject_fasta,
+            ),
+            stdout=subprocess.PIPE,
         )
     except:
+        raise ValueError("Failed to run `blastn` command on worker")
+
+    try:
+        with process.stdout:
+            yield process.stdout
+    except:
+        process.kill()
+        raise
+    finally:
+        returncode = process.wait()
+
+    if returncode != 0:
         raise ValueError(
             "Failed to run `blastn` command on worker"
         )  # exception prevents command leakage on resource failure
 
-    if not output_file.exists() and not output_file.is_file():
-        raise ValueError("Could not find BLAST output file")
-
-    return output_file
-
 
 # Validation helpers
 
 
 def validate_fasta(path: Path) -> Tuple[int, int, Selections]:
 
-    records = [r for r in SeqIO.parse(str(path), "fasta")]
-    num_records = len(records)
-
-    for record in records:
-        if not validate_sequence(str(record.seq)):
+    # Single streaming pass, records are not read into memory
+    records = []
+    for record in scan_fasta_records(file_path=path):
+        if not record.valid:
             raise ValueError(
                 f"Sequence {record.id} contains invalid nucleotides (IUPAC ambiguous allowed)"
             )
+        records.append(record)
+
+    sequences = [Sequence(id=record.id, length=record.length) for record in records]
+    num_records = len(sequences)
 
     if num_records < 1:
         raise ValueError("Sequence files cannot be empty")
 
-    total_length = sum([len(r.seq) for r in records])
+    # Index for random access to single sequences (<file>.fai), files
+    # with irregular line lengths are not indexed and read in full
+    write_fasta_index(fasta_file=path, records=records)
+
+    total_length = sum(sequence.length for sequence in sequences)
 
     return (
         total_length,
         num_records,
-        Selections(sequences=[Sequence(id=r.id, length=len(r.seq)) for r in records]),
+        Selections(sequences=sequences),
     )
 
 
 def validate_genbank(path: Path) -> Tuple[int, Selections]:
 
-    if not validate_genbank_file(file_path=path):
-        raise ValueError("Invalid Genbank file format")
-
-    records = [r for r in SeqIO.parse(str(path), "gb")]
-    num_records = len(records)
+    # Single streaming pass, records are not read into memory
+    sequences, unique_features, unique_qualifiers = summarize_genbank_file(
+        file_path=path
+    )
+    num_records = len(sequences)
 
     if num_records < 1:
         raise ValueError("Genbank files cannot be empty")
 
-    unique_features = set()
-    unique_qualifiers = set()
-
-    for record in records:
-        for feature in record.features:
-            unique_features.add(feature.type)
-            for key in feature.qualifiers.keys():
-                unique_qualifiers.add(key)
-
     return num_records, Selections(
-        sequences=[Sequence(id=r.id, length=len(r.seq)) for r in records],
+        sequences=[Sequence(id=seq_id, length=length) for seq_id, length in sequences],
         qualifiers=list(unique_qualifiers),
         features=list(unique_features),
     )
@@ -645,30 +1423,6 @@ def validate_sequence(sequence: str) -> bool:
     return all(nucleotide in valid_nucleotides for nucleotide in sequence.upper())
 
 
-def validate_genbank_file(file_path: Path):
-    """
-    Validates if a file is in the GenBank format.
-
-    Args:
-    file_path (str): Path to the GenBank file.
-
-    Returns:
-    bool: True if the file is in the GenBank format, False otherwise.
-    """
-
-    with file_path.open("r") as file:
-        first_line = file.readline().strip()
-        if not first_line.startswith("LOCUS"):
-            return False  # GenBank file should start with 'LOCUS'
-
-        # Read the file until the end to find the terminating "//"
-        for line in file:
-            if line.strip() == "//":
-                return True  # Found the terminating line
-
-        return False  # Terminating "//" line not found
-
-
 # Database helpers (workers are not async)
 
 # No further error handling as any errors here will bubble
@@ -699,73 +1453,263 @@ def update_files_or_create_session(session_file: SessionFile) -> str:
     return session_file.session_id
 
 
-def update_rings_or_create_session(session_id: str, ring: Ring) -> str:
+def update_rings_or_create_session(session_id: str, ring: Ring) -> Ring:
+
+    return insert_rings_or_create_session(session_id=session_id, rings=[ring])[0]
+
+
+def insert_rings_or_create_session(session_id: str, rings: List[Ring]) -> List[Ring]:
+    """
+    Appends rings in order to a session with a single atomic update, indices of the
+    rings are assigned in the update so that rings inserted concurrently by other
+    workers are neither overwritten nor assigned the same index
+    """
 
     sessions_collection = get_session_collection_pymongo()
 
-    # Check if session exists and update or create
-    session = sessions_collection.find_one({"id": session_id})
+    # Segments are stored before the rings are added to the session
+    generations = {
+        ring.id: store_ring_segments(
+            session_id=session_id, ring_id=ring.id, segments=dump_ring_segments(ring)
+        )
+        for ring in rings
+    }
 
-    if session:
-        session_model = Session(**session)
-
-        # Filter rings with the same reference sequence
-        same_ref_rings = [
-            r
-            for r in session_model.rings
-            if r.reference.reference_id == ring.reference.reference_id
-            and r.reference.sequence.id == ring.reference.sequence.id
+    # Session is created by the update if it does not exist
+    pipeline = [
+        {
+            "$set": {
+                "date": {"$ifNull": ["$date", datetime.now().isoformat()]},
+                "files": {"$ifNull": ["$files", []]},
+                "rings": {"$ifNull": ["$rings", []]},
+            }
+        },
+        *[
+            {"$set": {"rings": get_ring_insertion(ring, generations[ring.id])}}
+            for ring in rings
+        ],
+    ]
+
+    insert = functools.partial(
+        sessions_collection.find_one_and_update,
+        {"id": session_id},
+        pipeline,
+        projection={"_id": 0, "rings.id": 1, "rings.index": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    # Concurrent upserts of a new session fail on the unique index on `id`
+    # (`ensure_indexes`) except for one, the others update the created session
+    try:
+        try:
+            session = insert()
+        except DuplicateKeyError:
+            session = insert()
+    except Exception:
+        # Segments of rings that were not added to the session are not read
+        delete_ring_segment_generations(session_id=session_id, generations=generations)
+        raise
+
+    # Return rings because we modify their index and the
+    # rings themselves are returned in response
+    indices = {ring["id"]: ring["index"] for ring in session["rings"]}
+    for ring in rings:
+        ring.index = indices[ring.id]
+
+    return rings
+
+
+def get_ring_insertion(ring: Ring, generation: str | None = None) -> dict:
+    """
+    Aggregation expression of the session rings with a ring appended to the rings of
+    its reference sequence: the ring is inserted before the label ring of the sequence
+    which is moved to the last index, other rings are not modified
+    """
+
+    # Identifiers (e.g. sequence identifiers from FASTA headers) starting with `$`
+    # would be read as field paths or variables in the expressions
+    reference_id = {"$literal": ring.reference.reference_id}
+    sequence_id = {"$literal": ring.reference.sequence.id}
+    same_reference = {
+        "$and": [
+            {"$eq": ["$$ring.reference.reference_id", reference_id]},
+            {"$eq": ["$$ring.reference.sequence.id", sequence_id]},
         ]
+    }
+    label_ring = {"$and": [same_reference, {"$eq": ["$$ring.type", RingType.LABEL]}]}
+
+    count = {
+        "$size": {"$filter": {"input": "$rings", "as": "ring", "cond": same_reference}}
+    }
+    has_label_ring = {
+        "$in": [True, {"$map": {"input": "$rings", "as": "ring", "in": label_ring}}]
+    }
+    moved_label_ring = {
+        "$map": {
+            "input": "$rings",
+            "as": "ring",
+            "in": {
+                "$cond": [
+                    label_ring,
+                    {"$mergeObjects": ["$$ring", {"index": "$$count"}]},
+                    "$$ring",
+                ]
+            },
+        }
+    }
+
+    def append(rings: dict | str, index: dict | str) -> dict:
+        inserted_ring = {"$mergeObjects": ["$$inserted", {"index": index}]}
+        return {"$concatArrays": [rings, [inserted_ring]]}
+
+    variables = {
+        "inserted": {
+            "$literal": {**dump_ring_metadata(ring), "generation": generation}
+        },
+        "count": count,
+    }
+
+    if ring.type == RingType.LABEL:
+        return {"$let": {"vars": variables, "in": append("$rings", "$$count")}}
+
+    return {
+        "$let": {
+            "vars": {**variables, "has_label_ring": has_label_ring},
+            "in": {
+                "$cond": [
+                    "$$has_label_ring",
+                    append(moved_label_ring, {"$subtract": ["$$count", 1]}),
+                    append("$rings", "$$count"),
+                ]
+            },
+        }
+    }
 
-        # Sort these rings by their index
-        same_ref_rings.sort(key=lambda r: r.index)
 
-        # Check if a RingType.LABEL ring with the same reference exists
-        label_ring = next((r for r in same_ref_rings if r.type == RingType.LABEL), None)
+def replace_ring_data(session_id: str, ring: Ring) -> Ring | None:
+    """
+    Replaces the segments of a ring of the same type and identifier in a session,
+    other fields of the stored ring (index, color, title ...) are kept. Returns
+    the updated ring or None if the ring does not exist in the session.
+    """
 
-        # Assign the index for the new Ring
-        if label_ring and ring.type != RingType.LABEL:
-            # Set to the second-last position
-            ring.index = len(same_ref_rings) - 1
-            # Move the label ring to the last index if it's not already
-            if label_ring.index != len(same_ref_rings):
-                label_ring.index = len(same_ref_rings)
-        else:
-            # Otherwise, assign the last index
-            ring.index = len(same_ref_rings)
+    sessions_collection = get_session_collection_pymongo()
 
-        # Add the new ring to the session rings
-        session_model.rings.append(ring)
+    # Segments are replaced by setting the generation of the new segments
+    # on the ring, the replaced generation is deleted after the update
+    segments = dump_ring_segments(ring)
+    generation = store_ring_segments(
+        session_id=session_id, ring_id=ring.id, segments=segments
+    )
 
-        # Update the session in the database
-        sessions_collection.update_one(
-            {"id": session_id},
-            {"$set": {"rings": [r.model_dump() for r in session_model.rings]}},
+    try:
+        result = sessions_collection.find_one_and_update(
+            {
+                "id": session_id,
+                "rings": {"$elemMatch": {"id": ring.id, "type": ring.type}},
+            },
+            {
+                "$set": {
+                    "rings.$.reference": ring.reference.model_dump(),
+                    "rings.$.generation": generation,
+                }
+            },
+            projection={"rings": {"$elemMatch": {"id": ring.id}}},
+            return_document=ReturnDocument.BEFORE,
         )
-    else:
-        new_session = Session(
-            id=session_id, date=datetime.now().isoformat(), files=[], rings=[ring]
+    except Exception:
+        delete_ring_segment_generations(
+            session_id=session_id, generations={ring.id: generation}
         )
-        sessions_collection.insert_one(new_session.model_dump())
+        raise
+
+    if result is None:
+        delete_ring_segment_generations(
+            session_id=session_id, generations={ring.id: generation}
+        )
+        return None
+
+    (replaced_ring,) = result["rings"]
+    delete_ring_segment_generations(
+        session_id=session_id,
+        generations={ring.id: replaced_ring.get("generation")},
+    )
+
+    return Ring(
+        **{
+            **replaced_ring,
+            "reference": ring.reference.model_dump(),
+            "data": segments,
+        }
+    )
+
+
+def dump_ring_metadata(ring: Ring) -> dict:
+    """Ring as stored in the session document, segments are stored separately"""
+    return ring.model_dump(exclude={"data"})
+
+
+def dump_ring_segments(ring: Ring) -> List[dict]:
+    return ring.model_dump(include={"data"})["data"]
 
-    # Return ring because we modify its index and the
-    # ring itself is returned in response
-    return ring
+
+def get_zoom_pyramid_file(session_id: str, ring_id: str) -> Path:
+    return settings.WORK_DIRECTORY / session_id / "storage" / f"{ring_id}.zoom.npz"
+
+
+def store_zoom_pyramid(ring: Ring) -> Path:
+    zoom_file = get_zoom_pyramid_file(
+        session_id=ring.reference.session_id, ring_id=ring.id
+    )
+    zoom_file.parent.mkdir(parents=True, exist_ok=True)
+    ZoomPyramid.from_ring(ring=ring).save(path=zoom_file)
+    return zoom_file
 
 
 def update_session_or_create_session(session_update: Session):
 
     sessions_collection = get_session_collection_pymongo()
 
-    # Check if session exists and update or create
-    session = sessions_collection.find_one({"id": session_update.id})
+    # Segments of the rings are stored separately from the session
+    generations = {
+        ring.id: store_ring_segments(
+            session_id=session_update.id,
+            ring_id=ring.id,
+            segments=dump_ring_segments(ring),
+        )
+        for ring in session_update.rings
+    }
+
+    session_document = {
+        **session_update.model_dump(exclude={"rings"}),
+        "rings": [
+            {**dump_ring_metadata(ring), "generation": generations[ring.id]}
+            for ring in session_update.rings
+        ],
+    }
+
+    # Check if session exists and update or create, segments
+    # of the replaced rings are deleted after the update
+    try:
+        session = sessions_collection.find_one_and_update(
+            {"id": session_update.id},
+            {"$set": session_document},
+            projection={"_id": 0, "rings.id": 1, "rings.generation": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if session is None:
+            sessions_collection.insert_one(session_document)
+    except Exception:
+        delete_ring_segment_generations(
+            session_id=session_update.id, generations=generations
+        )
+        raise
 
-    if session:
-        sessions_collection.update_one(
-            {"id": session_update.id}, {"$set": session_update.model_dump()}
+    if session is not None:
+        delete_ring_segment_generations(
+            session_id=session_update.id,
+            generations=get_ring_generations(session.get("rings", [])),
         )
-    else:
-        sessions_collection.insert_one(session_update.model_dump())
 
     return session_update.id  # new id
 
@@ -786,53 +1730,45 @@ def check_or_update_label_ring(
                     "reference.sequence.id": reference.sequence.id,
                 }
             },
-        }
+        },
+        SESSION_METADATA_PROJECTION,
     )
 
     if result:
 
-        ring_id = None
-        for ring in result.get("rings", []):
-            if (
-                ring.get("type") == RingType.LABEL
+        ring = next(
+            (
+                ring
+                for ring in result.get("rings", [])
+                if ring.get("type") == RingType.LABEL
                 and ring.get("reference", {}).get("reference_id")
                 == reference.reference_id
                 and ring.get("reference", {}).get("sequence", {}).get("id")
                 == reference.sequence.id
-            ):
-                ring_id = ring.get("id")
-                break
-
-        if ring_id is not None:
-
-            # Update the ring with new ring segments
-            update_result = sessions_collection.update_one(
-                {"id": reference.session_id, "rings.id": ring_id},
-                {
-                    "$push": {
-                        "rings.$.data": {
-                            "$each": [segment.model_dump() for segment in new_segments]
-                        }
-                    }
-                },
+            ),
+            None,
+        )
+
+        if ring is not None:
+
+            # Add the new segments to the stored segments of the ring
+            append_ring_segments(
+                session_id=reference.session_id,
+                ring_id=ring["id"],
+                generation=ring.get("generation"),
+                segments=[segment.model_dump() for segment in new_segments],
             )
 
-            if update_result.modified_count > 0:
-                # Retrieve and return the updated ring
-                updated_session = sessions_collection.find_one(
-                    {"id": reference.session_id}
-                )
-                updated_ring = next(
-                    (
-                        ring
-                        for ring in updated_session["rings"]
-                        if ring["id"] == ring_id
-                    ),
-                    None,
-                )
-                return LabelRing(**updated_ring)
-            else:
-                return None
+            # Segments are sorted within but not across the chunks of the ring
+            segments = sorted(
+                load_ring_segments(
+                    session_id=reference.session_id,
+                    generations=get_ring_generations([ring]),
+                ).get(ring["id"], []),
+                key=lambda segment: segment["start"],
+            )
+
+            return LabelRing(**{**ring, "data": segments})
         else:
             return None
     else:
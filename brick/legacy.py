@@ -22,6 +22,8 @@ from subprocess import call
 
 from Bio import SeqIO
 
+from .utils import FastaIndex, MULTIPLEX_QUERY_PREFIX, multiplex_fasta_files
+
 
 ### Helper Classes ###
 
@@ -294,6 +296,10 @@ class RingGenerator:
     def get_genome_size(self, file: Path) -> int:
         """Get the total length of the input genome (sum of contigs in FASTA) to set as circle size for whole genome visualiztions"""
 
+        if FastaIndex.available(file):
+            with FastaIndex(file) as fasta:
+                return sum(fasta.lengths().values())
+
         return sum([len(rec.seq) for rec in SeqIO.parse(file, "fasta")])
 
     def brick(
@@ -640,11 +646,15 @@ class Blaster:
         )
         print("\n")
 
-    def run_blast(self, threads: int = 4):
+    def run_blast(self, threads: int = 4, multiplex: bool = False):
         """ "Blast sequence files against reference DB."""
 
         self._get_db()
 
+        if multiplex:
+            self._run_blast_multiplexed(threads=threads)
+            return
+
         refname = self.reference.name
 
         for genome in self.genomes:
@@ -669,6 +679,52 @@ class Blaster:
 
         print("\n")
 
+    def _run_blast_multiplexed(self, threads: int = 4):
+        """
+        Blast all sequence files against reference DB in a single invocation, the
+        output is split into the comparison files of the sequence files by the
+        query identifier prefixes of the multiplexed query file
+        """
+
+        refname = self.reference.name
+        query_file = Path(os.getcwd()) / f"multiplexed_queries_vs{refname}"
+        output_file = Path(os.getcwd()) / f"multiplexed_results_vs{refname}"
+
+        multiplex_fasta_files(fasta_files=self.genomes, outfile=query_file)
+
+        print("Blasting", len(self.genomes), "genomes against Reference DB ...")
+        call(
+            [
+                self.mode,
+                *(["-num_threads", str(threads)] if threads else []),
+                "-query",
+                str(query_file),
+                "-db",
+                self.name_db,
+                "-outfmt",
+                "6",
+                "-out",
+                str(output_file),
+            ]
+        )
+
+        self.results = [genome.name + "vs" + refname for genome in self.genomes]
+
+        outputs = [open(os.path.join(os.getcwd(), f), "w") for f in self.results]
+        try:
+            with output_file.open() as blast_output:
+                for line in blast_output:
+                    prefix = MULTIPLEX_QUERY_PREFIX.match(line)
+                    outputs[int(prefix.group(1))].write(prefix.group(2))
+        finally:
+            for output in outputs:
+                output.close()
+
+        query_file.unlink()
+        output_file.unlink()
+
+        print("\n")
+
     @property
     def num_results(self) -> int:
         return len(self.results)
@@ -1,17 +1,33 @@
 from __future__ import annotations
 
-from pydantic import BaseModel, Field, validator
-from statistics import mean
+from pydantic import BaseModel, Field, field_validator
+from pydantic_core import core_schema
 from strenum import StrEnum
 from pathlib import Path
-from typing import List, Generator, Tuple
-from Bio import SeqIO
-
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Generator,
+    IO,
+    Sequence,
+    Tuple,
+)
+
+import numpy
 import pandas
+import re
 import uuid
 import csv
+import statistics
+
+from pandas.api.types import union_categoricals
 
-from .utils import sanitize_input
+from .utils import sanitize_input, scan_genbank_features, MULTIPLEX_QUERY_PREFIX
 
 
 #######################
@@ -40,13 +56,18 @@ class RingSegmentType(StrEnum):
     GENOMAD = "genomad"
 
 
+# Segments carry their type as `kind` so that the segment model
+# of stored ring data is selected by a tagged union in validation
+# (string literals validate faster than enum member literals)
 class RingSegment(BaseModel):
+    kind: Literal["segment"] = RingSegmentType.SEGMENT.value
     start: int = 0
     end: int = 0
     text: str = ""
 
 
 class GenomadSegment(RingSegment):
+    kind: Literal["genomad"] = RingSegmentType.GENOMAD.value
     plasmid: float | None = None
     virus: float | None = None
     chromosome: float | None = None
@@ -56,6 +77,7 @@ class GenomadSegment(RingSegment):
 # front-end since this class was initially
 # created due to changes in front-end
 class LabelSegment(RingSegment):
+    kind: Literal["label"] = RingSegmentType.LABEL.value
     labelIdentifier: str
     lineLength: float | None = None
     lineWidth: float | None = None
@@ -67,6 +89,246 @@ class LabelSegment(RingSegment):
     textOpacity: str | None = None
 
 
+AnySegment = Annotated[
+    RingSegment | LabelSegment | GenomadSegment, Field(discriminator="kind")
+]
+
+GENOMAD_SEGMENT_FIELDS = ["plasmid", "virus", "chromosome"]
+
+
+class SegmentTable:
+    """
+    Columnar storage of ring segments without per-segment models: starts and ends
+    are kept in integer arrays, optional score fields (e.g. of GenomadSegment) in
+    float arrays and texts are dictionary-encoded as integer codes into a table
+    of distinct strings.
+
+    Serializes to the same list of segment dictionaries as a list of segment models
+    """
+
+    def __init__(
+        self,
+        start: Sequence[int] | numpy.ndarray,
+        end: Sequence[int] | numpy.ndarray,
+        text_codes: Sequence[int] | numpy.ndarray,
+        text_values: Sequence[str],
+        fields: Dict[str, Sequence[float] | numpy.ndarray] | None = None,
+    ):
+        self.start = numpy.asarray(start, dtype=numpy.int64)
+        self.end = numpy.asarray(end, dtype=numpy.int64)
+        self.text_codes = numpy.asarray(text_codes, dtype=numpy.int32)
+        self.text_values: List[str] = list(text_values)
+        self.fields: Dict[str, numpy.ndarray] = {
+            name: numpy.asarray(values, dtype=numpy.float64)
+            for name, values in (fields or {}).items()
+        }
+
+        size = len(self.start)
+        if len(self.end) != size or len(self.text_codes) != size:
+            raise ValueError("Segment table columns must have the same length")
+        if any(len(values) != size for values in self.fields.values()):
+            raise ValueError("Segment table columns must have the same length")
+
+    @classmethod
+    def from_columns(
+        cls,
+        start: Sequence[int] | numpy.ndarray,
+        end: Sequence[int] | numpy.ndarray,
+        text: Sequence[str] | pandas.Series,
+        fields: Dict[str, Sequence[float] | numpy.ndarray] | None = None,
+    ) -> SegmentTable:
+        codes, uniques = pandas.factorize(pandas.Series(text, dtype=object), sort=False)
+        return cls(
+            start=start,
+            end=end,
+            text_codes=codes,
+            text_values=uniques.tolist(),
+            fields=fields,
+        )
+
+    @classmethod
+    def from_segments(
+        cls, segments: List[RingSegment] | List[GenomadSegment]
+    ) -> SegmentTable:
+        fields = (
+            {
+                name: [
+                    numpy.nan if getattr(s, name) is None else getattr(s, name)
+                    for s in segments
+                ]
+                for name in GENOMAD_SEGMENT_FIELDS
+            }
+            if segments and all(isinstance(s, GenomadSegment) for s in segments)
+            else None
+        )
+        return cls.from_columns(
+            start=[s.start for s in segments],
+            end=[s.end for s in segments],
+            text=[s.text for s in segments],
+            fields=fields,
+        )
+
+    @property
+    def text(self) -> List[str]:
+        return [self.text_values[code] for code in self.text_codes.tolist()]
+
+    @property
+    def segment_model(self) -> type[RingSegment] | type[GenomadSegment]:
+        if set(self.fields) == set(GENOMAD_SEGMENT_FIELDS):
+            return GenomadSegment
+        return RingSegment
+
+    def map_texts(self, func: Callable[[str], str]) -> SegmentTable:
+        """Applies a function (e.g. sanitization) once to each distinct text"""
+        return SegmentTable(
+            start=self.start,
+            end=self.end,
+            text_codes=self.text_codes,
+            text_values=[func(value) for value in self.text_values],
+            fields=self.fields,
+        )
+
+    def take(self, indices: Sequence[int] | numpy.ndarray) -> SegmentTable:
+        """Selects segments by index into a new table sharing the text table"""
+        return SegmentTable(
+            start=self.start[indices],
+            end=self.end[indices],
+            text_codes=self.text_codes[indices],
+            text_values=self.text_values,
+            fields={name: values[indices] for name, values in self.fields.items()},
+        )
+
+    def sort(self) -> SegmentTable:
+        """Sorts segments by their lower coordinate (stable, equals start unless reversed)"""
+        return self.take(
+            indices=numpy.argsort(numpy.minimum(self.start, self.end), kind="stable")
+        )
+
+    def to_records(self) -> List[dict]:
+        """Segment dictionaries in the same shape as `model_dump` of the segment models"""
+
+        texts = self.text
+        kind = self.segment_model.model_fields["kind"].default
+        if not self.fields:
+            return [
+                {"kind": kind, "start": start, "end": end, "text": text}
+                for start, end, text in zip(
+                    self.start.tolist(), self.end.tolist(), texts
+                )
+            ]
+
+        names = list(self.fields)
+        columns = [
+            [None if value != value else value for value in self.fields[name].tolist()]
+            for name in names
+        ]  # NaN to None
+        return [
+            {
+                "kind": kind,
+                "start": start,
+                "end": end,
+                "text": text,
+                **dict(zip(names, values)),
+            }
+            for start, end, text, *values in zip(
+                self.start.tolist(), self.end.tolist(), texts, *columns
+            )
+        ]
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def __iter__(self) -> Iterator[RingSegment] | Iterator[GenomadSegment]:
+        model = self.segment_model
+        for record in self.to_records():
+            yield model(**record)
+
+    def __getitem__(self, index: int) -> RingSegment | GenomadSegment:
+        return self.segment_model(**self.take(indices=[index]).to_records()[0])
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, SegmentTable):
+            return self.to_records() == other.to_records()
+        if isinstance(other, list):
+            return self.to_records() == [
+                s.model_dump() if isinstance(s, BaseModel) else s for s in other
+            ]
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"SegmentTable(segments={len(self)}, texts={len(self.text_values)}, fields={list(self.fields)})"
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any):
+        return core_schema.is_instance_schema(
+            cls,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda table: table.to_records()
+            ),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, _schema: Any, handler: Any):
+        return handler(core_schema.list_schema(core_schema.dict_schema()))
+
+
+class SegmentIndex:
+    """
+    Sorted-array interval index over ring segments: segment bounds are sorted by
+    their lower coordinate with a running maximum of the upper coordinates, so that
+    segments overlapping a window are found by two binary searches and a scan of
+    the candidates between them.
+
+    Segment coordinates are inclusive and may be reversed (e.g. BLAST hits on the
+    minus strand), windows are half-open `[start, end)`
+    """
+
+    def __init__(
+        self,
+        start: Sequence[int] | numpy.ndarray,
+        end: Sequence[int] | numpy.ndarray,
+    ):
+        start = numpy.asarray(start, dtype=numpy.int64)
+        end = numpy.asarray(end, dtype=numpy.int64)
+        lower, upper = numpy.minimum(start, end), numpy.maximum(start, end)
+
+        # Segments are usually stored sorted (`Ring.sort_segments`)
+        if numpy.all(lower[1:] >= lower[:-1]):
+            self.order = numpy.arange(len(lower))
+            self.lower, self.upper = lower, upper
+        else:
+            self.order = numpy.argsort(lower, kind="stable")
+            self.lower = lower[self.order]
+            self.upper = upper[self.order]
+        self.max_upper = numpy.maximum.accumulate(self.upper) if len(upper) else upper
+
+    @classmethod
+    def from_segments(
+        cls, segments: List[RingSegment] | List[dict] | SegmentTable
+    ) -> SegmentIndex:
+        if isinstance(segments, SegmentTable):
+            return cls(start=segments.start, end=segments.end)
+        if segments and isinstance(segments[0], dict):
+            return cls(
+                start=[s["start"] for s in segments], end=[s["end"] for s in segments]
+            )
+        return cls(start=[s.start for s in segments], end=[s.end for s in segments])
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def query(self, start: int, end: int) -> numpy.ndarray:
+        """Indices of the segments overlapping the window ordered by segment start"""
+
+        # Segments after the candidate range start at or beyond the window end,
+        # segments before it (by running maximum) end before the window start
+        last = numpy.searchsorted(self.lower, end, side="left")
+        first = numpy.searchsorted(self.max_upper[:last], start, side="left")
+
+        candidates = numpy.arange(first, last)
+        return self.order[candidates[self.upper[first:last] >= start]]
+
+
 class RingReferenceSequence(BaseModel):
     id: str = ""
     length: int = 0
@@ -87,30 +349,43 @@ class Ring(BaseModel):
     type: RingType = RingType.GENERIC
     title: str = "Ring"
     reference: RingReference | None = None
-    data: List[RingSegment | LabelSegment | GenomadSegment] = Field(
-        default_factory=list
-    )
-
-    # Transformation like Session(**data) will select the first suitable
-    # `data` field type, but we inherit LabelSegment and GenomadSegment
-    # from RingSegment so that transformation will always return RingSegment.
+    data: List[AnySegment] | SegmentTable = Field(default_factory=list)
 
-    # Because the base RingSegment fields must be present even without inheritance
-    # and the special segment fields can be `None`, it will return RingSegment
-    # so we must use a validator to correct this based on presence of subclass
-    # specific fields
-    @validator("data", pre=True, each_item=True)
+    def sort_segments(self) -> Ring:
+        """Sorts segments by their lower coordinate for windowed queries (`SegmentIndex`)"""
+        if isinstance(self.data, SegmentTable):
+            self.data = self.data.sort()
+        else:
+            self.data.sort(key=lambda segment: min(segment.start, segment.end))
+        return self
+
+    # Segments are validated into their model by the `kind` tag, which is
+    # missing from segments stored before it was introduced - these are
+    # tagged from their subclass specific fields until they are migrated
+    # in the database (see `brick.api.core.db.migrate_segment_kinds`)
+    @field_validator("data", mode="before")
     @classmethod
-    def set_correct_segment_type(cls, v):
-        # Only apply if this is a dict from e.g. a database query to transform e.g. Session(**data)
-        if type(v) == dict:
-            if "textSize" in v:  # assuming this field is unique to LabelSegment
-                return LabelSegment(**v)
-            elif "plasmid" in v:  # assuming this field is unique to GenomadSegment
-                return GenomadSegment(**v)
-            else:  # default if no unique fields are found is RingSegment
-                return RingSegment(**v)
-        return v
+    def set_legacy_segment_kind(cls, v):
+        # Segment tables (from ring builders) are stored as they are
+        if not isinstance(v, list):
+            return v
+        return [
+            (
+                _set_legacy_segment_kind(item)
+                if type(item) is dict and "kind" not in item
+                else item
+            )
+            for item in v
+        ]
+
+
+def _set_legacy_segment_kind(v: dict) -> dict:
+    if "textSize" in v:  # assuming this field is unique to LabelSegment
+        return {**v, "kind": RingSegmentType.LABEL.value}
+    elif "plasmid" in v:  # assuming this field is unique to GenomadSegment
+        return {**v, "kind": RingSegmentType.GENOMAD.value}
+    else:  # default if no unique fields are found is RingSegment
+        return {**v, "kind": RingSegmentType.SEGMENT.value}
 
 
 class BlastnEntry(BaseModel):
@@ -157,8 +432,8 @@ class GenBankFeatureEntry(BaseModel):
                     else self.annotation
                 ),
             )
-        elif segment_type == RingSegmentType.GENOMAD:
-            return LabelRing(
+        elif segment_type == RingSegmentType.LABEL:
+            return LabelSegment(
                 start=self.start,
                 end=self.end,
                 text=(
@@ -168,9 +443,10 @@ class GenBankFeatureEntry(BaseModel):
                     if sanitize
                     else self.annotation
                 ),
+                labelIdentifier=str(uuid.uuid4()),
             )
         else:
-            raise ValueError(f"Ring segment type {RingSegmentType.LABEL} not supported")
+            raise ValueError(f"Ring segment type {segment_type} not supported")
 
 
 class GenomadEntry(BaseModel):
@@ -227,6 +503,155 @@ class GenomadEntry(BaseModel):
 ##################
 
 
+BLASTN_OUTFMT6_DTYPES = {
+    "query_id": "category",  # few distinct identifiers repeated across many alignments
+    "subject_id": "category",
+    "perc_identity": "float64",
+    "alignment_length": "int64",
+    "mismatches": "int64",
+    "gap_opens": "int64",
+    "query_start": "int64",
+    "query_end": "int64",
+    "subject_start": "int64",
+    "subject_end": "int64",
+    "e_value": "float64",
+    "bit_score": "float64",
+}
+
+
+# Columns required to filter alignments and build ring segments
+BLASTN_SEGMENT_COLUMNS = [
+    "subject_id",
+    "perc_identity",
+    "alignment_length",
+    "subject_start",
+    "subject_end",
+    "e_value",
+]
+
+# Columns of hits of sliced query sequences (`slice_fasta_sequences`) that are
+# required to merge the hits of overlapping slices (`unchunk_blastn_hits`)
+BLASTN_CHUNK_COLUMNS = ["query_id", "query_start", "query_end", *BLASTN_SEGMENT_COLUMNS]
+
+
+def read_blastn_output(
+    file_path: Path, columns: List[str] | None = None
+) -> pandas.DataFrame:
+    """
+    Reads a BLASTn output file with `-outfmt 6` format into typed columns.
+
+    Args:
+    file_path (FilePath): The path to the BLASTn output file.
+    columns (List[str]): Subset of BlastnEntry fields to parse, all fields if not provided.
+
+    Returns:
+    pandas.DataFrame: One row per alignment with the requested columns of BlastnEntry.
+    """
+    columns = columns or list(BLASTN_OUTFMT6_DTYPES)
+    dtypes = {column: BLASTN_OUTFMT6_DTYPES[column] for column in columns}
+
+    try:
+        return pandas.read_csv(
+            file_path,
+            sep="\t",
+            header=None,
+            names=list(BLASTN_OUTFMT6_DTYPES),
+            usecols=columns,
+            dtype=dtypes,
+            float_precision="round_trip",  # same values as float() on each field
+        )[columns]
+    except pandas.errors.EmptyDataError:
+        return pandas.DataFrame(
+            {column: pandas.Series(dtype=dtype) for column, dtype in dtypes.items()}
+        )
+
+
+def read_blastn_stream(
+    stream: IO, columns: List[str] | None = None, chunksize: int = 10_000
+) -> Iterator[pandas.DataFrame]:
+    """
+    Reads BLASTn `-outfmt 6` output from a stream (e.g. `blastn` stdout) in chunks
+    of typed columns as lines become available, combine with `concat_blastn_hits`
+
+    Args:
+    stream (IO): Text or binary stream of the BLASTn output.
+    columns (List[str]): Subset of BlastnEntry fields to parse, all fields if not provided.
+    chunksize (int): Alignments per chunk.
+
+    Returns:
+    Iterator[pandas.DataFrame]: Chunks of alignments as in `read_blastn_output`.
+    """
+    columns = columns or list(BLASTN_OUTFMT6_DTYPES)
+
+    try:
+        reader = pandas.read_csv(
+            stream,
+            sep="\t",
+            header=None,
+            names=list(BLASTN_OUTFMT6_DTYPES),
+            usecols=columns,
+            dtype={column: BLASTN_OUTFMT6_DTYPES[column] for column in columns},
+            float_precision="round_trip",
+            chunksize=chunksize,
+        )
+    except pandas.errors.EmptyDataError:
+        return
+
+    with reader:
+        for chunk in reader:
+            yield chunk[columns]
+
+
+def concat_blastn_hits(
+    chunks: Iterator[pandas.DataFrame], columns: List[str] | None = None
+) -> pandas.DataFrame:
+    """
+    Concatenates chunks from `read_blastn_stream` into the hits that
+    `read_blastn_output` reads from a file, categories of categorical
+    columns are merged across chunks
+    """
+    columns = columns or list(BLASTN_OUTFMT6_DTYPES)
+
+    chunks = list(chunks)
+    if not chunks:
+        return pandas.DataFrame(
+            {
+                column: pandas.Series(dtype=BLASTN_OUTFMT6_DTYPES[column])
+                for column in columns
+            }
+        )
+
+    hits = pandas.concat(chunks, ignore_index=True)
+    for column in columns:
+        if BLASTN_OUTFMT6_DTYPES[column] == "category":
+            hits[column] = union_categoricals(
+                [chunk[column] for chunk in chunks], sort_categories=True
+            )
+    return hits
+
+
+def filter_blastn_hits(
+    hits: pandas.DataFrame,
+    reference: RingReference | None = None,
+    min_identity: int = 0,
+    min_alignment: int = 0,
+    min_evalue: float = 0,
+) -> pandas.DataFrame:
+    """
+    Applies the alignment filters as vectorized masks over the columns from `read_blastn_output`.
+    """
+
+    mask = (
+        (hits["perc_identity"] >= min_identity)
+        & (hits["alignment_length"] >= min_alignment)
+        & (hits["e_value"] <= min_evalue)
+    )
+    if reference:
+        mask &= hits["subject_id"] == reference.sequence.id
+
+    return hits.loc[mask]
+
+
 def parse_blastn_output(
     file_path: Path,
     reference: RingReference | None = None,
@@ -241,41 +666,181 @@ def parse_blastn_output(
     file_path (FilePath): The path to the BLASTn output file.
 
     Returns:
-    List[BlastnEntry]: A list of BlastnEntry models representing each line in the BLASTn output.
-    """
-    result = []
-
-    with file_path.open("r") as file:
-        for line in file:
-            fields = line.strip().split("\t")
-            entry = BlastnEntry(
-                query_id=fields[0],
-                subject_id=fields[1],
-                perc_identity=float(fields[2]),
-                alignment_length=int(fields[3]),
-                mismatches=int(fields[4]),
-                gap_opens=int(fields[5]),
-                query_start=int(fields[6]),
-                query_end=int(fields[7]),
-                subject_start=int(fields[8]),
-                subject_end=int(fields[9]),
-                e_value=float(fields[10]),
-                bit_score=float(fields[11]),
+    List[BlastnEntry]: A list of BlastnEntry models representing each line in the BLASTn output that passed the filters.
+    """
+    hits = filter_blastn_hits(
+        read_blastn_output(file_path=file_path),
+        reference=reference,
+        min_identity=min_identity,
+        min_alignment=min_alignment,
+        min_evalue=min_evalue,
+    )
+
+    return [BlastnEntry(**row) for row in hits.to_dict(orient="records")]
+
+
+def demultiplex_blastn_hits(
+    hits: pandas.DataFrame, queries: int
+) -> List[pandas.DataFrame]:
+    """
+    Splits hits of a multiplexed query FASTA (`multiplex_fasta_files`) into the hits
+    of each query file by the prefix of the query identifiers, prefixes are removed
+
+    :param hits: Hits from `read_blastn_output` including the query_id column
+    :param queries: Number of multiplexed query files
+    :return: Hits of each query file in the order of the multiplexed files
+    """
+
+    # Prefixes are parsed once for each distinct query identifier
+    query_ids = hits["query_id"].astype("category")
+    prefixes = [
+        MULTIPLEX_QUERY_PREFIX.match(query_id) for query_id in query_ids.cat.categories
+    ]
+    if not all(prefixes):
+        raise ValueError("Query identifiers are missing the multiplex prefix")
+
+    codes = query_ids.cat.codes.to_numpy()
+    query_index = numpy.array([int(p.group(1)) for p in prefixes], dtype=int)[codes]
+    query_names = numpy.array([p.group(2) for p in prefixes], dtype=object)[codes]
+
+    # Hits of each query are identical to the hits of a query without
+    # multiplexing, including the categories of categorical columns
+    categorical = [
+        column
+        for column, dtype in hits.dtypes.items()
+        if column != "query_id" and isinstance(dtype, pandas.CategoricalDtype)
+    ]
+
+    demultiplexed = []
+    for index in range(queries):
+        mask = query_index == index
+        query_hits = hits.loc[mask].assign(
+            query_id=pandas.Categorical(query_names[mask])
+        )
+        for column in categorical:
+            query_hits[column] = query_hits[column].cat.remove_unused_categories()
+        demultiplexed.append(query_hits.reset_index(drop=True))
+    return demultiplexed
+
+
+def unchunk_blastn_hits(
+    hits: pandas.DataFrame, name_split: str = "__", range_split: str = ".."
+) -> pandas.DataFrame:
+    """
+    Merges hits of overlapping slices of query sequences with identifiers in the format
+    `{seq_id}{name_split}{start}..{end}` into hits of the query sequences: query
+    coordinates are shifted by the slice starts and HSPs that were found in the overlap
+    of two slices are removed if they are contained in an HSP of the other slice
+
+    :param hits: Hits from `read_blastn_output` including the BLASTN_CHUNK_COLUMNS
+    :return: Hits with query identifiers and coordinates of the query sequences
+    """
+
+    coordinates = split_seq_name_coordinates(
+        hits["query_id"], name_split=name_split, range_split=range_split
+    )
+    slice_start = coordinates["start"].to_numpy()
+
+    hits = hits.assign(
+        query_id=pandas.Categorical(coordinates["seq_id"].to_numpy()),
+        query_start=hits["query_start"].to_numpy() + slice_start,
+        query_end=hits["query_end"].to_numpy() + slice_start,
+    )
+
+    # HSPs found completely within the overlap of both slices
+    duplicated = hits.duplicated(
+        subset=["query_id", "query_start", "query_end", *BLASTN_SEGMENT_COLUMNS]
+    ).to_numpy()
+    hits, slice_start = hits[~duplicated], slice_start[~duplicated]
+
+    if hits.empty:
+        return hits.reset_index(drop=True)
+
+    # HSPs truncated at the end of a slice are contained in the HSP of the
+    # overlapping slice, in a sweep over the HSPs sorted by query start within
+    # groups of query, subject and strand, an HSP is contained if it ends before
+    # the HSP that reaches furthest on the query among the preceding HSPs
+    subject_lower = numpy.minimum(hits["subject_start"], hits["subject_end"])
+    subject_upper = numpy.maximum(hits["subject_start"], hits["subject_end"])
+    groups = hits.groupby(
+        [
+            "query_id",
+            "subject_id",
+            (hits["subject_start"] <= hits["subject_end"]).rename("strand"),
+        ],
+        observed=True,
+        sort=False,
+    ).ngroup()
+
+    order = numpy.lexsort(
+        (-hits["query_end"].to_numpy(), hits["query_start"].to_numpy(), groups)
+    )
+
+    # Groups are offset on the query so that no HSP is contained across groups
+    offset = groups.to_numpy()[order] * (int(hits["query_end"].max()) + 1)
+    query_end = hits["query_end"].to_numpy()[order] + offset
+    lower, upper = subject_lower.to_numpy()[order], subject_upper.to_numpy()[order]
+    slices = slice_start[order]
+
+    furthest = numpy.maximum.accumulate(query_end)
+    reaches_further = query_end > numpy.concatenate([[-1], furthest[:-1]])
+    holder = numpy.maximum.accumulate(
+        numpy.where(reaches_further, numpy.arange(len(order)), 0)
+    )
+    previous = numpy.concatenate([[0], holder[:-1]])
+
+    contained = numpy.zeros(len(order), dtype=bool)
+    contained[1:] = (
+        (query_end[1:] <= query_end[previous[1:]])
+        & (lower[1:] >= lower[previous[1:]])
+        & (upper[1:] <= upper[previous[1:]])
+        & (slices[1:] != slices[previous[1:]])
+    )
+
+    keep = numpy.ones(len(order), dtype=bool)
+    keep[order[contained]] = False
+
+    return hits[keep].reset_index(drop=True)
+
+
+def save_blastn_hits(hits: pandas.DataFrame, file_path: Path) -> None:
+    """
+    Stores unfiltered hits from `read_blastn_output` as uncompressed columns (npz),
+    categorical columns are stored as integer codes with their categories
+    """
+
+    columns = {}
+    for column in hits.columns:
+        if isinstance(hits[column].dtype, pandas.CategoricalDtype):
+            columns[f"{column}.codes"] = hits[column].cat.codes.to_numpy()
+            columns[f"{column}.categories"] = numpy.asarray(
+                hits[column].cat.categories, dtype=str
             )
-            if entry.perc_identity < min_identity:
-                continue
-            if entry.alignment_length < min_alignment:
-                continue
-            if entry.e_value > min_evalue:
-                continue
-
-            if reference:
-                if entry.subject_id == reference.sequence.id:
-                    result.append(entry)
-            else:
-                result.append(entry)
+        else:
+            columns[column] = hits[column].to_numpy()
+
+    with open(file_path, "wb") as file:
+        numpy.savez(file, **columns)
+
+
+def load_blastn_hits(file_path: Path) -> pandas.DataFrame:
+    """Reads hits stored with `save_blastn_hits` with the column types of `read_blastn_output`"""
+
+    with numpy.load(file_path, allow_pickle=False) as data:
+        columns = {}
+        for name in data.files:
+            if name.endswith(".codes"):
+                column = name.removesuffix(".codes")
+                columns[column] = pandas.Categorical.from_codes(
+                    data[name], categories=data[f"{column}.categories"].tolist()
+                )
+            elif not name.endswith(".categories"):
+                columns[name] = data[name]
+
+    return pandas.DataFrame(columns)
 
-    return result
+
+GENOMAD_SCORE_COLUMNS = ["chromosome_score", "plasmid_score", "virus_score"]
 
 
 # Generator function
@@ -285,20 +850,34 @@ def parse_aggregated_genomad_output(file: Path) -> Generator[GenomadEntry, None,
     """
 
     genomad_output = pandas.read_csv(file, sep="\t", header=0)
-    for _, row in genomad_output.iterrows():
-
-        start, end, seq_id = get_start_end_from_seq_name(seq_name=row["seq_name"])
+    coordinates = split_seq_name_coordinates(seq_names=genomad_output["seq_name"])
 
+    for seq_id, start, end, chromosome_score, plasmid_score, virus_score in zip(
+        coordinates["seq_id"].tolist(),
+        coordinates["start"].tolist(),
+        coordinates["end"].tolist(),
+        *[genomad_output[column].tolist() for column in GENOMAD_SCORE_COLUMNS],
+    ):
         yield GenomadEntry(
             seq_name=seq_id,
             start=start,
             end=end,
-            chromosome_score=row["chromosome_score"],
-            plasmid_score=row["plasmid_score"],
-            virus_score=row["virus_score"],
+            chromosome_score=chromosome_score,
+            plasmid_score=plasmid_score,
+            virus_score=virus_score,
         )
 
 
+def find_contiguous_runs(mask: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Run-length encoding of a boolean array, returns the first index and the
+    exclusive last index of each run of `True` values
+    """
+
+    edges = numpy.diff(numpy.concatenate(([0], mask.astype(numpy.int8), [0])))
+    return numpy.flatnonzero(edges == 1), numpy.flatnonzero(edges == -1)
+
+
 def extract_genomad_contiguous_segments(
     file: Path,
     min_segment_score: float,  # minimum mean score of a contiguous segment to consider returning a segment
@@ -309,78 +888,183 @@ def extract_genomad_contiguous_segments(
 ) -> Generator[RingSegment, None, None] | Generator[LabelSegment, None, None]:
     """Extracts segments of high probabilty for each prediction class with a minimum total length for label or annotation rings"""
 
-    segments = []
+    if segment_type not in (RingSegmentType.SEGMENT, RingSegmentType.LABEL):
+        raise ValueError(
+            f"Segment type {segment_type} not supported for extracting contiguous segment annotations from Genomad"
+        )
+
+    table = extract_genomad_segment_table(
+        file=file,
+        min_segment_score=min_segment_score,
+        min_window_score=min_window_score,
+        min_segment_length=min_segment_length,
+        prediction_classes=prediction_classes,
+    )
+
+    for start, end, text in zip(table.start.tolist(), table.end.tolist(), table.text):
+        if segment_type == RingSegmentType.SEGMENT:
+            yield RingSegment(start=start, end=end, text=text)
+        else:
+            yield LabelSegment(
+                start=start,
+                end=end,
+                text=text,
+                labelIdentifier=str(uuid.uuid4()),
+            )
+
+
+def extract_genomad_segment_table(
+    file: Path,
+    min_segment_score: float,
+    min_window_score: float,
+    min_segment_length: int,
+    prediction_classes: List[GenomadPredictionClass],
+) -> SegmentTable:
+    """Columnar engine of `extract_genomad_contiguous_segments`, segments are sorted by start position"""
 
     genomad_output = pandas.read_csv(file, sep="\t", header=0)
 
-    def process_column(column: str):
+    coordinates = split_seq_name_coordinates(seq_names=genomad_output["seq_name"])
+    window_starts = coordinates["start"].to_numpy()
+    window_ends = coordinates["end"].to_numpy()
+
+    try:
+        scores = genomad_output[GENOMAD_SCORE_COLUMNS].to_numpy(dtype=numpy.float64)
+    except ValueError:
+        raise ValueError("Probability could not be converted to float type")
+
+    # Windows above the threshold for all prediction classes at once
+    windows = scores >= min_window_score
+
+    segment_starts, segment_ends, segment_texts = [], [], []
+    for i, column in enumerate(GENOMAD_SCORE_COLUMNS):
         prediction_class = column.replace("_score", "")
+        if prediction_class not in prediction_classes:
+            continue
+
+        first, last = find_contiguous_runs(windows[:, i])
+        if first.size == 0:
+            continue
+
+        starts = window_starts[first]
+        ends = window_ends[last - 1]
+
+        # Means of the runs that are long enough are exact (`statistics.mean`) so
+        # that segments at the score threshold are kept as before the columnar
+        # extraction and do not depend on the summation order or platform
+        keep = ends - starts >= min_segment_length
+        means = numpy.array(
+            [
+                statistics.mean(scores[a:b, i].tolist())
+                for a, b in zip(first[keep], last[keep])
+            ],
+            dtype=numpy.float64,
+        )
+        starts, ends = starts[keep], ends[keep]
 
-        current_probabilities = []
-        current_segment = None
-        for _, row in genomad_output.iterrows():
-
-            try:
-                probability = float(row[column])
-            except ValueError:
-                raise ValueError("Probability could not be converted to float type")
-
-            start, end, _ = get_start_end_from_seq_name(seq_name=row["seq_name"])
-
-            # Contiguous segment checks and dictionary insertions
-            if probability >= min_window_score:
-                if current_segment is None:
-                    if segment_type == RingSegmentType.SEGMENT:
-                        current_segment = RingSegment(start=start, end=end)
-                    elif segment_type == RingSegmentType.LABEL:
-                        current_segment = LabelSegment(
-                            start=start, end=end, labelIdentifier=str(uuid.uuid4())
-                        )
-                    else:
-                        raise ValueError(
-                            f"Segment type {segment_type} not supported for extracting contiguous segment annotations from Genomad"
-                        )
+        keep = means >= min_segment_score
 
-                    current_probabilities = [probability]
-                else:
-                    current_segment.end = end
-                    current_probabilities.append(probability)
-            else:
-                if current_segment and (
-                    current_segment.end - current_segment.start >= min_segment_length
-                ):
-
-                    prediction_class_label = (
-                        "Phage"
-                        if prediction_class == GenomadPredictionClass.VIRUS
-                        else prediction_class.capitalize()
-                    )
-                    current_segment.text = (
-                        f"{prediction_class_label} ({mean(current_probabilities):.2f})"
-                    )
+        prediction_class_label = (
+            "Phage"
+            if prediction_class == GenomadPredictionClass.VIRUS
+            else prediction_class.capitalize()
+        )
 
-                    mean_segment_score = mean(current_probabilities)
-                    if (
-                        prediction_class in prediction_classes
-                        and mean_segment_score >= min_segment_score
-                    ):
-                        segments.append(current_segment)
+        segment_starts.append(starts[keep])
+        segment_ends.append(ends[keep])
+        segment_texts += [f"{prediction_class_label} ({m:.2f})" for m in means[keep]]
 
-                current_segment = None
+    if not segment_texts:
+        return SegmentTable(start=[], end=[], text_codes=[], text_values=[])
 
-        # Check for a segment at the end
-        if current_segment and (
-            current_segment.end - current_segment.start >= min_segment_length
-        ):
-            if prediction_class in prediction_classes:
-                segments.append(current_segment)
+    # Stable sort keeps the prediction class order for segments with the same start
+    return SegmentTable.from_columns(
+        start=numpy.concatenate(segment_starts),
+        end=numpy.concatenate(segment_ends),
+        text=segment_texts,
+    ).sort()
+
+
+def read_genomad_segment_table(
+    file: Path,
+    prediction_classes: List[GenomadPredictionClass],
+    min_window_score: float = 0,
+) -> SegmentTable:
+    """
+    Columnar equivalent of `GenomadEntry.to_segment` over the aggregated_classification
+    output - scores below the threshold or of other prediction classes are set to zero
+    """
+
+    genomad_output = pandas.read_csv(file, sep="\t", header=0)
+    coordinates = split_seq_name_coordinates(seq_names=genomad_output["seq_name"])
+
+    texts = pandas.Series("", index=genomad_output.index, dtype=object)
+    fields = {}
+    for column in GENOMAD_SCORE_COLUMNS:
+        prediction_class = column.replace("_score", "")
+        scores = genomad_output[column].astype(numpy.float64)
+
+        keep = scores >= min_window_score
+        if prediction_class not in prediction_classes:
+            keep &= False
+
+        texts = texts.where(
+            ~keep,
+            texts
+            + f"{prediction_class.capitalize()} ("
+            + scores.map("{:.2f}".format)
+            + ") ",
+        )
+        fields[prediction_class] = scores.where(keep, 0).to_numpy()
+
+    return SegmentTable.from_columns(
+        start=coordinates["start"].to_numpy(),
+        end=coordinates["end"].to_numpy(),
+        text=texts,
+        fields={name: fields[name] for name in GENOMAD_SEGMENT_FIELDS},
+    )
 
-    process_column("chromosome_score")
-    process_column("plasmid_score")
-    process_column("virus_score")
 
-    for segment in sorted(segments, key=lambda segment: segment.start):
-        yield segment
+def split_seq_name_coordinates(
+    seq_names: pandas.Series, name_split: str = "__", range_split: str = ".."
+) -> pandas.DataFrame:
+    """
+    Vectorized `get_start_end_from_seq_name` returning the `seq_id`, `start` and `end` columns
+    """
+
+    if seq_names.empty:
+        return pandas.DataFrame(
+            {
+                "seq_id": pandas.Series(dtype=str),
+                "start": pandas.Series(dtype=numpy.int64),
+                "end": pandas.Series(dtype=numpy.int64),
+            }
+        )
+
+    names = seq_names.astype(str).str.split(name_split, n=2, expand=True, regex=False)
+    if names.shape[1] < 2 or names[1].isna().any():
+        raise IndexError(
+            "Could not split the sequence name to extract sequence range - was the file sliced?"
+        )
+
+    start_end = names[1].str.split(range_split, expand=True, regex=False)
+    if start_end.shape[1] != 2 or start_end[1].isna().any():
+        raise ValueError(
+            "Could not extract start and end positions from sequence range in sequence name - was the file sliced?"
+        )
+
+    try:
+        return pandas.DataFrame(
+            {
+                "seq_id": names[0],
+                "start": start_end[0].astype(numpy.int64),
+                "end": start_end[1].astype(numpy.int64),
+            }
+        )
+    except ValueError:
+        raise ValueError(
+            "Start or end value could not be converted to integer type - is the range format correct?"
+        )
 
 
 def get_start_end_from_seq_name(
@@ -416,26 +1100,20 @@ def parse_genbank_features(
 ) -> List[GenBankFeatureEntry]:
     entries = []
 
-    # Parse the GenBank file
-    for record in SeqIO.parse(file_path, "genbank"):
-        # Iterate over the features
-        for feature in record.features:
-            if feature.type in feature_types:
-                # Extract the desired information
-                start = int(feature.location.start)
-                end = int(feature.location.end)
-                annotation = feature.type
-
-                # Add extra annotations if available
-                if "gene" in feature.qualifiers:
-                    annotation += f" {feature.qualifiers['gene'][0]}"
-
-                if "product" in feature.qualifiers:
-                    annotation += f" {feature.qualifiers['product'][0]}"
-
-                entries.append(
-                    GenBankFeatureEntry(start=start, end=end, annotation=annotation)
-                )
+    # Stream the feature tables without reading records into memory
+    for feature_type, start, end, qualifiers in scan_genbank_features(
+        file_path=file_path, feature_types=feature_types
+    ):
+        annotation = feature_type
+
+        # Add extra annotations if available
+        if "gene" in qualifiers:
+            annotation += f" {qualifiers['gene']}"
+
+        if "product" in qualifiers:
+            annotation += f" {qualifiers['product']}"
+
+        entries.append(GenBankFeatureEntry(start=start, end=end, annotation=annotation))
 
     return entries
 
@@ -483,6 +1161,34 @@ def parse_tsv_segments(
     return segments
 
 
+def read_tsv_segment_table(file_path: Path, sanitize: bool = True) -> SegmentTable:
+    """Columnar equivalent of `parse_tsv_segments` for ring segments"""
+
+    segments = pandas.read_csv(
+        file_path,
+        sep="\t",
+        header=0,
+        usecols=["start", "end", "text"],
+        dtype={"start": numpy.int64, "end": numpy.int64, "text": str},
+        keep_default_na=False,
+        encoding="utf-8",
+    )
+
+    table = SegmentTable.from_columns(
+        start=segments["start"].to_numpy(),
+        end=segments["end"].to_numpy(),
+        text=segments["text"],
+    )
+    if sanitize:
+        table = table.map_texts(_sanitize_segment_text)
+
+    return table
+
+
+def _sanitize_segment_text(text: str) -> str:
+    return sanitize_input(input_string=text, is_for_db=True, is_for_svg=True)
+
+
 #############
 # RING MODELS
 #############
@@ -517,20 +1223,45 @@ class BlastRing(Ring):
         min_alignment: int = 0,
         min_evalue: float = 0,
     ) -> BlastRing:
+        return BlastRing.from_blast_hits(
+            hits=read_blastn_output(file_path=file, columns=BLASTN_SEGMENT_COLUMNS),
+            reference=reference,
+            min_identity=min_identity,
+            min_alignment=min_alignment,
+            min_evalue=min_evalue,
+        )
+
+    @staticmethod
+    def from_blast_hits(
+        hits: pandas.DataFrame,
+        reference: RingReference | None = None,
+        min_identity: int = 0,
+        min_alignment: int = 0,
+        min_evalue: float = 0,
+    ) -> BlastRing:
+        hits = filter_blastn_hits(
+            hits,
+            reference=reference,
+            min_identity=min_identity,
+            min_alignment=min_alignment,
+            min_evalue=min_evalue,
+        )
+
+        # Identity texts are dictionary-encoded, each distinct value is formatted once
+        codes, identities = pandas.factorize(hits["perc_identity"], sort=False)
+
         return BlastRing(
             id=str(uuid.uuid4()),
-            data=[
-                entry.to_segment()
-                for entry in parse_blastn_output(
-                    file_path=file,
-                    reference=reference,
-                    min_identity=min_identity,
-                    min_alignment=min_alignment,
-                    min_evalue=min_evalue,
-                )
-            ],
+            data=SegmentTable(
+                start=hits["subject_start"].to_numpy(),
+                end=hits["subject_end"].to_numpy(),
+                text_codes=codes,
+                text_values=[
+                    f"{identity:.2f}% nucleotide identity" for identity in identities
+                ],
+            ),
             reference=reference,
-        )
+        ).sort_segments()
 
 
 class LabelRing(Ring):
@@ -554,7 +1285,7 @@ class LabelRing(Ring):
                 )
             ],
             reference=reference,
-        )
+        ).sort_segments()
 
     @staticmethod
     def from_tsv_file(
@@ -571,7 +1302,7 @@ class LabelRing(Ring):
                 )
             ],
             reference=reference,
-        )
+        ).sort_segments()
 
     def add_custom_labels(
         self, labels: List[LabelSegment], sanitize: bool = True
@@ -584,6 +1315,8 @@ class LabelRing(Ring):
                 )
             self.data.append(segment)
 
+        self.sort_segments()
+
     @staticmethod
     def from_genomad_output(
         file: Path,
@@ -610,7 +1343,7 @@ class LabelRing(Ring):
                 )
             ],
             reference=reference,
-        )
+        ).sort_segments()
 
 
 class AnnotationRing(Ring):
@@ -623,34 +1356,28 @@ class AnnotationRing(Ring):
         reference: RingReference | None = None,
         sanitize: bool = True,
     ) -> AnnotationRing:
-        return AnnotationRing(
-            id=str(uuid.uuid4()),
-            data=[
-                entry.to_segment(
-                    sanitize=sanitize, segment_type=RingSegmentType.SEGMENT
-                )
-                for entry in parse_genbank_features(
-                    file_path=str(file), feature_types=features
-                )
-            ],
-            reference=reference,
+        entries = parse_genbank_features(file_path=str(file), feature_types=features)
+
+        table = SegmentTable.from_columns(
+            start=[entry.start for entry in entries],
+            end=[entry.end for entry in entries],
+            text=[entry.annotation for entry in entries],
         )
+        if sanitize:
+            table = table.map_texts(_sanitize_segment_text)
+
+        return AnnotationRing(
+            id=str(uuid.uuid4()), data=table, reference=reference
+        ).sort_segments()
 
     def from_tsv_file(
         file: Path, reference: RingReference | None = None, sanitize: bool = True
     ) -> AnnotationRing:
         return AnnotationRing(
             id=str(uuid.uuid4()),
-            data=[
-                segment
-                for segment in parse_tsv_segments(
-                    file_path=file,
-                    sanitize=sanitize,
-                    segment_type=RingSegmentType.SEGMENT,
-                )
-            ],
+            data=read_tsv_segment_table(file_path=file, sanitize=sanitize),
             reference=reference,
-        )
+        ).sort_segments()
 
     @staticmethod
     def from_genomad_output(
@@ -666,23 +1393,19 @@ class AnnotationRing(Ring):
     ) -> AnnotationRing:
         return AnnotationRing(
             id=str(uuid.uuid4()),
-            data=[
-                segment
-                for segment in extract_genomad_contiguous_segments(
-                    file=file,
-                    min_segment_length=min_segment_length,
-                    min_window_score=min_window_score,
-                    min_segment_score=min_segment_score,
-                    prediction_classes=prediction_classes,
-                    segment_type=RingSegmentType.SEGMENT,
-                )
-            ],
+            data=extract_genomad_segment_table(
+                file=file,
+                min_segment_length=min_segment_length,
+                min_window_score=min_window_score,
+                min_segment_score=min_segment_score,
+                prediction_classes=prediction_classes,
+            ),
             reference=reference,
-        )
+        ).sort_segments()
 
 
 class GenomadRing(Ring):
-    data: List[GenomadSegment] = Field(default_factory=list)
+    data: List[GenomadSegment] | SegmentTable = Field(default_factory=list)
     type: RingType = RingType.GENOMAD
     title: str = "Genomad Ring"
 
@@ -698,12 +1421,259 @@ class GenomadRing(Ring):
     ) -> GenomadRing:
         return GenomadRing(
             id=str(uuid.uuid4()),
-            data=[
-                entry.to_segment(
-                    prediction_classes=prediction_classes,
-                    min_window_score=min_window_score,
+            data=read_genomad_segment_table(
+                file=file,
+                prediction_classes=prediction_classes,
+                min_window_score=min_window_score,
+            ),
+            reference=reference,
+        ).sort_segments()
+
+
+#############
+# ZOOM LEVELS
+#############
+
+
+ZOOM_BASE_BIN_SIZE = 64
+ZOOM_FACTOR = 4
+ZOOM_MIN_BINS = 256
+
+BLAST_IDENTITY_TEXT = re.compile(r"^\s*([0-9.]+)% nucleotide identity")
+
+
+class ZoomPyramid:
+    """
+    Multi-resolution summaries of ring segments similar to bigWig zoom levels:
+    each level bins the reference sequence at a bin size `ZOOM_FACTOR` times
+    coarser than the previous level and holds for every bin the number of
+    overlapping segments, the coverage (mean depth of segments per base) and
+    the coverage weighted mean of segment scores (NaN without scored segments)
+
+    Levels are computed directly from segment bounds with prefix sums, so the
+    cost is independent of segment lengths and levels do not accumulate errors
+    """
+
+    def __init__(
+        self,
+        length: int,
+        bin_sizes: Sequence[int],
+        count: List[numpy.ndarray],
+        coverage: List[numpy.ndarray],
+        score: List[numpy.ndarray],
+    ):
+        self.length = int(length)
+        self.bin_sizes = [int(size) for size in bin_sizes]
+        self.count = count
+        self.coverage = coverage
+        self.score = score
+
+    @classmethod
+    def from_segments(
+        cls,
+        start: Sequence[int] | numpy.ndarray,
+        end: Sequence[int] | numpy.ndarray,
+        length: int,
+        score: Sequence[float] | numpy.ndarray | None = None,
+        base_bin_size: int = ZOOM_BASE_BIN_SIZE,
+        factor: int = ZOOM_FACTOR,
+        min_bins: int = ZOOM_MIN_BINS,
+    ) -> ZoomPyramid:
+        start = numpy.asarray(start, dtype=numpy.int64)
+        end = numpy.asarray(end, dtype=numpy.int64)
+
+        # Inclusive segment coordinates to half-open intervals
+        lower = numpy.minimum(start, end).astype(numpy.float64)
+        upper = numpy.maximum(start, end).astype(numpy.float64) + 1
+
+        if score is None:
+            score = numpy.full(len(lower), numpy.nan)
+        score = numpy.asarray(score, dtype=numpy.float64)
+        scored = ~numpy.isnan(score)
+        weights = numpy.where(scored, score, 0)
+
+        if length <= 0:  # reference sequence length unknown
+            length = int(upper.max()) if len(upper) else 1
+
+        bin_sizes = [base_bin_size]
+        while -(-length // bin_sizes[-1]) > min_bins:
+            bin_sizes.append(bin_sizes[-1] * factor)
+
+        lower_sorted, upper_sorted = numpy.sort(lower), numpy.sort(upper)
+
+        # Prefix sums are computed once and shared across levels
+        covered_sums = _OverlapPrefixSums(lower, upper)
+        scored_sums = _OverlapPrefixSums(lower, upper, numpy.where(scored, 1.0, 0))
+        weighted_sums = _OverlapPrefixSums(lower, upper, weights)
+
+        count, coverage, mean_score = [], [], []
+        for bin_size in bin_sizes:
+            edges = numpy.minimum(
+                numpy.arange(0, length + bin_size, bin_size, dtype=numpy.float64),
+                length,
+            )
+            edges = edges[: -(-length // bin_size) + 1]
+            widths = numpy.diff(edges)
+
+            # Segments overlapping a bin start before its end and do not end before its start
+            count.append(
+                (
+                    numpy.searchsorted(lower_sorted, edges[1:], side="left")
+                    - numpy.searchsorted(upper_sorted, edges[:-1], side="right")
+                ).astype(numpy.int32)
+            )
+
+            covered = numpy.diff(covered_sums.overlap(edges))
+            covered_scored = numpy.diff(scored_sums.overlap(edges))
+            weighted = numpy.diff(weighted_sums.overlap(edges))
+
+            coverage.append((covered / widths).astype(numpy.float32))
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                mean_score.append(
+                    numpy.where(
+                        covered_scored > 0, weighted / covered_scored, numpy.nan
+                    ).astype(numpy.float32)
                 )
-                for entry in parse_aggregated_genomad_output(file=file)
+
+        return cls(
+            length=length,
+            bin_sizes=bin_sizes,
+            count=count,
+            coverage=coverage,
+            score=mean_score,
+        )
+
+    @classmethod
+    def from_ring(cls, ring: Ring, **kwargs) -> ZoomPyramid:
+        length = ring.reference.sequence.length if ring.reference else 0
+        if isinstance(ring.data, SegmentTable):
+            start, end = ring.data.start, ring.data.end
+        else:
+            start = [segment.start for segment in ring.data]
+            end = [segment.end for segment in ring.data]
+        return cls.from_segments(
+            start=start,
+            end=end,
+            length=length,
+            score=get_segment_scores(ring),
+            **kwargs,
+        )
+
+    def select_level(self, bases_per_pixel: float) -> int:
+        """Coarsest level with bins no larger than a pixel (finest level if none)"""
+        levels = [i for i, size in enumerate(self.bin_sizes) if size <= bases_per_pixel]
+        return levels[-1] if levels else 0
+
+    def save(self, path: Path) -> None:
+        arrays = {}
+        for i in range(len(self.bin_sizes)):
+            arrays[f"count_{i}"] = self.count[i]
+            arrays[f"coverage_{i}"] = self.coverage[i]
+            arrays[f"score_{i}"] = self.score[i]
+        with path.open("wb") as file:
+            numpy.savez(
+                file,
+                length=numpy.int64(self.length),
+                bin_sizes=numpy.asarray(self.bin_sizes, dtype=numpy.int64),
+                **arrays,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> ZoomPyramid:
+        with numpy.load(path) as data:
+            bin_sizes = data["bin_sizes"].tolist()
+            return cls(
+                length=int(data["length"]),
+                bin_sizes=bin_sizes,
+                count=[data[f"count_{i}"] for i in range(len(bin_sizes))],
+                coverage=[data[f"coverage_{i}"] for i in range(len(bin_sizes))],
+                score=[data[f"score_{i}"] for i in range(len(bin_sizes))],
+            )
+
+
+class _OverlapPrefixSums:
+    """
+    Weighted sums of the overlaps of half-open intervals with [0, x): each
+    interval contributes (x - lower) once started minus (x - upper) once
+    ended, which are sums over the bounds below x (prefix sums when sorted)
+    """
+
+    def __init__(
+        self,
+        lower: numpy.ndarray,
+        upper: numpy.ndarray,
+        weights: numpy.ndarray | None = None,
+    ):
+        if weights is None:
+            weights = numpy.ones(len(lower))
+
+        self.bounds, self.prefix_weights, self.prefix_bounds = [], [], []
+        for bounds in (lower, upper):
+            order = numpy.argsort(bounds, kind="stable")
+            bounds, w = bounds[order], weights[order]
+            self.bounds.append(bounds)
+            self.prefix_weights.append(numpy.concatenate([[0.0], numpy.cumsum(w)]))
+            self.prefix_bounds.append(
+                numpy.concatenate([[0.0], numpy.cumsum(bounds * w)])
+            )
+
+    def overlap(self, x: numpy.ndarray) -> numpy.ndarray:
+        total = numpy.zeros(len(x), dtype=numpy.float64)
+        for bounds, prefix_weights, prefix_bounds, sign in zip(
+            self.bounds, self.prefix_weights, self.prefix_bounds, (1, -1)
+        ):
+            k = numpy.searchsorted(bounds, x, side="left")
+            total += sign * (x * prefix_weights[k] - prefix_bounds[k])
+        return total
+
+
+def get_segment_scores(ring: Ring) -> numpy.ndarray | None:
+    """
+    Segment scores summarized in zoom levels: percent identity of BLAST hits
+    (parsed once per distinct segment text) and the highest class score of
+    geNomad segments, other rings have no scores
+    """
+
+    if isinstance(ring.data, SegmentTable):
+        if ring.data.segment_model is GenomadSegment:
+            return _max_genomad_score(
+                [ring.data.fields[name] for name in GENOMAD_SEGMENT_FIELDS]
+            )
+        if ring.type == RingType.BLAST:
+            identities = numpy.asarray(
+                [_parse_blast_identity(text) for text in ring.data.text_values],
+                dtype=numpy.float64,
+            )
+            return identities[ring.data.text_codes] if len(identities) else None
+        return None
+
+    if ring.data and all(isinstance(s, GenomadSegment) for s in ring.data):
+        return _max_genomad_score(
+            [
+                [
+                    numpy.nan if getattr(s, name) is None else getattr(s, name)
+                    for s in ring.data
+                ]
+                for name in GENOMAD_SEGMENT_FIELDS
+            ]
+        )
+    if ring.type == RingType.BLAST:
+        identities = {}
+        return numpy.asarray(
+            [
+                identities.setdefault(s.text, _parse_blast_identity(s.text))
+                for s in ring.data
             ],
-            reference=reference,
+            dtype=numpy.float64,
         )
+    return None
+
+
+def _max_genomad_score(fields: List[Sequence[float]]) -> numpy.ndarray:
+    with numpy.errstate(invalid="ignore"):
+        return numpy.fmax.reduce(numpy.asarray(fields, dtype=numpy.float64), axis=0)
+
+
+def _parse_blast_identity(text: str) -> float:
+    match = BLAST_IDENTITY_TEXT.match(text)
+    return float(match.group(1)) if match else numpy.nan
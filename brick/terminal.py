@@ -44,6 +44,9 @@ def legacy(
     min_length: int = typer.Option(100, help="Other genomes for BLAST rings"),
     json: Path = typer.Option(None, help="Ring data JSON output file"),
     threads: int = typer.Option(None, help="Threads for BLAST"),
+    multiplex: bool = typer.Option(
+        False, help="Run BLAST for all genomes in a single invocation"
+    ),
     tmpdir: Path = typer.Option(
         Path("/tmp"),
         help="Temporary working directory for intermediary outputs from tools run as part of BRICK",
@@ -121,7 +124,7 @@ def legacy(
             annotation_rings.append(ring_misc)
 
     blaster = Blaster(reference=reference, genomes=genomes)
-    blaster.run_blast(threads=threads)
+    blaster.run_blast(threads=threads, multiplex=multiplex)
 
     blast_rings = []
     for i in range(blaster.num_results):
@@ -188,18 +191,12 @@ def slice(
     if outdir is not None and not outdir.exists():
         outdir.mkdir(parents=True)
 
-    seq_slices = slice_fasta_sequences(fasta_file=fasta, slice_size=size)
-
     if outdir:
-        for _, slices in seq_slices.items():
-            for record in slices:
-                with (outdir / f"{record.id}.fasta").open("w") as out:
-                    out.write(f">{record.id} {record.description}\n{record.seq}\n")
+        for fasta_slice in iter_fasta_slices(fasta_file=fasta, slice_size=size):
+            with (outdir / f"{fasta_slice.id}.fasta").open("wb") as out:
+                write_fasta_slice(out, fasta_slice)
     else:
-        with output.open("w") as out:
-            for _, slices in seq_slices.items():
-                for record in slices:
-                    out.write(f">{record.id} {record.description}\n{record.seq}\n")
+        stream_fasta_slices(fasta_file=fasta, outfile=output, slice_size=size)
 
 
 @utils.command()
@@ -4,11 +4,13 @@ import html
 import requests
 import logging
 import math
+import mmap
+import numpy
 
 from multiprocessing import cpu_count
 
 from pathlib import Path
-from typing import List, Dict, Union
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Set, Tuple, Union
 
 from Bio import SeqIO
 from Bio.Seq import Seq
@@ -63,6 +65,255 @@ LAPUTA_MEDIUM.reverse()
 YESTERDAY_MEDIUM.reverse()
 
 
+def read_fasta_sequences(
+    fasta_file: Path, sequence_subset: List[str] = None
+) -> Iterator[SeqRecord]:
+    """
+    Sequence records of a FASTA file in file order, a subset of sequences is read
+    from the index next to the file if available instead of parsing the file
+    """
+
+    if sequence_subset and FastaIndex.available(fasta_file):
+        with FastaIndex(fasta_file) as fasta:
+            for seq_id in fasta:
+                if seq_id in sequence_subset:
+                    yield SeqRecord(Seq(fasta.fetch(seq_id)), id=seq_id)
+        return
+
+    for seq_record in SeqIO.parse(str(fasta_file), "fasta"):
+        if sequence_subset and seq_record.id not in sequence_subset:
+            continue
+        yield seq_record
+
+
+def write_fasta_sequences(
+    fasta_file: Path, sequence_ids: List[str], outfile: Path, line_width: int = 80
+) -> Dict[str, int]:
+    """
+    Writes a subset of the sequences of a FASTA file to a new FASTA file, sequences
+    are read from the index next to the file if available
+
+    :param fasta_file: Path to the FASTA file
+    :param sequence_ids: Identifiers of the sequences to write
+    :param outfile: Path to the output FASTA file
+    :param line_width: Bases per line in the output FASTA file
+    :return: Lengths of the written sequences
+    :raises ValueError: if any of the sequences is not in the FASTA file
+    """
+
+    lengths = {}
+    with outfile.open("w") as fasta:
+        for seq_record in read_fasta_sequences(fasta_file, sequence_ids):
+            if seq_record.id in lengths:
+                continue  # first record with a duplicate identifier
+            sequence = str(seq_record.seq)
+            fasta.write(f">{seq_record.id}\n")
+            for i in range(0, len(sequence), line_width):
+                fasta.write(f"{sequence[i : i + line_width]}\n")
+            lengths[seq_record.id] = len(sequence)
+
+    missing = [seq_id for seq_id in sequence_ids if seq_id not in lengths]
+    if missing:
+        raise ValueError(f"Sequences not found in FASTA file: {', '.join(missing)}")
+
+    return lengths
+
+
+def plan_fasta_chunks(
+    lengths: Dict[str, int], chunk_size: int, overlap: int = 0
+) -> List[List[Tuple[str, int, int]]]:
+    """
+    Splits sequences into slices of at most `chunk_size` bases that overlap by
+    `overlap` bases, consecutive slices are packed into chunks of at most
+    `chunk_size` bases so that many small sequences share a chunk
+
+    :param lengths: Sequence identifiers and lengths (e.g. `FastaIndex.lengths`)
+    :param chunk_size: Maximum number of bases in a chunk
+    :param overlap: Bases shared by consecutive slices of a sequence
+    :return: Chunks of slices with sequence identifier, zero-based start and exclusive end
+    :raises ValueError: if the overlap is not smaller than the chunk size
+    """
+
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("Slice overlap must be smaller than the chunk size")
+
+    chunks, chunk, chunk_length = [], [], 0
+    for seq_id, length in lengths.items():
+        for start in range(0, length, chunk_size - overlap):
+            end = min(start + chunk_size, length)
+            if chunk and chunk_length + end - start > chunk_size:
+                chunks.append(chunk)
+                chunk, chunk_length = [], 0
+            chunk.append((seq_id, start, end))
+            chunk_length += end - start
+            if end == length:
+                break
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+def write_fasta_slices(
+    fasta_file: Path,
+    slices: List[Tuple[str, int, int]],
+    outfile: Path,
+    name_split: str = "__",
+    range_split: str = "..",
+    line_width: int = 80,
+) -> None:
+    """
+    Writes slices of the sequences of an indexed FASTA file to a new FASTA file
+    with slice coordinates in the identifiers as in `slice_fasta_sequences`
+
+    :param fasta_file: Path to the FASTA file with an index (`write_fasta_index`)
+    :param slices: Sequence identifier, zero-based start and exclusive end of the slices
+    :param outfile: Path to the output FASTA file
+    """
+
+    with FastaIndex(fasta_file) as fasta, outfile.open("w") as sliced_fasta:
+        for seq_id, start, end in slices:
+            sequence = fasta.fetch(seq_id, start, end)
+            sliced_fasta.write(f">{seq_id}{name_split}{start}{range_split}{end}\n")
+            for i in range(0, len(sequence), line_width):
+                sliced_fasta.write(f"{sequence[i : i + line_width]}\n")
+
+
+# Query identifiers of multiplexed FASTA files are prefixed with
+# the index of their file to demultiplex alignments (Q{index}_)
+MULTIPLEX_QUERY_PREFIX = re.compile(r"^Q(\d+)_(.*)$", re.DOTALL)
+
+
+def get_multiplex_prefix(index: int) -> str:
+    return f"Q{index}_"
+
+
+def multiplex_fasta_files(fasta_files: List[Path], outfile: Path) -> None:
+    """
+    Concatenates FASTA files into a single FASTA file for a single invocation of
+    an aligner, sequence identifiers are prefixed with the index of their file
+    (`get_multiplex_prefix`) and text before the first header of a file is
+    skipped as in Biopython
+
+    :param fasta_files: Paths to the FASTA files
+    :param outfile: Path to the multiplexed FASTA file
+    """
+
+    with outfile.open("wb") as multiplexed:
+        for index, fasta_file in enumerate(fasta_files):
+            header = b">" + get_multiplex_prefix(index).encode()
+            with open(fasta_file, "rb") as fasta:
+                started, line = False, b"\n"
+                for line in fasta:
+                    if line.startswith(b">"):
+                        started = True
+                        line = header + line[1:]
+                    if started:
+                        multiplexed.write(line)
+                if started and not line.endswith(b"\n"):
+                    multiplexed.write(b"\n")
+
+
+class FastaSlice(NamedTuple):
+    """Slice from `iter_fasta_slices` with a view of the bases of its sequence"""
+
+    seq_id: str
+    id: str
+    description: str
+    bases: memoryview
+
+
+def read_fasta_sequence_bytes(
+    fasta_file: Path, sequence_subset: List[str] = None
+) -> Iterator[Tuple[str, bytes]]:
+    """Identifiers and bases of the sequences of a FASTA file (`read_fasta_sequences`)"""
+
+    if sequence_subset and FastaIndex.available(fasta_file):
+        with FastaIndex(fasta_file) as fasta:
+            for seq_id in fasta:
+                if seq_id in sequence_subset:
+                    yield seq_id, fasta.fetch_bytes(seq_id)
+        return
+
+    for seq_record in read_fasta_sequences(fasta_file, sequence_subset):
+        yield seq_record.id, bytes(seq_record.seq)
+
+
+def iter_fasta_slices(
+    fasta_file: Path,
+    slice_size: int = 10000,
+    sequence_subset: List[str] = None,
+    name_split: str = "__",
+    range_split: str = "..",
+    region: Tuple[int, int] | None = None,
+) -> Iterator[FastaSlice]:
+    """
+    Non-overlapping slices of the sequences of a FASTA file with slice coordinates in
+    the identifiers, slices are views of the bases of the current sequence so that a
+    single sequence is held in memory at a time
+
+    :param fasta_file: Path to the FASTA file
+    :param slice_size: Size of each slice (default is 10,000 bases)
+    :param region: Start and end of the sliced region of each sequence (multiples of the slice size)
+    """
+
+    region_start, region_end = region if region else (0, None)
+
+    for seq_id, sequence in read_fasta_sequence_bytes(fasta_file, sequence_subset):
+        bases = memoryview(sequence)
+        sequence_end = len(bases) if region_end is None else region_end
+        for i in range(region_start, min(sequence_end, len(bases)), slice_size):
+            yield FastaSlice(
+                seq_id=seq_id,
+                id=f"{seq_id}{name_split}{i}{range_split}{i+slice_size}",
+                description=f"Slice {i}-{i+slice_size} of {seq_id}",
+                bases=bases[i : i + slice_size],
+            )
+
+
+def write_fasta_slice(file: BinaryIO, fasta_slice: FastaSlice) -> None:
+    """Writes a slice as a single line record to a FASTA file opened in binary mode"""
+
+    file.write(f">{fasta_slice.id} {fasta_slice.description}\n".encode())
+    file.write(fasta_slice.bases)
+    file.write(b"\n")
+
+
+def stream_fasta_slices(
+    fasta_file: Path,
+    outfile: Path,
+    slice_size: int = 10000,
+    sequence_subset: List[str] = None,
+    name_split: str = "__",
+    range_split: str = "..",
+    region: Tuple[int, int] | None = None,
+) -> Dict[str, int]:
+    """
+    Writes slices of the sequences of a FASTA file to a new FASTA file as they are
+    read (`iter_fasta_slices`), output is the same as from `slice_fasta_sequences`
+
+    :param fasta_file: Path to the FASTA file
+    :param outfile: Path to the output FASTA file
+    :return: Number of slices written for each sliced sequence
+    """
+
+    slices = {}
+    with outfile.open("wb") as sliced_fasta:
+        for fasta_slice in iter_fasta_slices(
+            fasta_file,
+            slice_size=slice_size,
+            sequence_subset=sequence_subset,
+            name_split=name_split,
+            range_split=range_split,
+            region=region,
+        ):
+            write_fasta_slice(sliced_fasta, fasta_slice)
+            slices[fasta_slice.seq_id] = slices.get(fasta_slice.seq_id, 0) + 1
+
+    return slices
+
+
 def slice_fasta_sequences(
     fasta_file: Path,
     slice_size: int = 10000,
@@ -70,39 +321,41 @@ def slice_fasta_sequences(
     name_split: str = "__",
     range_split: str = "..",
     outfile: Path = None,
+    region: Tuple[int, int] | None = None,
 ) -> Dict[str, List[SeqRecord]]:
     """
     Takes a FASTA file and returns slices of each sequence with slice coordinates in the header.
+    Slices are held in memory, use `stream_fasta_slices` to write them to a file instead.
 
     :param fasta_file: Path to the FASTA file
     :param slice_size: Size of each slice (default is 10,000 bases)
+    :param region: Start and end of the sliced region of each sequence (multiples of the slice size)
     :return: A dictionary with sequence IDs as keys and a list of SeqRecords as values
     """
     sliced_sequences = {}
 
-    for seq_record in SeqIO.parse(str(fasta_file), "fasta"):
-
-        if sequence_subset and seq_record.id not in sequence_subset:
-            continue
-
-        slices = []
-        for i in range(0, len(seq_record), slice_size):
-            slice_seq = seq_record.seq[i : i + slice_size]
-            slice_id = f"{seq_record.id}{name_split}{i}{range_split}{i+slice_size}"
-            slice_description = f"Slice {i}-{i+slice_size} of {seq_record.id}"
-            slices.append(
-                SeqRecord(Seq(slice_seq), id=slice_id, description=slice_description)
+    sliced_fasta = outfile.open("wb") if outfile else None
+    try:
+        for fasta_slice in iter_fasta_slices(
+            fasta_file,
+            slice_size=slice_size,
+            sequence_subset=sequence_subset,
+            name_split=name_split,
+            range_split=range_split,
+            region=region,
+        ):
+            sliced_sequences.setdefault(fasta_slice.seq_id, []).append(
+                SeqRecord(
+                    Seq(bytes(fasta_slice.bases)),
+                    id=fasta_slice.id,
+                    description=fasta_slice.description,
+                )
             )
-
-        sliced_sequences[seq_record.id] = slices
-
-    if outfile:
-        with outfile.open("w") as sliced_fasta:
-            for _, slices in sliced_sequences.items():
-                for record in slices:
-                    sliced_fasta.write(
-                        f">{record.id} {record.description}\n{record.seq}\n"
-                    )
+            if sliced_fasta:
+                write_fasta_slice(sliced_fasta, fasta_slice)
+    finally:
+        if sliced_fasta:
+            sliced_fasta.close()
 
     return sliced_sequences
 
@@ -183,6 +436,556 @@ def enough_disk_space(path: Union[str, Path], disk_space_limit_gb: float) -> boo
     return free_space_bytes >= disk_space_limit_bytes
 
 
+# ====================
+# FASTA record scanner
+# ====================
+
+# IUPAC ambiguous nucleotide codes (upper and lower case) and bytes
+# removed from sequence lines as in Biopython's FASTA parser
+FASTA_NUCLEOTIDES = b"ACGTURYSWKMBDHVNacgturyswkmbdhvn"
+FASTA_REMOVED = b" \r\n"
+
+
+class FastaRecord(NamedTuple):
+    """
+    Record summary from `scan_fasta_records` with the fields of a `samtools faidx`
+    index entry, `line_bases` and `line_width` are zero for records that cannot be
+    indexed because their lines are not of uniform length
+    """
+
+    id: str
+    length: int
+    valid: bool
+    offset: int
+    line_bases: int
+    line_width: int
+
+    @property
+    def indexable(self) -> bool:
+        return self.line_width > 0 or self.length == 0
+
+
+class _FastaLineGeometry:
+    """Tracks whether the sequence lines of a record have a uniform length"""
+
+    def __init__(self):
+        self.line_bases = None
+        self.line_width = None
+        self.short = False  # a shorter line must be the last line with bases
+        self.regular = True
+
+    def add_region(self, region: bytes):
+        """Adds complete sequence lines, only the last line of the file may lack a line feed"""
+
+        if not self.regular or not region:
+            return
+        if region.count(b" ") or region.count(b"\r") != region.count(b"\r\n"):
+            self.regular = False
+            return
+
+        data = numpy.frombuffer(region, dtype=numpy.uint8)
+        ends = numpy.flatnonzero(data == 10)
+        starts = numpy.concatenate(([0], ends[:-1] + 1))
+        widths = ends - starts + 1
+        bases = widths - 1 - (data[numpy.maximum(ends - 1, 0)] == 13) * (widths > 1)
+        if not len(ends) or ends[-1] != len(region) - 1:
+            # last line of the file, its width is not part of the index
+            tail = len(region) - (ends[-1] + 1 if len(ends) else 0)
+            widths = numpy.append(widths, -1)
+            bases = numpy.append(bases, tail)
+
+        if self.line_bases is None:
+            self.line_bases = int(bases[0])
+            self.line_width = int(widths[0]) if widths[0] > 0 else int(bases[0]) + 1
+
+        if self.short:
+            # only empty lines may follow the last line with bases
+            self.regular = not bases.any()
+            return
+
+        full = (bases == self.line_bases) & ((widths == self.line_width) | (widths < 0))
+        short = numpy.flatnonzero(~full)
+        if len(short):
+            first = short[0]
+            self.short = True
+            self.regular = bool(
+                bases[first] < self.line_bases and not bases[first + 1 :].any()
+            )
+
+    def entry(self, length: int) -> Tuple[int, int]:
+        """Line bases and line width of the record index entry"""
+        if not self.regular or self.line_bases is None or not length:
+            return 0, 0
+        return self.line_bases, self.line_width
+
+
+def scan_fasta_records(
+    file_path: Path | str, chunk_size: int = 16 * 1024**2
+) -> Iterator[FastaRecord]:
+    """
+    Streams the records of a FASTA file in byte chunks and validates sequence
+    alphabets with byte deletion tables instead of per-character checks, memory
+    is bounded by the chunk size and the longest line.
+
+    Records are read as in Biopython: text before the first header is skipped,
+    identifiers are the first word of the header and trailing whitespace,
+    spaces and carriage returns are removed from sequence lines.
+
+    Byte offsets and line lengths of the sequences are collected in the same
+    pass so that an index can be written with `write_fasta_index`.
+
+    :param file_path: Path to the FASTA file
+    :param chunk_size: Size of the byte chunks read from the file
+    :return: Iterator of records with sequence identifier, length, whether the
+        sequence contains only IUPAC ambiguous nucleotide codes and index fields
+    """
+
+    seq_id, length, valid, offset, geometry = None, 0, True, 0, None
+
+    def add_sequence(region: bytes):
+        nonlocal length, valid
+        if not region.translate(None, FASTA_NUCLEOTIDES + FASTA_REMOVED):
+            length += len(region) - sum(region.count(b) for b in (b" ", b"\r", b"\n"))
+            geometry.add_region(region)
+        else:  # other whitespace is only removed from line ends
+            geometry.regular = False
+            for line in region.split(b"\n"):
+                line = line.rstrip().replace(b" ", b"").replace(b"\r", b"")
+                length += len(line)
+                valid = valid and not line.translate(None, FASTA_NUCLEOTIDES)
+
+    def record() -> FastaRecord:
+        return FastaRecord(seq_id, length, valid, offset, *geometry.entry(length))
+
+    def read_block(block: bytes, block_offset: int):
+        # Blocks start at a line start and end with a complete line
+        nonlocal seq_id, length, valid, offset, geometry
+        pos = 0
+        while pos < len(block):
+            if block.startswith(b">", pos):
+                header = pos
+            else:
+                header = block.find(b"\n>", pos)
+                header = header + 1 if header >= 0 else len(block)
+
+            if seq_id is not None:
+                add_sequence(block[pos:header])
+            if header == len(block):
+                break
+
+            end = block.find(b"\n", header)
+            end = len(block) if end < 0 else end
+            if seq_id is not None:
+                yield record()
+
+            title = block[header + 1 : end].decode().rstrip()
+            seq_id, length, valid = (title.split(None, 1)[0] if title else ""), 0, True
+            offset, geometry = (
+                block_offset + min(end + 1, len(block)),
+                _FastaLineGeometry(),
+            )
+            pos = end + 1
+
+    with open(file_path, "rb") as file:
+        pending, block_offset = [], 0  # chunks of a line longer than the chunk size
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            cut = chunk.rfind(b"\n")
+            if cut < 0:
+                pending.append(chunk)
+                continue
+            block = b"".join(pending + [chunk[: cut + 1]])
+            yield from read_block(block, block_offset)
+            block_offset += len(block)
+            pending = [chunk[cut + 1 :]]
+        yield from read_block(b"".join(pending), block_offset)
+
+    if seq_id is not None:
+        yield record()
+
+
+def get_fasta_index_file(fasta_file: Path | str) -> Path:
+    """Path of the index file next to a FASTA file (<file>.fai)"""
+    fasta_file = Path(fasta_file)
+    return fasta_file.with_name(f"{fasta_file.name}.fai")
+
+
+def write_fasta_index(
+    fasta_file: Path | str, records: List[FastaRecord]
+) -> Path | None:
+    """
+    Writes the records collected by `scan_fasta_records` as an index compatible
+    with `samtools faidx` next to the FASTA file. No index is written if any
+    record has lines of irregular length or identifiers are not unique.
+
+    :param fasta_file: Path to the FASTA file
+    :param records: Records of the FASTA file
+    :return: Path to the index file or None if the file cannot be indexed
+    """
+
+    if not all(record.indexable for record in records) or len(
+        {record.id for record in records}
+    ) != len(records):
+        return None
+
+    index_file = get_fasta_index_file(fasta_file)
+    with index_file.open("w") as index:
+        for record in records:
+            index.write(
+                f"{record.id}\t{record.length}\t{record.offset}\t{record.line_bases}\t{record.line_width}\n"
+            )
+    return index_file
+
+
+class FastaIndex:
+    """
+    Random access to the sequences of an indexed FASTA file through a memory map,
+    fetching a sequence or subsequence only reads the requested bytes
+
+        with FastaIndex(fasta_file) as fasta:
+            fasta.fetch("chr1", start=1000, end=2000)
+    """
+
+    def __init__(self, fasta_file: Path | str, index_file: Path | str | None = None):
+        self.fasta_file = Path(fasta_file)
+        self.index_file = (
+            get_fasta_index_file(fasta_file) if index_file is None else Path(index_file)
+        )
+
+        self.entries: Dict[str, Tuple[int, int, int, int]] = {}
+        with self.index_file.open() as index:
+            for line in index:
+                if line.strip():
+                    name, *fields = line.rstrip("\n").split("\t")[:5]
+                    self.entries.setdefault(name, tuple(int(field) for field in fields))
+
+        self._file = None
+        self._data = None
+
+    @classmethod
+    def available(cls, fasta_file: Path | str) -> bool:
+        """Whether an index exists that is not older than the FASTA file"""
+        index_file = get_fasta_index_file(fasta_file)
+        return (
+            index_file.exists()
+            and index_file.stat().st_mtime >= Path(fasta_file).stat().st_mtime
+        )
+
+    def __enter__(self) -> "FastaIndex":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, seq_id: str) -> bool:
+        return seq_id in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+        self._file, self._data = None, None
+
+    @property
+    def data(self) -> mmap.mmap | bytes:
+        if self._data is None:
+            self._file = self.fasta_file.open("rb")
+            if os.fstat(self._file.fileno()).st_size == 0:
+                return b""  # empty files cannot be mapped
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data
+
+    def lengths(self) -> Dict[str, int]:
+        return {name: entry[0] for name, entry in self.entries.items()}
+
+    def length(self, seq_id: str) -> int:
+        return self.entries[seq_id][0]
+
+    def fetch(self, seq_id: str, start: int = 0, end: int | None = None) -> str:
+        """
+        Sequence or subsequence of a record with zero-based start and exclusive end
+
+        :raises KeyError: if the sequence is not in the index
+        """
+
+        return self.fetch_bytes(seq_id, start, end).decode()
+
+    def fetch_bytes(self, seq_id: str, start: int = 0, end: int | None = None) -> bytes:
+        """Bases of a sequence or subsequence of a record as in `fetch`"""
+
+        length, offset, line_bases, line_width = self.entries[seq_id]
+        start = max(0, start)
+        end = length if end is None else min(end, length)
+        if end <= start:
+            return b""
+
+        def position(base: int) -> int:
+            return offset + (base // line_bases) * line_width + base % line_bases
+
+        region = self.data[position(start) : position(end)]
+        return region.translate(None, b"\r\n")
+
+
+# =======================
+# GenBank feature scanner
+# =======================
+
+GENBANK_QUALIFIER_INDENT = 21
+GENBANK_QUALIFIER_SPACER = " " * GENBANK_QUALIFIER_INDENT
+GENBANK_SEQUENCE_HEADERS = ("CONTIG", "ORIGIN", "BASE COUNT", "WGS", "TSA", "TLS")
+
+GENBANK_LOCATION_OPERATOR = re.compile(r"[A-Za-z]+\(|\)")
+GENBANK_LOCATION_MARKERS = str.maketrans("", "", "<>( ")
+
+
+def parse_genbank_location(location: str) -> Tuple[int, int]:
+    """
+    Zero-based start and exclusive end spanned by a feature location as in
+    Biopython (`int(feature.location.start)` and `int(feature.location.end)`)
+
+    Supports ranges and single bases with partial markers (<1..>100), between
+    positions (123^124), uncertain positions ((1.5)..100), remote parts and the
+    complement, join, order and bond operators (e.g. complement(join(1..5,9..20)))
+    """
+
+    starts, ends = [], []
+    for part in GENBANK_LOCATION_OPERATOR.sub("", location).split(","):
+        part = part.rsplit(":", 1)[-1].translate(GENBANK_LOCATION_MARKERS)
+        if ".." in part:
+            left, right = part.split("..", 1)
+            starts.append(min(int(value) for value in left.split(".")) - 1)
+            ends.append(max(int(value) for value in right.split(".")))
+        elif "^" in part:
+            position = int(part.split("^", 1)[0])
+            starts.append(position)
+            ends.append(position)
+        else:
+            values = [int(value) for value in part.split(".")]
+            starts.append(min(values) - 1)
+            ends.append(max(values))
+
+    if not starts:
+        raise ValueError(f"Could not parse feature location: {location}")
+
+    return min(starts), max(ends)
+
+
+def _genbank_qualifier_value(lines: List[str]) -> str:
+    # Multi-line values are joined with spaces, enclosing quotes
+    # are removed and escaped quotes are unescaped as in Biopython
+    value = " ".join(lines)
+    if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+        value = value[1:-1]
+    return value.replace('""', '"')
+
+
+def _split_genbank_feature(lines: List[str]) -> Tuple[str, List[str]]:
+    """Location and qualifier lines of a feature (lines after the feature key)"""
+
+    # Locations continue on the next line when wrapped at a comma
+    location, i = lines[0].strip(), 1
+    while i < len(lines) and (
+        location.endswith(",") or location.count("(") > location.count(")")
+    ):
+        location += lines[i].strip()
+        i += 1
+
+    return location, lines[i:]
+
+
+def _iter_genbank_qualifiers(lines: List[str]) -> Iterator[Tuple[str, List[str]]]:
+    """Qualifier names and value lines, quoted values may contain lines starting with '/'"""
+
+    name, value_lines, quoted = None, [], False
+    for line in lines:
+        if not line:
+            continue
+        if quoted:
+            value_lines.append(line)
+            quoted = not line.endswith('"')
+        elif line.startswith("/"):
+            if name is not None:
+                yield name, value_lines
+            name, _, value = line[1:].partition("=")
+            value_lines = [value.lstrip() if value.lstrip().startswith('"') else value]
+            quoted = len(value_lines[0]) > 1 and (
+                value_lines[0].startswith('"') and not value_lines[0].endswith('"')
+            )
+        elif name is not None:
+            value_lines.append(line)  # unquoted continuation
+
+    if name is not None:
+        yield name, value_lines
+
+
+def scan_genbank_features(
+    file_path: Path | str,
+    feature_types: List[str] | None = None,
+    qualifiers: List[str] = ("gene", "product"),
+) -> Iterator[Tuple[str, int, int, Dict[str, str]]]:
+    """
+    Streams the feature tables of a GenBank file line by line without reading
+    records into memory, sequence data after ORIGIN is skipped.
+
+    :param file_path: Path to the GenBank file
+    :param feature_types: Feature types to return (all if None)
+    :param qualifiers: Qualifiers to return, only the first value of each is kept
+    :return: Iterator of feature type, start, end and qualifier values in file order,
+        start and end are zero-based and end-exclusive as in Biopython
+    """
+
+    feature_types = None if feature_types is None else set(feature_types)
+    qualifiers = set(qualifiers)
+
+    def feature(key: str, lines: List[str]):
+        location, qualifier_lines = _split_genbank_feature(lines)
+        start, end = parse_genbank_location(location)
+
+        values: Dict[str, str] = {}
+        for name, value_lines in _iter_genbank_qualifiers(qualifier_lines):
+            if name in qualifiers and name not in values:
+                values[name] = _genbank_qualifier_value(value_lines)
+
+        return key, start, end, values
+
+    with open(file_path, "r") as file:
+        in_features, key, lines = False, None, []
+        for line in file:
+            if not in_features:
+                in_features = line.startswith("FEATURES")
+                continue
+
+            if line.startswith(GENBANK_QUALIFIER_SPACER) or not line.strip():
+                if key is not None:
+                    lines.append(line[GENBANK_QUALIFIER_INDENT:].strip())
+                continue
+
+            if key is not None:
+                yield feature(key, lines)
+                key, lines = None, []
+
+            if line.startswith(GENBANK_SEQUENCE_HEADERS) or line.startswith("//"):
+                in_features = False  # sequence data is skipped until the next record
+                continue
+
+            feature_type = line[2:GENBANK_QUALIFIER_INDENT].strip()
+            if feature_type and (
+                feature_types is None or feature_type in feature_types
+            ):
+                key, lines = feature_type, [line[GENBANK_QUALIFIER_INDENT:]]
+
+        if key is not None:
+            yield feature(key, lines)
+
+
+def _genbank_record_id(locus: str, accessions: List[str], version: str) -> str:
+    # Versioned accession, first accession or locus name as Biopython `record.id`
+    if version:
+        accession, _, suffix = version.partition(".")
+        if version.count(".") == 1 and suffix.isdigit():
+            return f"{(accessions or [accession])[0]}.{suffix}"
+        return version
+    return accessions[0] if accessions else locus
+
+
+def summarize_genbank_file(
+    file_path: Path | str,
+) -> Tuple[List[Tuple[str, int]], Set[str], Set[str]]:
+    """
+    Validates the structure of a GenBank file and summarizes its records in a
+    single streaming pass without reading records into memory.
+
+    :param file_path: Path to the GenBank file
+    :return: Sequence identifiers and lengths of the records (as `record.id` and
+        `len(record.seq)` in Biopython), feature types and qualifier keys
+    :raises ValueError: If records do not start with LOCUS and end with '//' or
+        the feature table of a record is not followed by sequence data
+    """
+
+    sequences: List[Tuple[str, int]] = []
+    feature_types: Set[str] = set()
+    qualifier_keys: Set[str] = set()
+
+    def add_qualifiers(lines: List[str]):
+        _, qualifier_lines = _split_genbank_feature(lines)
+        qualifier_keys.update(
+            name for name, _ in _iter_genbank_qualifiers(qualifier_lines)
+        )
+
+    with open(file_path, "r") as file:
+        locus = None
+        for line in file:
+            if locus is None:
+                if not line.strip():
+                    continue
+                if not line.startswith("LOCUS"):
+                    raise ValueError("Invalid Genbank file format")
+
+                fields = line.split()
+                locus, size = fields[1] if len(fields) > 1 else "", None
+                for i, field in enumerate(fields[2:], start=2):
+                    if field in ("bp", "aa") and fields[i - 1].isdigit():
+                        size = int(fields[i - 1])
+                accessions, version = [], ""
+                section, feature_lines, has_sequence, length = "header", None, False, 0
+                continue
+
+            if line.startswith("//"):
+                if section == "features":
+                    raise ValueError(
+                        f"Premature end of features table in record {locus}"
+                    )
+
+                # Records without sequence data have the length of the LOCUS line
+                sequences.append(
+                    (
+                        _genbank_record_id(locus, accessions, version),
+                        length if has_sequence else size or 0,
+                    )
+                )
+                locus = None
+                continue
+
+            if section == "sequence":
+                if line.startswith("ORIGIN"):
+                    has_sequence = True
+                elif has_sequence:
+                    length += sum(len(block) for block in line.split()[1:])
+                continue
+
+            if section == "features":
+                if line.startswith(GENBANK_QUALIFIER_SPACER) or not line.strip():
+                    if feature_lines is not None:
+                        feature_lines.append(line[GENBANK_QUALIFIER_INDENT:].strip())
+                    continue
+
+                if feature_lines is not None:
+                    add_qualifiers(feature_lines)
+                    feature_lines = None
+
+                if not line.startswith(GENBANK_SEQUENCE_HEADERS):
+                    feature_types.add(line[2:GENBANK_QUALIFIER_INDENT].strip())
+                    feature_lines = [line[GENBANK_QUALIFIER_INDENT:]]
+                    continue
+
+            if line.startswith(GENBANK_SEQUENCE_HEADERS):
+                section = "sequence"
+                has_sequence = line.startswith("ORIGIN")
+            elif line.startswith("FEATURES"):
+                section = "features"
+            elif line.startswith("ACCESSION") and not accessions:
+                accessions = line[12:].replace(";", " ").split()
+            elif line.startswith("VERSION") and not version:
+                version = next(iter(line[12:].split()), "")
+
+        if locus is not None:
+            raise ValueError("Invalid Genbank file format")  # missing terminating '//'
+
+    return sequences, feature_types, qualifier_keys
+
+
 # =================
 # String sanitizers
 # =================
@@ -0,0 +1,212 @@
+import os
+import time
+import fcntl
+import hashlib
+import shutil
+import pytest
+
+from pathlib import Path
+from multiprocessing import get_context
+
+from brick.api.cache import ContentCache, file_lock, hash_file
+from brick.api.cache import get_file_hash, get_file_hash_file, get_sequence_hash
+from brick.utils import scan_fasta_records, write_fasta_index
+
+
+def build_copy(file_path: Path, entry_directory: Path):
+    """Builds an entry with a copy of the input file and records the build"""
+    (entry_directory / "copy").write_bytes(file_path.read_bytes())
+    with (file_path.parent / "builds.log").open("a") as log:
+        log.write(f"{os.getpid()}\n")
+    time.sleep(0.1)
+
+
+def use_entry(cache_directory: Path, file_path: Path) -> bytes:
+    cache = ContentCache(directory=cache_directory, max_size_mb=100)
+    with cache.entry(file_path=file_path, build=build_copy) as entry_directory:
+        return (entry_directory / "copy").read_bytes()
+
+
+def get_builds(directory: Path) -> int:
+    log = directory / "builds.log"
+    return len(log.read_text().splitlines()) if log.exists() else 0
+
+
+@pytest.fixture
+def reference_file(tmp_path: Path) -> Path:
+    file_path = tmp_path / "reference.fasta"
+    file_path.write_text(">seq1\nACGT\n")
+    return file_path
+
+
+def test_file_hash_is_stored_and_validated(reference_file: Path):
+    hash_file_path = get_file_hash_file(reference_file)
+    digest = get_file_hash(reference_file)
+    assert digest == hash_file(reference_file)
+    assert hash_file_path.read_text() == digest
+    assert {file.name for file in reference_file.parent.iterdir()} == {
+        reference_file.name,
+        hash_file_path.name,
+    }
+
+    # Empty or partial digests are rehashed
+    for stored in ("", digest[:10], "x" * 64):
+        hash_file_path.write_text(stored)
+        assert get_file_hash(reference_file) == digest
+        assert hash_file_path.read_text() == digest
+
+
+def test_cache_entry_is_built_once(tmp_path: Path, reference_file: Path):
+    cache = ContentCache(directory=tmp_path / "cache", max_size_mb=100)
+
+    with cache.entry(reference_file, build=build_copy) as entry_directory:
+        assert entry_directory.name == hash_file(reference_file)
+        assert (entry_directory / "copy").read_text() == ">seq1\nACGT\n"
+
+    # identical contents in another session share the entry
+    other_file = tmp_path / "other.fasta"
+    other_file.write_text(">seq1\nACGT\n")
+    with cache.entry(other_file, build=build_copy) as other_directory:
+        assert other_directory == entry_directory
+
+    assert get_builds(tmp_path) == 1
+    assert not list((tmp_path / "cache").glob("*.tmp"))
+
+
+def test_cache_entry_is_built_once_concurrently(tmp_path: Path, reference_file: Path):
+    with get_context("fork").Pool(4) as pool:
+        results = pool.starmap(use_entry, [(tmp_path / "cache", reference_file)] * 8)
+
+    assert results == [b">seq1\nACGT\n"] * 8
+    assert get_builds(tmp_path) == 1
+
+
+def test_cache_build_failure(tmp_path: Path, reference_file: Path):
+    cache = ContentCache(directory=tmp_path / "cache", max_size_mb=100)
+
+    def build_failure(file_path: Path, entry_directory: Path):
+        (entry_directory / "partial").write_text("partial")
+        raise ValueError("Failed to build")
+
+    with pytest.raises(ValueError, match="Failed to build"):
+        with cache.entry(reference_file, build=build_failure):
+            pass
+
+    assert not cache.get_entries()
+    assert not list((tmp_path / "cache").glob("*.tmp"))
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path):
+    cache = ContentCache(directory=tmp_path / "cache", max_size_mb=2.5 / 1024)
+
+    files = []
+    for i in range(3):
+        file_path = tmp_path / f"file{i}"
+        file_path.write_bytes(bytes([i]) * 1024)
+        files.append(file_path)
+
+    for file_path in files[:2]:
+        with cache.entry(file_path, build=build_copy):
+            pass
+        time.sleep(0.01)
+
+    # first entry is used again and the second entry is least recently used
+    with cache.entry(files[0], build=build_copy):
+        pass
+    time.sleep(0.01)
+
+    # least recently used entry is skipped while in use
+    with file_lock(cache.get_lock_file(hash_file(files[1])), fcntl.LOCK_SH):
+        with cache.entry(files[2], build=build_copy):
+            pass
+
+    assert {entry.name for entry, _, _ in cache.get_entries()} == {
+        hash_file(files[1]),
+        hash_file(files[2]),
+    }
+
+    with cache.entry(files[0], build=build_copy):
+        pass
+
+    assert {entry.name for entry, _, _ in cache.get_entries()} == {
+        hash_file(files[0]),
+        hash_file(files[2]),
+    }
+
+    # Lock files are removed with their evicted entries
+    assert {lock_file.stem for lock_file in cache.directory.glob("*.lock")} == {
+        "evict",
+        hash_file(files[0]),
+        hash_file(files[2]),
+    }
+
+
+def test_cache_evicts_after_builds(tmp_path: Path, reference_file: Path, monkeypatch):
+    cache = ContentCache(directory=tmp_path / "cache", max_size_mb=100)
+    evictions = []
+    monkeypatch.setattr(cache, "evict", lambda: evictions.append(True) or 0)
+
+    for _ in range(3):
+        with cache.entry(reference_file, build=build_copy):
+            pass
+
+    # Entries in the cache are used without evicting
+    assert get_builds(tmp_path) == 1
+    assert len(evictions) == 1
+
+
+def test_file_lock_removed_lock_file(tmp_path: Path):
+    lock_file = tmp_path / "entry.lock"
+
+    # Lock is acquired on the new lock file at the path while the lock on
+    # the removed lock file is still held
+    with file_lock(lock_file, fcntl.LOCK_EX) as acquired:
+        assert acquired
+        lock_file.unlink()
+        with file_lock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB) as acquired:
+            assert acquired and lock_file.exists()
+
+
+def test_cache_evicts_above_disk_watermark(tmp_path: Path, monkeypatch):
+    cache = ContentCache(
+        directory=tmp_path / "cache", max_size_mb=100, disk_watermarks=(0.8, 0.9)
+    )
+
+    files = []
+    for i in range(3):
+        file_path = tmp_path / f"file{i}"
+        file_path.write_bytes(bytes([i]) * 1024)
+        files.append(file_path)
+        with cache.entry(file_path, build=build_copy):
+            pass
+        time.sleep(0.01)
+
+    assert len(cache.get_entries()) == 3
+
+    # Disk used above the high watermark by 1.5 entries until the low watermark
+    disk_usage = shutil._ntuple_diskusage(total=10240, used=8192 + 1536, free=512)
+    monkeypatch.setattr("brick.api.cache.shutil.disk_usage", lambda path: disk_usage)
+
+    assert cache.evict() == 2
+    assert [entry.name for entry, _, _ in cache.get_entries()] == [hash_file(files[2])]
+
+
+def test_sequence_hash_from_index(tmp_path: Path):
+    fasta_file = tmp_path / "reference.fasta"
+    fasta_file.write_text(">chr1\nACGTAC\nGTAC\n>plasmid_1\nGGCC\n")
+    digest = hashlib.sha256(b"ACGTACGTAC").hexdigest()
+
+    assert get_sequence_hash(fasta_file, "chr1") == digest
+
+    # Bases are hashed in chunks read from the index
+    write_fasta_index(fasta_file, list(scan_fasta_records(fasta_file)))
+    assert get_sequence_hash(fasta_file, "chr1", chunk_size=4) == digest
+
+    # Same bases with another identifier in another file
+    other_file = tmp_path / "other.fasta"
+    other_file.write_text(">contig_1\nACGTACGTAC\n")
+    assert get_sequence_hash(other_file, "contig_1") == digest
+
+    for file_path in (fasta_file, other_file):
+        with pytest.raises(ValueError, match="Sequences not found in FASTA file"):
+            get_sequence_hash(file_path, "chr2")
@@ -3,9 +3,15 @@ from pymongo.collection import Collection
 from motor.motor_asyncio import AsyncIOMotorCollection
 from unittest.mock import patch, MagicMock, AsyncMock
 
+from brick.api.core.config import settings
 from brick.api.core.db import (
+    append_ring_segments,
+    chunk_ring_segments,
+    ensure_indexes,
     get_session_collection_motor,
     get_session_collection_pymongo,
+    group_ring_segments,
+    store_ring_segments,
 )
 
 
@@ -38,3 +44,101 @@ def test_get_session_collection_pymongo(mock_pymongo_client):
 async def test_get_session_collection_motor(mock_motor_client):
     collection = await get_session_collection_motor()
     assert isinstance(collection, AsyncIOMotorCollection)
+
+
+def test_chunk_ring_segments(monkeypatch):
+    monkeypatch.setattr(settings, "RING_SEGMENT_CHUNK_SIZE", 2)
+    segments = [{"start": start, "end": start + 10} for start in range(0, 50, 10)]
+
+    chunks = chunk_ring_segments("session", "ring", segments)
+    assert [(chunk["chunk"], len(chunk["data"])) for chunk in chunks] == [
+        (0, 2),
+        (1, 2),
+        (2, 1),
+    ]
+    # Chunks are bounded by the coordinates of their segments
+    assert [(chunk["start_min"], chunk["end_max"]) for chunk in chunks] == [
+        (0, 20),
+        (20, 40),
+        (40, 50),
+    ]
+    (reversed_chunk,) = chunk_ring_segments("session", "ring", [{"start": 9, "end": 3}])
+    assert (reversed_chunk["start_min"], reversed_chunk["end_max"]) == (3, 9)
+    assert chunk_ring_segments("session", "ring", []) == []
+
+    # Chunks of rings are assembled in the order of the segment store query
+    other_chunks = chunk_ring_segments("session", "other", segments[:1])
+    assert group_ring_segments(other_chunks + chunks) == {
+        "other": segments[:1],
+        "ring": segments,
+    }
+
+
+@patch("brick.api.core.db.get_segment_collection_pymongo")
+def test_store_ring_segments_generation(mock_segment_collection, monkeypatch):
+    monkeypatch.setattr(settings, "RING_SEGMENT_CHUNK_SIZE", 2)
+    segments = [{"start": start, "end": start + 10} for start in range(0, 30, 10)]
+
+    # Segments are stored under a new generation of the ring
+    generation = store_ring_segments("session", "ring", segments)
+    (chunks,) = mock_segment_collection.return_value.insert_many.call_args.args
+    assert {chunk["generation"] for chunk in chunks} == {generation}
+    assert store_ring_segments("session", "ring", segments) != generation
+    mock_segment_collection.return_value.delete_many.assert_not_called()
+
+
+@patch("brick.api.core.db.get_segment_collection_pymongo")
+def test_append_ring_segments(mock_segment_collection, monkeypatch):
+    monkeypatch.setattr(settings, "RING_SEGMENT_CHUNK_SIZE", 4)
+    collection = mock_segment_collection.return_value
+    collection.find_one.return_value = {"_id": "chunk_id", "chunk": 1}
+    segments = [{"start": 20, "end": 30}, {"start": 10, "end": 20}]
+
+    # Segments are pushed into the last chunk if it has room for them
+    collection.update_one.return_value.modified_count = 1
+    append_ring_segments("session", "ring", "gen", segments)
+    query, update = collection.update_one.call_args.args
+    assert query == {"_id": "chunk_id", "data.2": {"$exists": False}}
+    assert update == {
+        "$push": {"data": {"$each": segments, "$sort": {"start": 1}}},
+        "$min": {"start_min": 10},
+        "$max": {"end_max": 30},
+    }
+    assert collection.find_one.call_args.args[0]["generation"] == "gen"
+    collection.insert_many.assert_not_called()
+
+    # Segments are stored in a new chunk if the last chunk is full
+    collection.update_one.return_value.modified_count = 0
+    append_ring_segments("session", "ring", "gen", segments)
+    (chunks,) = collection.insert_many.call_args.args
+    assert [(chunk["chunk"], chunk["generation"]) for chunk in chunks] == [(2, "gen")]
+
+    # Segments of rings without stored segments start the first chunk
+    collection.find_one.return_value = None
+    append_ring_segments("session", "ring", None, segments)
+    (chunks,) = collection.insert_many.call_args.args
+    assert [chunk["chunk"] for chunk in chunks] == [0]
+
+
+@patch("brick.api.core.db.get_segment_collection_pymongo")
+@patch("brick.api.core.db.get_session_collection_pymongo")
+def test_ensure_indexes(mock_session_collection, mock_segment_collection):
+    mock_session_collection.return_value.create_indexes.return_value = ["id"]
+    mock_segment_collection.return_value.create_indexes.return_value = ["chunk"]
+
+    assert ensure_indexes() == ["id", "chunk"]
+
+    (indexes,) = mock_session_collection.return_value.create_indexes.call_args.args
+    documents = {index.document["name"]: index.document for index in indexes}
+    assert documents["id"]["unique"]
+    assert set(documents) == {"id", "rings_id", "date"}
+
+    (indexes,) = mock_segment_collection.return_value.create_indexes.call_args.args
+    assert list(indexes[0].document["key"]) == ["session_id", "ring_id", "chunk"]
+    assert list(indexes[1].document["key"]) == [
+        "session_id",
+        "ring_id",
+        "generation",
+        "start_min",
+        "end_max",
+    ]
@@ -0,0 +1,89 @@
+import pytest
+
+from unittest.mock import AsyncMock
+
+from brick.api.core.repository import (
+    load_ring_headers,
+    load_session_files,
+    load_session_rings,
+    session_exists,
+)
+from brick.rings import RingType
+
+
+mock_file = {
+    "session_id": "some_uuid",
+    "id": "file_1",
+    "type": "genome",
+    "format": "fasta",
+    "records": 1,
+    "total_length": 100,
+    "name_original": "genome.fasta",
+    "selections": {},
+}
+
+
+@pytest.mark.asyncio
+async def test_load_session_files():
+    collection = AsyncMock()
+    collection.find_one.return_value = {"files": [mock_file]}
+
+    (file,) = await load_session_files(collection, session_id="some_uuid")
+    assert file.id == "file_1"
+    assert collection.find_one.call_args.args[1] == {"_id": 0, "files": 1}
+
+    # Single files are selected in the database
+    await load_session_files(collection, session_id="some_uuid", file_id="file_1")
+    assert collection.find_one.call_args.args[1] == {
+        "_id": 0,
+        "files": {"$elemMatch": {"id": "file_1"}},
+    }
+
+    collection.find_one.return_value = None
+    assert await load_session_files(collection, session_id="some_uuid") is None
+
+
+@pytest.mark.asyncio
+async def test_load_ring_headers():
+    collection = AsyncMock()
+    collection.find_one.return_value = {
+        "rings": [{"id": "blast", "index": 0, "type": "blast"}, {"id": "label"}]
+    }
+
+    headers = await load_ring_headers(collection, session_id="some_uuid")
+    assert [(ring.id, ring.index, ring.type) for ring in headers] == [
+        ("blast", 0, RingType.BLAST),
+        ("label", -1, RingType.GENERIC),
+    ]
+    assert "rings.data" not in collection.find_one.call_args.args[1]
+
+
+@pytest.mark.asyncio
+async def test_load_session_rings():
+    collection = AsyncMock()
+    collection.find_one.return_value = {}
+
+    # Sessions without the ring are found but have no rings
+    assert (
+        await load_session_rings(collection, session_id="some_uuid", ring_id="blast")
+        == []
+    )
+    assert collection.find_one.call_args.args[1] == {
+        "_id": 0,
+        "rings": {"$elemMatch": {"id": "blast"}},
+    }
+
+    collection.find_one.return_value = None
+    assert await load_session_rings(collection, session_id="some_uuid") is None
+
+
+@pytest.mark.asyncio
+async def test_session_exists():
+    collection = AsyncMock()
+    collection.find_one.return_value = {"_id": "object_id"}
+
+    assert await session_exists(collection, session_id="some_uuid")
+    assert collection.find_one.call_args.args[1] == {"_id": 1}
+
+    collection.find_one.return_value = None
+    assert not await session_exists(collection, session_id="some_uuid")
@@ -1,16 +1,21 @@
 import pytest
 import shutil
 import uuid
+import hashlib
 
 from pathlib import Path
 from httpx import AsyncClient
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from brick.api.main import app, settings
 
-from brick.rings import RingReference
-from brick.api.schemas import BlastRingSchema, BlastRingResponse
+from brick.rings import RingReference, RingReferenceSequence
+from brick.rings import BLASTN_SEGMENT_COLUMNS, read_blastn_output, save_blastn_hits
+from brick.api.cache import get_blast_hits_cache, get_blast_hits_key
+from brick.api.schemas import BlastRingSchema, BlastRingResponse, BlastRingFilterSchema
+from brick.api.schemas import BlastRingBatchSchema
 from brick.api.schemas import AnnotationRingSchema, AnnotationRingResponse
 from brick.api.schemas import LabelRingSchema, LabelRingResponse
+from brick.api.schemas import GenomadRingSchema
 
 
 def create_mock_session_directory(session_id: str) -> Path:
@@ -115,6 +120,53 @@ async def test_create_annotation_ring_failure(
         assert response.status_code == 500
 
 
+@pytest.mark.asyncio
+@patch("brick.api.endpoints.rings.process_genomad_ring_shards")
+@patch("brick.api.endpoints.rings.process_genomad_shard")
+@patch("brick.api.endpoints.rings.chord")
+async def test_create_genomad_ring_shards(
+    mock_chord, mock_process_genomad_shard, mock_process_genomad_ring_shards
+):
+    session_directory = create_mock_session_directory(str(uuid.uuid4()))
+    reference_file = create_mock_session_file(session_directory.name)
+    reference_file.write_text(">chr1\nACGT\n")
+    genomad_ring_schema = GenomadRingSchema(
+        reference=RingReference(
+            session_id=session_directory.name,
+            reference_id=reference_file.name,
+            sequence=RingReferenceSequence(id="chr1", length=5_000_000),
+        ),
+        window_size=5000,
+    )
+    mock_chord.return_value.return_value = MagicMock(id="some_task_id")
+
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.post(
+                "/rings/genomad", json=genomad_ring_schema.model_dump()
+            )
+            assert response.status_code == 202
+            assert response.json()["task_id"] == "some_task_id"
+    finally:
+        shutil.rmtree(session_directory)
+
+    # One geNomad task for each shard of windows with its own output file
+    assert len(list(mock_chord.call_args.args[0])) == settings.GENOMAD_SHARD_WORKERS
+    shard_calls = mock_process_genomad_shard.s.call_args_list
+    regions = [call.args[2] for call in shard_calls]
+    assert regions[0][0] == 0 and regions[-1][1] == 5_000_000
+    output_files = [Path(call.args[3]) for call in shard_calls]
+    assert output_files[0].name == "0.tsv"
+    assert mock_process_genomad_ring_shards.s.call_args.args[2] == str(
+        output_files[0].parent
+    )
+
+    # Sequence is hashed once for the cache key of the shards and the callback
+    sequence_hash = hashlib.sha256(b"ACGT").hexdigest()
+    assert {call.args[4] for call in shard_calls} == {sequence_hash}
+    assert mock_process_genomad_ring_shards.s.call_args.args[3] == sequence_hash
+
+
 @pytest.fixture()
 def mock_blast_ring_data():
 
@@ -153,6 +205,47 @@ async def test_create_blast_ring_success(mock_process_blast_ring, mock_blast_rin
         assert response.json() == mock_blast_ring_response.model_dump()
 
 
+@pytest.mark.asyncio
+@patch("brick.api.endpoints.rings.process_blast_ring_chunks")
+@patch("brick.api.endpoints.rings.process_blast_query_chunk")
+@patch("brick.api.endpoints.rings.plan_blast_query_chunks")
+@patch("brick.api.endpoints.rings.chord")
+async def test_create_blast_ring_query_chunks(
+    mock_chord,
+    mock_plan_blast_query_chunks,
+    mock_process_blast_query_chunk,
+    mock_process_blast_ring_chunks,
+    mock_blast_ring_data,
+):
+    mock_blast_ring_schema, mock_blast_ring_response = mock_blast_ring_data
+    mock_plan_blast_query_chunks.return_value = [
+        [("chr1", 0, 5000)],
+        [("chr1", 4900, 8000), ("plasmid", 0, 1000)],
+    ]
+    mock_chord.return_value.return_value = MagicMock(
+        id=mock_blast_ring_response.task_id
+    )
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post(
+            "/rings/blast", json=mock_blast_ring_schema.model_dump()
+        )
+        assert response.status_code == 202
+        assert response.json() == mock_blast_ring_response.model_dump()
+
+    # One BLAST task for each chunk of query slices with its own hits file
+    assert len(list(mock_chord.call_args.args[0])) == 2
+    chunk_calls = mock_process_blast_query_chunk.s.call_args_list
+    assert [call.args[3] for call in chunk_calls] == (
+        mock_plan_blast_query_chunks.return_value
+    )
+    hits_files = [Path(call.args[4]) for call in chunk_calls]
+    assert [file.name for file in hits_files] == ["0.npz", "1.npz"]
+    assert mock_process_blast_ring_chunks.s.call_args.args[3] == str(
+        hits_files[0].parent
+    )
+
+
 @pytest.mark.asyncio
 @patch("brick.api.endpoints.rings.process_blast_ring")
 async def test_create_blast_ring_failure(mock_process_blast_ring, mock_blast_ring_data):
@@ -164,3 +257,240 @@ async def test_create_blast_ring_failure(mock_process_blast_ring, mock_blast_rin
             "/rings/blast", json=mock_blast_ring_schema.model_dump()
         )
         assert response.status_code == 500
+
+
+BLAST_HITS = "\n".join(
+    [
+        "query\tchr1\t100.000\t1000\t0\t0\t1\t1000\t1\t1000\t0.0\t1800",
+        "query\tchr1\t99.500\t800\t4\t0\t1\t800\t2000\t2799\t1e-50\t1400",
+        "query\tchr1\t85.250\t200\t30\t0\t1\t200\t5000\t4801\t1e-10\t300",
+        "query\tchr2\t99.000\t500\t5\t0\t1\t500\t1\t500\t0.0\t900",
+    ]
+)
+
+
+@pytest.fixture()
+def mock_blast_filter_data():
+
+    mock_blast_ring_tmpdir = create_mock_session_directory(str(uuid.uuid4()))
+    session_id = mock_blast_ring_tmpdir.name
+
+    # Unique contents so that cache entries are not shared between tests
+    reference_file = create_mock_session_file(session_id=session_id)
+    reference_file.write_text(f">chr1 {uuid.uuid4()}\nACGT\n")
+    genome_file = create_mock_session_file(session_id=session_id)
+    genome_file.write_text(f">query {uuid.uuid4()}\nACGT\n")
+
+    mock_blast_filter_schema = BlastRingFilterSchema(
+        reference=RingReference(
+            session_id=session_id,
+            reference_id=reference_file.name,
+            sequence=RingReferenceSequence(id="chr1", length=10000),
+        ),
+        genome_id=genome_file.name,
+        min_identity=90,
+    )
+
+    yield mock_blast_filter_schema, reference_file, genome_file
+
+    # Cleanup after tests deleting temporary session directory tree
+    shutil.rmtree(mock_blast_ring_tmpdir)
+
+
+def cache_blast_hits(reference_file: Path, genome_file: Path, tmp_path: Path):
+    output_file = tmp_path / "results.tsv"
+    output_file.write_text(BLAST_HITS)
+    hits = read_blastn_output(file_path=output_file, columns=BLASTN_SEGMENT_COLUMNS)
+
+    with get_blast_hits_cache().keyed_entry(
+        key=get_blast_hits_key(
+            reference_fasta=reference_file, query_fasta=genome_file, sequence_id="chr1"
+        ),
+        build=lambda entry_directory: save_blastn_hits(
+            hits=hits, file_path=entry_directory / "hits.npz"
+        ),
+    ):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_filter_blast_ring_not_cached(mock_blast_filter_data):
+    mock_blast_filter_schema, _, _ = mock_blast_filter_data
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post(
+            "/rings/blast/filter", json=mock_blast_filter_schema.model_dump()
+        )
+        assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+@patch("brick.api.endpoints.rings.store_zoom_pyramid")
+@patch("brick.api.endpoints.rings.update_rings_or_create_session")
+async def test_filter_blast_ring_new_ring(
+    mock_update_rings, mock_store_zoom_pyramid, mock_blast_filter_data, tmp_path
+):
+    mock_blast_filter_schema, reference_file, genome_file = mock_blast_filter_data
+    cache_blast_hits(reference_file, genome_file, tmp_path)
+    mock_update_rings.side_effect = lambda session_id, ring: ring
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post(
+            "/rings/blast/filter", json=mock_blast_filter_schema.model_dump()
+        )
+        assert response.status_code == 200
+
+        ring = response.json()
+        assert ring["type"] == "blast"
+        assert [(s["start"], s["end"], s["text"]) for s in ring["data"]] == [
+            (1, 1000, "100.00% nucleotide identity"),
+            (2000, 2799, "99.50% nucleotide identity"),
+        ]
+        mock_update_rings.assert_called_once()
+        mock_store_zoom_pyramid.assert_called_once()
+
+        # thresholds without alignments do not modify the session
+        response = await ac.post(
+            "/rings/blast/filter",
+            json={**mock_blast_filter_schema.model_dump(), "min_alignment": 5000},
+        )
+        assert response.status_code == 400
+        mock_update_rings.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("brick.api.endpoints.rings.store_zoom_pyramid")
+@patch("brick.api.endpoints.rings.replace_ring_data")
+async def test_filter_blast_ring_update_ring(
+    mock_replace_ring_data, mock_store_zoom_pyramid, mock_blast_filter_data, tmp_path
+):
+    mock_blast_filter_schema, reference_file, genome_file = mock_blast_filter_data
+    cache_blast_hits(reference_file, genome_file, tmp_path)
+    mock_replace_ring_data.side_effect = lambda session_id, ring: ring
+
+    ring_id = str(uuid.uuid4())
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post(
+            "/rings/blast/filter",
+            json={
+                **mock_blast_filter_schema.model_dump(),
+                "ring_id": ring_id,
+                "min_identity": 80,
+            },
+        )
+        assert response.status_code == 200
+        assert response.json()["id"] == ring_id
+        assert len(response.json()["data"]) == 3
+
+        mock_replace_ring_data.side_effect = lambda session_id, ring: None
+        response = await ac.post(
+            "/rings/blast/filter",
+            json={**mock_blast_filter_schema.model_dump(), "ring_id": ring_id},
+        )
+        assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+@patch("brick.api.endpoints.rings.store_zoom_pyramid")
+@patch("brick.api.endpoints.rings.update_rings_or_create_session")
+async def test_filter_blast_ring_database_error(
+    mock_update_rings, mock_store_zoom_pyramid, mock_blast_filter_data, tmp_path
+):
+    mock_blast_filter_schema, reference_file, genome_file = mock_blast_filter_data
+    cache_blast_hits(reference_file, genome_file, tmp_path)
+    mock_update_rings.side_effect = Exception("Database error")
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post(
+            "/rings/blast/filter", json=mock_blast_filter_schema.model_dump()
+        )
+        assert response.status_code == 500
+        assert "Database error" in response.json()["detail"]
+        mock_store_zoom_pyramid.assert_not_called()
+
+
+@pytest.fixture()
+def mock_blast_batch_data():
+
+    mock_blast_ring_tmpdir = create_mock_session_directory(str(uuid.uuid4()))
+    session_id = mock_blast_ring_tmpdir.name
+
+    mock_blast_batch_schema = BlastRingBatchSchema(
+        reference=RingReference(
+            session_id=session_id,
+            reference_id=create_mock_session_file(session_id=session_id).name,
+        ),
+        genome_ids=[
+            create_mock_session_file(session_id=session_id).name for _ in range(3)
+        ],
+    )
+
+    yield mock_blast_batch_schema
+
+    # Cleanup after tests deleting temporary session directory tree
+    shutil.rmtree(mock_blast_ring_tmpdir)
+
+
+@pytest.mark.asyncio
+@patch("brick.api.endpoints.rings.process_blast_ring_batch")
+@patch("brick.api.endpoints.rings.process_blast_hits")
+@patch("brick.api.endpoints.rings.chord")
+async def test_create_blast_ring_batch_success(
+    mock_chord,
+    mock_process_blast_hits,
+    mock_process_blast_ring_batch,
+    mock_blast_batch_data,
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, "BLAST_BATCH_GENOMES_PER_TASK", 2)
+    mock_task = MagicMock(id="some_task_id")
+    mock_task.parent.id = "some_group_id"
+    mock_chord.return_value.return_value = mock_task
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post(
+            "/rings/blast/batch", json=mock_blast_batch_data.model_dump()
+        )
+        assert response.status_code == 202
+        assert response.json() == {
+            "task_id": "some_task_id",
+            "group_id": "some_group_id",
+        }
+
+    # One multiplexed BLAST run for each chunk of genomes in genome order
+    header = list(mock_chord.call_args.args[0])
+    assert len(header) == 2
+    chunks = [call.args[2] for call in mock_process_blast_hits.s.call_args_list]
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert [
+        schema["genome_id"] for chunk in chunks for schema in chunk
+    ] == mock_blast_batch_data.genome_ids
+    mock_process_blast_ring_batch.s.assert_called_once_with(
+        mock_blast_batch_data.model_dump(), 2
+    )
+    mock_task.parent.save.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_create_blast_ring_batch_missing_genome(mock_blast_batch_data):
+    batch = mock_blast_batch_data.model_dump()
+    batch["genome_ids"].append(str(uuid.uuid4()))
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/rings/blast/batch", json=batch)
+        assert response.status_code == 422
+
+        response = await ac.post("/rings/blast/batch", json={**batch, "genome_ids": []})
+        assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+@patch("brick.api.endpoints.rings.chord")
+async def test_create_blast_ring_batch_failure(mock_chord, mock_blast_batch_data):
+    mock_chord.side_effect = Exception("Some error")
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post(
+            "/rings/blast/batch", json=mock_blast_batch_data.model_dump()
+        )
+        assert response.status_code == 500
@@ -1,9 +1,11 @@
 import pytest
 
 from httpx import AsyncClient
-from brick.api.main import app
+from brick.api.main import app, init_api, settings
 from brick.api.schemas import Session
-from unittest.mock import AsyncMock, patch
+from brick.rings import RingReference, RingReferenceSequence
+from unittest.mock import AsyncMock, MagicMock, patch
+from pymongo.errors import DuplicateKeyError
 
 
 # Mock session data
@@ -48,3 +50,356 @@ async def test_get_session_failure(
         response = await ac.get("/sessions/none_existent_uuid")
         assert response.status_code == 404
         assert response.json()["detail"] == "Session not found"
+
+
+# Mock ring data for windowed segment queries
+mock_ring_data = {
+    "id": "ring_uuid",
+    "reference": RingReference(
+        session_id="some_uuid",
+        reference_id="file_uuid",
+        sequence=RingReferenceSequence(id="chr1", length=1000),
+    ).model_dump(),
+    "data": [
+        {"kind": "segment", "start": start, "end": start + 10, "text": str(start)}
+        for start in range(0, 1000, 100)
+    ],
+}
+
+
+@patch("brick.api.endpoints.sessions.get_session_collection_motor")
+@pytest.mark.asyncio
+async def test_get_ring_segments(
+    mock_get_session_collection_motor, mock_motor_collection
+):
+    mock_get_session_collection_motor.return_value = mock_motor_collection
+    mock_motor_collection.find_one.return_value = {"rings": [mock_ring_data]}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(
+            "/sessions/some_uuid/rings/ring_uuid/segments",
+            params={"start": 105, "end": 400, "offset": 1, "limit": 2},
+        )
+        assert response.status_code == 200
+        page = response.json()
+        assert page["total"] == 3
+        assert [segment["start"] for segment in page["ring"]["data"]] == [200, 300]
+
+        response = await ac.get(
+            "/sessions/some_uuid/segments",
+            params={
+                "reference_id": "file_uuid",
+                "sequence_id": "chr1",
+                "start": 0,
+                "end": 50,
+            },
+        )
+        assert response.status_code == 200
+        assert [page["total"] for page in response.json()] == [1]
+
+
+@patch("brick.api.endpoints.sessions.load_ring_segments_motor")
+@patch("brick.api.endpoints.sessions.get_session_collection_motor")
+@pytest.mark.asyncio
+async def test_get_ring_segments_window_chunks(
+    mock_get_session_collection_motor,
+    mock_load_ring_segments_motor,
+    mock_motor_collection,
+):
+    mock_get_session_collection_motor.return_value = mock_motor_collection
+    mock_motor_collection.find_one.return_value = {
+        "rings": [{**mock_ring_data, "data": [], "generation": "gen"}]
+    }
+    # Segments of the chunks overlapping the window
+    mock_load_ring_segments_motor.return_value = {
+        "ring_uuid": mock_ring_data["data"][1:5]
+    }
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(
+            "/sessions/some_uuid/rings/ring_uuid/segments",
+            params={"start": 105, "end": 400, "offset": 1, "limit": 2},
+        )
+        assert response.status_code == 200
+        page = response.json()
+        assert page["total"] == 3
+        assert [segment["start"] for segment in page["ring"]["data"]] == [200, 300]
+
+    # Only the chunks overlapping the window are read from the segment store
+    mock_load_ring_segments_motor.assert_called_once_with(
+        session_id="some_uuid", generations={"ring_uuid": "gen"}, start=105, end=400
+    )
+
+
+@patch("brick.api.endpoints.sessions.get_session_collection_motor")
+@pytest.mark.asyncio
+async def test_get_ring_segments_failure(
+    mock_get_session_collection_motor, mock_motor_collection
+):
+    mock_get_session_collection_motor.return_value = mock_motor_collection
+    mock_motor_collection.find_one.return_value = None
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(
+            "/sessions/some_uuid/rings/ring_uuid/segments",
+            params={"start": 0, "end": 100},
+        )
+        assert response.status_code == 404
+
+        response = await ac.get(
+            "/sessions/some_uuid/rings/ring_uuid/segments",
+            params={"start": 100, "end": 100},
+        )
+        assert response.status_code == 400
+
+
+@patch("brick.api.endpoints.sessions.get_session_collection_motor")
+@pytest.mark.asyncio
+async def test_get_ring_zoom_level(
+    mock_get_session_collection_motor, mock_motor_collection
+):
+    mock_get_session_collection_motor.return_value = mock_motor_collection
+    mock_motor_collection.find_one.return_value = {"rings": [mock_ring_data]}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(
+            "/sessions/some_uuid/rings/ring_uuid/zoom", params={"pixels": 4}
+        )
+        assert response.status_code == 200
+        level = response.json()
+        assert level["bin_size"] == 64
+        assert level["length"] == 1000
+        assert sum(level["count"]) >= len(mock_ring_data["data"])
+        assert level["score"] == [None] * len(level["count"])
+
+
+@patch("brick.api.endpoints.sessions.load_ring_segments_motor")
+@patch("brick.api.endpoints.sessions.get_session_collection_motor")
+@pytest.mark.asyncio
+async def test_get_session_segments(
+    mock_get_session_collection_motor,
+    mock_load_ring_segments_motor,
+    mock_motor_collection,
+):
+    mock_get_session_collection_motor.return_value = mock_motor_collection
+    mock_motor_collection.find_one.return_value = {
+        **mock_session_data.model_dump(),
+        "rings": [{**mock_ring_data, "data": []}],
+    }
+    mock_load_ring_segments_motor.return_value = {"ring_uuid": mock_ring_data["data"]}
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        # Sessions are read without the segments of their rings by default
+        response = await ac.get("/sessions/some_uuid")
+        assert response.status_code == 200
+        assert response.json()["rings"][0]["data"] == []
+        assert mock_motor_collection.find_one.call_args.args[1]["rings.data"] == 0
+        mock_load_ring_segments_motor.assert_not_called()
+
+        response = await ac.get("/sessions/some_uuid", params={"segments": True})
+        assert response.status_code == 200
+        assert len(response.json()["rings"][0]["data"]) == len(mock_ring_data["data"])
+        mock_load_ring_segments_motor.assert_called_once_with(
+            session_id="some_uuid",
+            generations={"ring_uuid": None},
+            start=None,
+            end=None,
+        )
+
+
+@patch("brick.api.core.db.get_segment_collection_motor")
+@patch("brick.api.endpoints.sessions.get_segment_collection_motor")
+@patch("brick.api.endpoints.sessions.get_session_collection_motor")
+@pytest.mark.asyncio
+async def test_update_label_segment_chunk(
+    mock_get_session_collection_motor,
+    mock_get_segment_collection_motor,
+    mock_get_db_segment_collection_motor,
+    mock_motor_collection,
+):
+    mock_get_session_collection_motor.return_value = mock_motor_collection
+    mock_motor_collection.find_one.return_value = {
+        "rings": [{"id": "blast_uuid"}, {"id": "ring_uuid", "generation": "gen"}]
+    }
+    segment_collection = AsyncMock()
+    segment_collection.find_one.return_value = {
+        "_id": "chunk_id",
+        "chunk": 2,
+        "data": [{"labelIdentifier": "other"}, {"labelIdentifier": "label_uuid"}],
+    }
+    # Earlier chunks of the ring are full (100) and partly filled (30)
+    segment_collection.aggregate = MagicMock()
+    segment_collection.aggregate.return_value.to_list = AsyncMock(
+        return_value=[{"_id": None, "count": 130}]
+    )
+    mock_get_segment_collection_motor.return_value = segment_collection
+    mock_get_db_segment_collection_motor.return_value = segment_collection
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.put(
+            "/sessions/some_uuid/label",
+            json={"ring_id": "ring_uuid", "label_id": "label_uuid", "text": "label"},
+        )
+        assert response.status_code == 200
+        assert response.json()["ring_index"] == 1
+        assert response.json()["label_index"] == 131
+
+    # Chunk is read from the current generation of the ring
+    assert segment_collection.find_one.call_args.args[0]["generation"] == "gen"
+
+    # Label index counts the segments of the chunks before the chunk of the label
+    (pipeline,) = segment_collection.aggregate.call_args.args
+    assert pipeline[0]["$match"] == {
+        "session_id": "some_uuid",
+        "ring_id": "ring_uuid",
+        "generation": "gen",
+        "chunk": {"$lt": 2},
+    }
+
+    # Only the label in its segment chunk is updated
+    assert segment_collection.update_one.call_args.args == (
+        {"_id": "chunk_id", "data.labelIdentifier": "label_uuid"},
+        {"$set": {"data.$.text": "label"}},
+    )
+
+
+def get_stage_indices(stage: dict) -> dict:
+    """Ring indices set by a ring index pipeline stage"""
+    ring_map = stage["$set"]["rings"]["$map"]["in"]["$let"]
+    ring_ids = ring_map["vars"]["position"]["$indexOfArray"][0]["$literal"]
+    ring_indices = ring_map["in"]["$cond"][2]["$mergeObjects"][1]["index"]
+    return dict(zip(ring_ids, ring_indices["$arrayElemAt"][0]))
+
+
+mock_ring_indices = {
+    "rings": [
+        {"id": "blast_1", "index": 0, "type": "blast"},
+        {"id": "blast_2", "index": 1, "type": "blast"},
+        {"id": "other", "index": 0, "type": "blast"},
+        {"id": "label", "index": 2, "type": "label"},
+    ]
+}
+
+
+@patch("brick.api.endpoints.sessions.get_session_collection_motor")
+@pytest.mark.asyncio
+async def test_update_session_ring_index(
+    mock_get_session_collection_motor, mock_motor_collection
+):
+    mock_get_session_collection_motor.return_value = mock_motor_collection
+    mock_motor_collection.find_one.return_value = mock_ring_indices
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.put(
+            "/sessions/some_uuid/ring",
+            json={
+                "id": "blast_2",
+                "index": 0,
+                "visible": None,
+                "color": None,
+                "height": None,
+                "title": None,
+                "index_group": ["blast_1", "blast_2", "label"],
+            },
+        )
+        assert response.status_code == 200
+
+    # Indices are read without ring data and set in a single update
+    assert set(mock_motor_collection.find_one.call_args.args[1]) == {
+        "_id",
+        "rings.id",
+        "rings.index",
+        "rings.type",
+        "rings.generation",
+    }
+    mock_motor_collection.update_one.assert_called_once()
+    (stage,) = mock_motor_collection.update_one.call_args.args[1]
+    assert get_stage_indices(stage) == {"blast_2": 0, "blast_1": 1, "label": 2}
+
+
+@patch("brick.api.endpoints.sessions.delete_ring_segments_motor")
+@patch("brick.api.endpoints.sessions.get_session_collection_motor")
+@pytest.mark.asyncio
+async def test_delete_session_ring_reindex(
+    mock_get_session_collection_motor,
+    mock_delete_ring_segments_motor,
+    mock_motor_collection,
+):
+    mock_get_session_collection_motor.return_value = mock_motor_collection
+    mock_motor_collection.find_one.return_value = mock_ring_indices
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.request(
+            "DELETE",
+            "/sessions/some_uuid/ring",
+            json={
+                "id": "blast_1",
+                "index": None,
+                "visible": None,
+                "color": None,
+                "height": None,
+                "title": None,
+                "index_group": ["blast_1", "blast_2", "label"],
+            },
+        )
+        assert response.status_code == 200
+
+    # Ring is removed and the group is reindexed in a single update
+    mock_motor_collection.update_one.assert_called_once()
+    removal, reindex = mock_motor_collection.update_one.call_args.args[1]
+    assert removal["$set"]["rings"]["$filter"]["cond"] == {
+        "$ne": ["$$ring.id", "blast_1"]
+    }
+    assert get_stage_indices(reindex) == {"blast_2": 0, "label": 1}
+    mock_delete_ring_segments_motor.assert_called_once_with(
+        session_id="some_uuid", ring_ids=["blast_1"]
+    )
+
+
+@patch("brick.api.endpoints.sessions.get_session_collection_motor")
+@pytest.mark.asyncio
+async def test_create_session_concurrent(
+    mock_get_session_collection_motor, mock_motor_collection
+):
+    mock_get_session_collection_motor.return_value = mock_motor_collection
+    mock_motor_collection.find_one.return_value = None
+    mock_motor_collection.insert_one.side_effect = DuplicateKeyError("id")
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/sessions/some_uuid")
+        assert response.status_code == 409
+
+
+@patch("brick.api.endpoints.admin.get_index_stats_motor")
+@pytest.mark.asyncio
+async def test_get_index_usage(mock_get_index_stats_motor, monkeypatch):
+    # Admin endpoints are only served if enabled
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/admin/indexes")
+        assert response.status_code == 404
+
+    monkeypatch.setattr(settings, "ADMIN_ENDPOINTS", True)
+    admin_app = init_api()
+
+    mock_get_index_stats_motor.return_value = [
+        {
+            "collection": "sessions",
+            "name": "id",
+            "key": {"id": 1},
+            "host": "mongodb:27017",
+            "accesses": {"ops": 42, "since": "2024-01-01T00:00:00"},
+        }
+    ]
+
+    async with AsyncClient(app=admin_app, base_url="http://test") as ac:
+        response = await ac.get("/admin/indexes")
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "collection": "sessions",
+                "name": "id",
+                "key": {"id": 1},
+                "ops": 42,
+                "since": "2024-01-01T00:00:00",
+            }
+        ]
@@ -2,7 +2,8 @@ from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 from brick.api.main import app
 from brick.api.schemas import TaskStatus, FileType, FileFormat, Selections
-from brick.api.schemas import SessionFile
+from brick.api.schemas import SessionFile, BlastRingBatch, TaskResultType
+from brick.rings import BlastRing
 
 client = TestClient(app)
 
@@ -79,3 +80,66 @@ def test_get_task_result_failure(mock_async_result):
     response = client.get("/tasks/result/test_task_id")
     assert response.status_code == 500
     assert response.json()["detail"] == error_message
+
+
+@patch("brick.api.endpoints.tasks.AsyncResult")
+def test_get_task_result_blast_ring_batch(mock_async_result):
+    batch = BlastRingBatch(
+        rings=[BlastRing(id="ring_1"), BlastRing(id="ring_2")], errors=["genome: error"]
+    )
+    mock_result = MagicMock()
+    mock_result.ready.return_value = True
+    mock_result.get.return_value = {"success": True, "result": batch.model_dump()}
+    mock_async_result.return_value = mock_result
+
+    response = client.get("/tasks/result/test_task_id")
+    assert response.status_code == 200
+    assert response.json()["result_type"] == TaskResultType.BLAST_RING_BATCH.value
+    assert [ring["id"] for ring in response.json()["result"]["rings"]] == [
+        "ring_1",
+        "ring_2",
+    ]
+
+
+@patch("brick.api.endpoints.tasks.AsyncResult")
+def test_get_task_progress(mock_async_result):
+    mock_result = create_mock_async_result(TaskStatus.PROGRESS, False, True, "")
+    mock_result.info = {"hits": 20000}
+    mock_async_result.return_value = mock_result
+
+    response = client.get("/tasks/progress/test_task_id")
+    assert response.status_code == 200
+    assert response.json() == {
+        "task_id": "test_task_id",
+        "status": TaskStatus.PROGRESS.value,
+        "progress": {"hits": 20000},
+    }
+
+    mock_result.status = TaskStatus.PENDING.value
+    response = client.get("/tasks/progress/test_task_id")
+    assert response.json()["progress"] is None
+
+
+@patch("brick.api.endpoints.tasks.GroupResult")
+def test_get_task_group_status(mock_group_result):
+    results = [MagicMock(), MagicMock(), MagicMock()]
+    for result, ready in zip(results, [True, True, False]):
+        result.ready.return_value = ready
+    mock_group_result.restore.return_value = MagicMock(results=results)
+
+    response = client.get("/tasks/group/test_group_id")
+    assert response.status_code == 200
+    assert response.json() == {
+        "group_id": "test_group_id",
+        "status": TaskStatus.PROCESSING.value,
+        "total": 3,
+        "completed": 2,
+    }
+
+    results[2].ready.return_value = True
+    response = client.get("/tasks/group/test_group_id")
+    assert response.json()["status"] == TaskStatus.SUCCESS.value
+
+    mock_group_result.restore.return_value = None
+    response = client.get("/tasks/group/test_group_id")
+    assert response.status_code == 404
@@ -0,0 +1,767 @@
+import uuid
+import pandas
+import shutil
+import pytest
+
+from pathlib import Path
+from subprocess import Popen
+from unittest.mock import MagicMock, patch
+from pymongo.errors import DuplicateKeyError
+
+from brick.api.main import settings
+from brick.api.cache import get_blast_hits_cache, get_blast_hits_key
+from brick.api.cache import get_sequence_hash
+from brick.api.schemas import BlastRingBatch, BlastRingBatchSchema, BlastRingSchema
+from brick.api.schemas import GenomadRingSchema
+from brick.api.tasks import (
+    cache_blast_hits,
+    get_blast_chunks_directory,
+    get_genomad_version,
+    get_ring_insertion,
+    insert_rings_or_create_session,
+    plan_blast_query_chunks,
+    plan_genomad_shards,
+    process_blast_query_chunk,
+    process_blast_ring_chunks,
+    process_genomad_ring,
+    process_genomad_ring_shards,
+    process_genomad_shard,
+    process_blast_ring_batch,
+    replace_ring_data,
+    stream_blast,
+    update_rings_or_create_session,
+)
+from brick.rings import (
+    BLASTN_SEGMENT_COLUMNS,
+    BlastRing,
+    LabelRing,
+    RingReference,
+    RingReferenceSequence,
+    RingType,
+    load_blastn_hits,
+    read_blastn_output,
+    save_blastn_hits,
+)
+from brick.utils import scan_fasta_records, write_fasta_index
+
+
+@pytest.fixture
+def blast_files(tmp_path: Path):
+    reference_fasta = tmp_path / "reference.fasta"
+    reference_fasta.write_text(">chr1\nACGTACGT\n>plasmid_1\nGGCC\n")
+    query_fasta = tmp_path / "query.fasta"
+    query_fasta.write_text(">query_1\nACGT\n")
+    working_directory = tmp_path / "work"
+    working_directory.mkdir()
+    return reference_fasta, query_fasta, working_directory
+
+
+def mock_blast_commands(commands: list):
+    """Records the BLAST database commands and creates their output files"""
+
+    def run(command, check):
+        commands.append(command)
+        Path(f"{command[command.index('-out') + 1]}.nsq").touch()
+
+    return run
+
+
+def mock_blast_process(commands: list, hits_per_query: int = 1):
+    """
+    Records the streamed BLAST commands and returns a process writing
+    hits for each query sequence to its stdout
+    """
+
+    def popen(command, stdout):
+        commands.append(command)
+        query_fasta = Path(command[command.index("-query") + 1])
+        output_file = query_fasta.with_suffix(".tsv")
+        output_file.write_text(
+            "".join(
+                f"{line[1:].strip()}\tchr1\t99.0\t100\t0\t0\t1\t100\t{i}\t100\t0\t1\n"
+                for line in query_fasta.open()
+                if line.startswith(">")
+                for i in range(1, hits_per_query + 1)
+            )
+        )
+        return Popen(["cat", str(output_file)], stdout=stdout)
+
+    return popen
+
+
+@patch("brick.api.tasks.subprocess.Popen")
+@patch("brick.api.tasks.subprocess.run")
+def test_stream_blast_against_subject_sequence(mock_run, mock_popen, blast_files):
+    reference_fasta, query_fasta, working_directory = blast_files
+    mock_run.side_effect = mock_blast_commands(commands := [])
+    mock_popen.side_effect = mock_blast_process(commands)
+
+    stream_blast(
+        query_fasta=query_fasta,
+        reference_fasta=reference_fasta,
+        working_directory=working_directory,
+        sequence_id="plasmid_1",
+    )
+
+    assert [command[0] for command in commands] == ["blastn"]
+    subject_fasta = Path(commands[0][commands[0].index("-subject") + 1])
+    assert subject_fasta.read_text() == ">plasmid_1\nGGCC\n"
+
+
+@patch("brick.api.tasks.subprocess.Popen")
+@patch("brick.api.tasks.subprocess.run")
+def test_stream_blast_against_sequence_database(
+    mock_run, mock_popen, blast_files, monkeypatch
+):
+    reference_fasta, query_fasta, working_directory = blast_files
+    mock_run.side_effect = mock_blast_commands(commands := [])
+    mock_popen.side_effect = mock_blast_process(commands)
+    monkeypatch.setattr(settings, "BLAST_SUBJECT_MAX_LENGTH", 4)
+    monkeypatch.setattr(settings, "WORK_DIRECTORY", working_directory)
+
+    stream_blast(
+        query_fasta=query_fasta,
+        reference_fasta=reference_fasta,
+        working_directory=working_directory,
+        sequence_id="chr1",
+    )
+
+    assert [command[0] for command in commands] == ["makeblastdb", "blastn"]
+    subject_fasta = Path(commands[0][commands[0].index("-in") + 1])
+    assert subject_fasta == working_directory / "subject.fasta"
+    assert "-db" in commands[1]
+
+    with pytest.raises(ValueError, match="Sequences not found in FASTA file"):
+        stream_blast(
+            query_fasta=query_fasta,
+            reference_fasta=reference_fasta,
+            working_directory=working_directory,
+            sequence_id="chr2",
+        )
+
+
+@patch("brick.api.tasks.subprocess.Popen")
+@patch("brick.api.tasks.subprocess.run")
+def test_cache_blast_hits_multiplexed(mock_run, mock_popen, blast_files, monkeypatch):
+    reference_fasta, query_fasta, working_directory = blast_files
+    monkeypatch.setattr(settings, "WORK_DIRECTORY", working_directory)
+
+    query_fastas = [query_fasta]
+    for i in range(2):
+        query_fastas.append(working_directory.parent / f"query{i}.fasta")
+        query_fastas[-1].write_text(f">query_1\n{'ACGT' * (i + 2)}\n")
+
+    mock_run.side_effect = mock_blast_commands(commands := [])
+    mock_popen.side_effect = mock_blast_process(commands)
+    assert cache_blast_hits(reference_fasta, query_fastas[:2], "chr1") == [1, 1]
+
+    # Single multi-threaded BLAST of both genomes
+    assert [command[0] for command in commands] == ["makeblastdb", "blastn"]
+    assert "-num_threads" in commands[1]
+
+    # BLAST of the genome without cached hits
+    commands.clear()
+    assert cache_blast_hits(reference_fasta, query_fastas, "chr1") == [1, 1, 1]
+    assert [command[0] for command in commands] == ["blastn"]
+
+    for query_fasta in query_fastas:
+        with get_blast_hits_cache().lookup(
+            key=get_blast_hits_key(reference_fasta, query_fasta, sequence_id="chr1")
+        ) as entry_directory:
+            hits = load_blastn_hits(entry_directory / "hits.npz")
+        assert list(hits.columns) == BLASTN_SEGMENT_COLUMNS
+        assert hits.subject_id.tolist() == ["chr1"]
+
+    commands.clear()
+    assert cache_blast_hits(reference_fasta, query_fastas, "chr1") == [1, 1, 1]
+    assert not commands
+
+
+@patch("brick.api.tasks.subprocess.Popen")
+def test_stream_blast_progress(mock_popen, blast_files, monkeypatch):
+    reference_fasta, query_fasta, working_directory = blast_files
+    mock_popen.side_effect = mock_blast_process(commands := [], hits_per_query=25)
+    monkeypatch.setattr(settings, "BLAST_STREAM_CHUNK_SIZE", 10)
+
+    progress = []
+    hits = stream_blast(
+        query_fasta=query_fasta,
+        reference_fasta=reference_fasta,
+        working_directory=working_directory,
+        sequence_id="chr1",
+        progress=progress.append,
+    )
+
+    # Hits are parsed from the stdout of blastn as they are written
+    assert "-out" not in commands[0]
+    assert progress == [10, 20, 25]
+    pandas.testing.assert_frame_equal(
+        hits, read_blastn_output(query_fasta.with_suffix(".tsv"))
+    )
+
+    mock_popen.side_effect = lambda command, stdout: Popen(["false"], stdout=stdout)
+    with pytest.raises(ValueError, match="Failed to run `blastn` command on worker"):
+        stream_blast(
+            query_fasta=query_fasta,
+            reference_fasta=reference_fasta,
+            working_directory=working_directory,
+            sequence_id="chr1",
+        )
+
+
+@patch("brick.api.tasks.store_zoom_pyramid")
+@patch("brick.api.tasks.update_rings_or_create_session")
+@patch("brick.api.tasks.subprocess.Popen")
+def test_process_blast_query_chunks(
+    mock_popen, mock_update_rings, mock_store_zoom_pyramid, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "WORK_DIRECTORY", tmp_path)
+    monkeypatch.setattr(settings, "BLAST_QUERY_CHUNK_MIN_LENGTH", 10)
+    monkeypatch.setattr(settings, "BLAST_QUERY_CHUNK_SIZE", 64)
+    monkeypatch.setattr(settings, "BLAST_QUERY_CHUNK_OVERLAP", 20)
+    mock_popen.side_effect = mock_blast_process(commands := [])
+    mock_update_rings.side_effect = lambda session_id, ring: ring
+
+    session_directory = tmp_path / str(uuid.uuid4())
+    session_directory.mkdir()
+    reference_fasta = session_directory / str(uuid.uuid4())
+    reference_fasta.write_text(">chr1\nACGTACGT\n")
+    query_fasta = session_directory / str(uuid.uuid4())
+    query_fasta.write_text(">query_1\n" + "ACGT" * 25 + "\n>query_2\nACGT\n")
+
+    # Genomes are only sliced with an index of their sequences
+    assert not plan_blast_query_chunks(reference_fasta, query_fasta, "chr1")
+    write_fasta_index(query_fasta, list(scan_fasta_records(query_fasta)))
+
+    query_chunks = plan_blast_query_chunks(reference_fasta, query_fasta, "chr1")
+    assert query_chunks == [
+        [("query_1", 0, 64)],
+        [("query_1", 44, 100), ("query_2", 0, 4)],
+    ]
+
+    ring_schema = BlastRingSchema(
+        reference=RingReference(
+            session_id=session_directory.name,
+            reference_id=reference_fasta.name,
+            sequence=RingReferenceSequence(id="chr1", length=1000),
+        ),
+        genome_id=query_fasta.name,
+    ).model_dump()
+
+    chunks_directory = get_blast_chunks_directory(str(uuid.uuid4()))
+    results = [
+        process_blast_query_chunk(
+            str(reference_fasta),
+            str(query_fasta),
+            ring_schema,
+            query_slices,
+            str(chunks_directory / f"{i}.npz"),
+        )
+        for i, query_slices in enumerate(query_chunks)
+    ]
+    assert [result["result"]["hits"] for result in results] == [1, 2]
+
+    result = process_blast_ring_chunks(
+        results,
+        str(reference_fasta),
+        str(query_fasta),
+        ring_schema,
+        str(chunks_directory),
+    )
+
+    assert result["success"]
+    assert len(result["result"]["data"]) == 3
+    assert mock_store_zoom_pyramid.call_count == 1
+    assert not chunks_directory.exists()
+
+    # Merged hits of the slices are cached as the hits of the genome
+    assert not plan_blast_query_chunks(reference_fasta, query_fasta, "chr1")
+    with get_blast_hits_cache().lookup(
+        key=get_blast_hits_key(reference_fasta, query_fasta, sequence_id="chr1")
+    ) as entry_directory:
+        hits = load_blastn_hits(entry_directory / "hits.npz")
+    assert list(hits.columns) == BLASTN_SEGMENT_COLUMNS
+
+
+def mock_genomad_commands(commands: list, version: str = "geNomad, version 1.7.4"):
+    """Records the geNomad commands and creates the aggregated classification"""
+
+    def run(command, check, **kwargs):
+        commands.append(command)
+        if "--version" in command:
+            return MagicMock(stdout=f"{version}\n")
+
+        sliced_fasta, output_directory = Path(command[-3]), Path(command[-2])
+        aggregated_output = (
+            output_directory
+            / "sliced_aggregated_classification"
+            / "sliced_aggregated_classification.tsv"
+        )
+        aggregated_output.parent.mkdir(parents=True)
+        aggregated_output.write_text(
+            "seq_name\tchromosome_score\tplasmid_score\tvirus_score\n"
+            + "".join(
+                f"{line[1:].split()[0]}\t0.1\t{0.6 + i * 0.2:.1f}\t0.0\n"
+                for i, line in enumerate(
+                    line for line in sliced_fasta.open() if line.startswith(">")
+                )
+            )
+        )
+
+    return run
+
+
+@patch("brick.api.tasks.store_zoom_pyramid")
+@patch("brick.api.tasks.update_rings_or_create_session")
+@patch("brick.api.tasks.subprocess.run")
+def test_process_genomad_ring_cached(
+    mock_run, mock_update_rings, mock_store_zoom_pyramid, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "WORK_DIRECTORY", tmp_path)
+    mock_run.side_effect = mock_genomad_commands(commands := [])
+    mock_update_rings.side_effect = lambda session_id, ring: ring
+    get_genomad_version.cache_clear()
+
+    sequence = "ACGT" * 1250
+    reference_files = []
+    for seq_id in ["chr1", "contig_1"]:
+        session_directory = tmp_path / str(uuid.uuid4())
+        session_directory.mkdir()
+        reference_files.append(session_directory / str(uuid.uuid4()))
+        reference_files[-1].write_text(f">{seq_id}\n{sequence}\n>chr2\nACGT\n")
+
+    def process(reference_file: Path, seq_id: str, min_window_score: float):
+        ring_schema = GenomadRingSchema(
+            reference=RingReference(
+                session_id=reference_file.parent.name,
+                reference_id=reference_file.name,
+                sequence=RingReferenceSequence(id=seq_id, length=len(sequence)),
+            ),
+            ring_type=RingType.GENOMAD,
+            min_window_score=min_window_score,
+        )
+        result = process_genomad_ring(str(reference_file), ring_schema.model_dump())
+        assert result["success"]
+        return [segment["plasmid"] for segment in result["result"]["data"]]
+
+    assert process(reference_files[0], "chr1", 0.0) == [0.6, 0.8]
+    assert process(reference_files[0], "chr1", 0.7) == [0.0, 0.8]
+
+    # Same bases of a sequence with another identifier in another session
+    assert process(reference_files[1], "contig_1", 0.0) == [0.6, 0.8]
+
+    genomad_runs = [command for command in commands if "end-to-end" in command]
+    assert len(genomad_runs) == 1
+    assert "--relaxed" in genomad_runs[0]
+
+    # Outputs of another geNomad version are not reused
+    get_genomad_version.cache_clear()
+    mock_run.side_effect = mock_genomad_commands(commands, version="2.0.0")
+    assert process(reference_files[0], "chr1", 0.0) == [0.6, 0.8]
+    assert len([command for command in commands if "end-to-end" in command]) == 2
+
+
+def test_plan_genomad_shards(monkeypatch):
+    monkeypatch.setattr(settings, "GENOMAD_SHARD_MIN_LENGTH", 10_000)
+    monkeypatch.setattr(settings, "GENOMAD_SHARD_WORKERS", 4)
+
+    # Sequences within the minimum shard length are not sharded
+    assert plan_genomad_shards(sequence_length=10_000, window_size=2500) == []
+
+    # Shards of whole windows, the last window is shorter than the window size
+    assert plan_genomad_shards(sequence_length=24_000, window_size=2500) == [
+        (0, 10000),
+        (10000, 20000),
+        (20000, 24000),
+    ]
+    assert len(plan_genomad_shards(sequence_length=10**6, window_size=2500)) == 4
+
+
+@patch("brick.api.tasks.store_zoom_pyramid")
+@patch("brick.api.tasks.update_rings_or_create_session")
+@patch("brick.api.tasks.subprocess.run")
+def test_process_genomad_ring_shards(
+    mock_run, mock_update_rings, mock_store_zoom_pyramid, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "WORK_DIRECTORY", tmp_path)
+    monkeypatch.setattr(settings, "GENOMAD_SHARD_MIN_LENGTH", 5000)
+    mock_run.side_effect = mock_genomad_commands(commands := [])
+    mock_update_rings.side_effect = lambda session_id, ring: ring
+    get_genomad_version.cache_clear()
+
+    sequence = "ACGT" * 5000
+    session_directory = tmp_path / str(uuid.uuid4())
+    session_directory.mkdir()
+    reference_file = session_directory / str(uuid.uuid4())
+    reference_file.write_text(f">chr1\n{sequence}\n")
+
+    ring_schema = GenomadRingSchema(
+        reference=RingReference(
+            session_id=session_directory.name,
+            reference_id=reference_file.name,
+            sequence=RingReferenceSequence(id="chr1", length=len(sequence)),
+        ),
+        ring_type=RingType.GENOMAD,
+    ).model_dump()
+
+    sequence_hash = get_sequence_hash(fasta_file=reference_file, seq_id="chr1")
+
+    def process_shards() -> list:
+        shards = plan_genomad_shards(len(sequence), window_size=2500)
+        shards_directory = tmp_path / "chunks" / str(uuid.uuid4())
+        results = [
+            process_genomad_shard(
+                str(reference_file),
+                ring_schema,
+                region,
+                str(shards_directory / f"{i}.tsv"),
+                sequence_hash,
+            )
+            for i, region in enumerate(shards)
+        ]
+        result = process_genomad_ring_shards(
+            results,
+            str(reference_file),
+            ring_schema,
+            str(shards_directory),
+            sequence_hash,
+        )
+        assert result["success"]
+        assert not shards_directory.exists()
+        return result["result"]["data"]
+
+    data = process_shards()
+    genomad_runs = [command for command in commands if "end-to-end" in command]
+    assert len(genomad_runs) == 4
+
+    # Windows of all shards in the order of the sequence
+    assert [(segment["start"], segment["end"]) for segment in data] == [
+        (i, i + 2500) for i in range(0, len(sequence), 2500)
+    ]
+    assert [segment["plasmid"] for segment in data] == [0.6, 0.8] * 4
+
+    # Concatenated output is cached as the output of the whole sequence
+    process_shards()
+    result = process_genomad_ring(str(reference_file), ring_schema)
+    assert result["result"]["data"] == data
+    assert len([command for command in commands if "end-to-end" in command]) == 4
+
+
+@patch("brick.api.tasks.store_zoom_pyramid")
+@patch("brick.api.core.db.get_segment_collection_pymongo")
+@patch("brick.api.tasks.get_session_collection_pymongo")
+def test_process_blast_ring_batch(
+    mock_collection, mock_segment_collection, mock_store_zoom_pyramid, tmp_path
+):
+    session_directory = settings.WORK_DIRECTORY / str(uuid.uuid4())
+    session_directory.mkdir(parents=True)
+
+    try:
+        reference_file = session_directory / str(uuid.uuid4())
+        reference_file.write_text(f">chr1 {uuid.uuid4()}\nACGT\n")
+        genome_files = []
+        for i, hits in enumerate(
+            [
+                "q\tchr1\t99.50\t100\t0\t0\t1\t100\t1\t100\t0.0\t180",
+                "",  # genome without alignments
+                "q\tchr1\t90.00\t100\t0\t0\t1\t100\t500\t401\t0.0\t150",
+            ]
+        ):
+            genome_file = session_directory / str(uuid.uuid4())
+            genome_file.write_text(f">q {uuid.uuid4()}\nACGT\n")
+            genome_files.append(genome_file)
+
+            output_file = tmp_path / f"results{i}.tsv"
+            output_file.write_text(hits)
+            with get_blast_hits_cache().keyed_entry(
+                key=get_blast_hits_key(reference_file, genome_file, sequence_id="chr1"),
+                build=lambda entry_directory: save_blastn_hits(
+                    hits=read_blastn_output(
+                        output_file, columns=BLASTN_SEGMENT_COLUMNS
+                    ),
+                    file_path=entry_directory / "hits.npz",
+                ),
+            ):
+                pass
+
+        reference = RingReference(
+            session_id=session_directory.name,
+            reference_id=reference_file.name,
+            sequence=RingReferenceSequence(id="chr1", length=1000),
+        )
+        batch_schema = BlastRingBatchSchema(
+            reference=reference, genome_ids=[file.name for file in genome_files]
+        )
+        mock_collection.return_value.find_one_and_update.side_effect = (
+            mock_ring_insertion
+        )
+
+        result = process_blast_ring_batch(
+            [
+                {"success": True, "result": {}},
+                {"success": True, "result": {}},
+                {"success": False, "error": "Failed to run `blastn` command on worker"},
+            ],
+            batch_schema.model_dump(),
+        )
+
+        assert result["success"]
+        batch = BlastRingBatch(**result["result"])
+        assert [ring.data[0].start for ring in batch.rings] == [1]
+        assert batch.errors == [
+            f"{genome_files[1].name}: "
+            "BLAST executed correctly but no alignments were found",
+            f"{genome_files[2].name}: Failed to run `blastn` command on worker",
+        ]
+
+        # Rings are inserted in a single write
+        mock_collection.return_value.find_one_and_update.assert_called_once()
+        stored_rings = get_inserted_rings(
+            mock_collection.return_value.find_one_and_update.call_args.args[1]
+        )
+        assert [ring["type"] for ring in stored_rings] == [RingType.BLAST]
+        assert [ring.index for ring in batch.rings] == [0]
+        assert mock_store_zoom_pyramid.call_count == 1
+
+        # Segments are stored outside of the session
+        assert all("data" not in ring for ring in stored_rings)
+        (chunks,) = mock_segment_collection.return_value.insert_many.call_args.args
+        assert [(chunk["ring_id"], chunk["chunk"]) for chunk in chunks] == [
+            (batch.rings[0].id, 0)
+        ]
+        assert chunks[0]["data"][0]["start"] == 1
+    finally:
+        shutil.rmtree(session_directory)
+
+
+def get_inserted_rings(pipeline: list) -> list:
+    """Ring metadata inserted by a session update pipeline in order"""
+
+    def literals(expression):
+        if isinstance(expression, dict):
+            for key, value in expression.items():
+                if key == "$literal":
+                    yield value
+                else:
+                    yield from literals(value)
+        elif isinstance(expression, list):
+            for value in expression:
+                yield from literals(value)
+
+    # Other literals are the identifiers compared in the expressions
+    return [literal for literal in literals(pipeline) if isinstance(literal, dict)]
+
+
+def mock_ring_insertion(query: dict, pipeline: list, **kwargs) -> dict:
+    """Session of a ring insertion with the rings inserted in order"""
+    return {
+        "rings": [
+            {"id": ring["id"], "index": i}
+            for i, ring in enumerate(get_inserted_rings(pipeline))
+        ]
+    }
+
+
+@patch("brick.api.core.db.get_segment_collection_pymongo")
+@patch("brick.api.tasks.get_session_collection_pymongo")
+def test_insert_rings_or_create_session_atomic(
+    mock_collection, mock_segment_collection
+):
+    reference = RingReference(sequence=RingReferenceSequence(id="chr1", length=1000))
+    mock_collection.return_value.find_one_and_update.return_value = {
+        "rings": [
+            {"id": "blast", "index": 0},
+            *[{"id": f"new_{i}", "index": i + 1} for i in range(3)],
+            {"id": "label", "index": 4},
+        ]
+    }
+
+    rings = insert_rings_or_create_session(
+        session_id="session",
+        rings=[BlastRing(id=f"new_{i}", reference=reference) for i in range(3)],
+    )
+
+    # Indices are assigned by the update and read from the updated session
+    assert [(ring.id, ring.index) for ring in rings] == [
+        ("new_0", 1),
+        ("new_1", 2),
+        ("new_2", 3),
+    ]
+
+    # Rings are appended in order with a single upsert of the session
+    mock_collection.return_value.find_one.assert_not_called()
+    mock_update = mock_collection.return_value.find_one_and_update
+    (query, pipeline), kwargs = mock_update.call_args
+    assert query == {"id": "session"} and kwargs["upsert"]
+    assert len(pipeline) == 4
+    assert [ring["id"] for ring in get_inserted_rings(pipeline)] == [
+        "new_0",
+        "new_1",
+        "new_2",
+    ]
+
+
+def test_get_ring_insertion_literal_identifiers():
+    reference = RingReference(
+        reference_id="$reference",
+        sequence=RingReferenceSequence(id="$$chr1", length=1000),
+    )
+    insertion = get_ring_insertion(BlastRing(id="new", reference=reference), "gen")
+
+    # Identifiers are compared as values and not as field paths or variables
+    def comparisons(expression):
+        if isinstance(expression, dict):
+            for key, value in expression.items():
+                if key == "$eq":
+                    yield value
+                elif key != "$literal":
+                    yield from comparisons(value)
+        elif isinstance(expression, list):
+            for value in expression:
+                yield from comparisons(value)
+
+    compared = [value for _, value in comparisons(insertion)]
+    assert {"$literal": "$reference"} in compared
+    assert {"$literal": "$$chr1"} in compared
+    assert not any(isinstance(value, str) and "chr1" in value for value in compared)
+
+
+@patch("brick.api.core.db.get_segment_collection_pymongo")
+@patch("brick.api.tasks.get_session_collection_pymongo")
+def test_insert_rings_or_create_session_failure(
+    mock_collection, mock_segment_collection
+):
+    reference = RingReference(sequence=RingReferenceSequence(id="chr1", length=1000))
+    mock_collection.return_value.find_one_and_update.side_effect = DuplicateKeyError(
+        "id"
+    )
+
+    with pytest.raises(DuplicateKeyError):
+        insert_rings_or_create_session(
+            session_id="session",
+            rings=[
+                BlastRing(id="new", reference=reference, data=[{"start": 1, "end": 10}])
+            ],
+        )
+
+    # Segments stored for the rings are deleted if the rings are not inserted
+    assert mock_collection.return_value.find_one_and_update.call_count == 2
+    (chunks,) = mock_segment_collection.return_value.insert_many.call_args.args
+    (query,) = mock_segment_collection.return_value.delete_many.call_args.args
+    assert query["$or"] == [{"ring_id": "new", "generation": chunks[0]["generation"]}]
+
+
+@patch("brick.api.core.db.get_segment_collection_pymongo")
+@patch("brick.api.tasks.get_session_collection_pymongo")
+def test_replace_ring_data_generation(mock_collection, mock_segment_collection):
+    reference = RingReference(sequence=RingReferenceSequence(id="chr1", length=1000))
+    ring = BlastRing(id="ring", reference=reference, data=[{"start": 1, "end": 10}])
+    mock_update = mock_collection.return_value.find_one_and_update
+    mock_update.return_value = {
+        "rings": [{"id": "ring", "type": "blast", "index": 2, "generation": "old"}]
+    }
+
+    replaced_ring = replace_ring_data(session_id="session", ring=ring)
+
+    # Ring points to the new segments before the replaced segments are deleted
+    (chunks,) = mock_segment_collection.return_value.insert_many.call_args.args
+    (_, update), _ = mock_update.call_args
+    assert update["$set"]["rings.$.generation"] == chunks[0]["generation"]
+    (query,) = mock_segment_collection.return_value.delete_many.call_args.args
+    assert query["$or"] == [{"ring_id": "ring", "generation": "old"}]
+    assert replaced_ring.index == 2 and replaced_ring.data[0].start == 1
+
+    # Segments are deleted if the ring is not in the session
+    mock_update.return_value = None
+    assert replace_ring_data(session_id="session", ring=ring) is None
+    (chunks,) = mock_segment_collection.return_value.insert_many.call_args.args
+    (query,) = mock_segment_collection.return_value.delete_many.call_args.args
+    assert query["$or"] == [{"ring_id": "ring", "generation": chunks[0]["generation"]}]
+
+
+# Ring insertions of workers against a MongoDB server, skipped
+# if the server at `MONGODB_URL` is not available
+
+
+@pytest.fixture
+def mongodb(monkeypatch):
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(settings.MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("MongoDB server is not available")
+
+    # Separate database for each test
+    monkeypatch.setattr(settings, "MONGODB_DATABASE", f"brick_test_{uuid.uuid4().hex}")
+    try:
+        yield client[settings.MONGODB_DATABASE]
+    finally:
+        client.drop_database(settings.MONGODB_DATABASE)
+
+
+def test_insert_rings_or_create_session_order(mongodb):
+    reference = RingReference(sequence=RingReferenceSequence(id="chr1", length=1000))
+    other_reference = RingReference(
+        sequence=RingReferenceSequence(id="chr2", length=1000)
+    )
+
+    insert_rings_or_create_session(
+        session_id="session",
+        rings=[
+            BlastRing(id="blast", reference=reference),
+            LabelRing(id="label", reference=reference),
+        ],
+    )
+    rings = insert_rings_or_create_session(
+        session_id="session",
+        rings=[BlastRing(id=f"new_{i}", reference=reference) for i in range(3)]
+        + [BlastRing(id="other", reference=other_reference)],
+    )
+
+    assert [(ring.id, ring.index) for ring in rings] == [
+        ("new_0", 1),
+        ("new_1", 2),
+        ("new_2", 3),
+        ("other", 0),
+    ]
+    session = mongodb[settings.MONGODB_SESSION_COLLECTION].find_one({"id": "session"})
+    assert sorted((ring["index"], ring["id"]) for ring in session["rings"]) == [
+        (0, "blast"),
+        (0, "other"),
+        (1, "new_0"),
+        (2, "new_1"),
+        (3, "new_2"),
+        (4, "label"),
+    ]
+
+
+def test_update_rings_or_create_session_concurrent(mongodb):
+    from concurrent.futures import ThreadPoolExecutor
+
+    reference = RingReference(sequence=RingReferenceSequence(id="chr1", length=1000))
+    insert_rings_or_create_session(
+        session_id="session", rings=[LabelRing(id="label", reference=reference)]
+    )
+
+    # Ring tasks finishing at the same time on one session
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        rings = list(
+            executor.map(
+                lambda i: update_rings_or_create_session(
+                    session_id="session",
+                    ring=BlastRing(id=f"blast_{i}", reference=reference),
+                ),
+                range(20),
+            )
+        )
+
+    assert sorted(ring.index for ring in rings) == list(range(20))
+    session = mongodb[settings.MONGODB_SESSION_COLLECTION].find_one({"id": "session"})
+    assert len(session["rings"]) == 21
+    assert {ring["id"]: ring["index"] for ring in session["rings"]} == {
+        "label": 20,
+        **{ring.id: ring.index for ring in rings},
+    }
@@ -0,0 +1,115 @@
+"""
+Benchmark of a single multiplexed BLAST run of many small query genomes against
+per-genome BLAST runs with the same reference database, requires `blastn` and
+`makeblastdb` on the path
+
+python tests/benchmarks/benchmark_blast_multiplex.py --genomes 50 --length 50000
+"""
+
+import time
+import random
+import argparse
+import tempfile
+
+from pathlib import Path
+
+from brick.api.core.config import settings
+from brick.api.tasks import run_blast_multiplexed, stream_blast
+from brick.rings import BLASTN_SEGMENT_COLUMNS
+
+
+def write_fasta(path: Path, sequences: dict, line_width: int = 80):
+    with path.open("w") as fasta:
+        for seq_id, sequence in sequences.items():
+            fasta.write(f">{seq_id}\n")
+            for i in range(0, len(sequence), line_width):
+                fasta.write(f"{sequence[i : i + line_width]}\n")
+
+
+def mutate(rng: random.Random, sequence: str, rate: float) -> str:
+    return "".join(
+        rng.choice("ACGT") if rng.random() < rate else base for base in sequence
+    )
+
+
+def per_genome_blast(query_fastas: list, reference_fasta: Path) -> list:
+    hits = []
+    for query_fasta in query_fastas:
+        with tempfile.TemporaryDirectory() as directory:
+            hits.append(
+                stream_blast(
+                    query_fasta=query_fasta,
+                    reference_fasta=reference_fasta,
+                    working_directory=Path(directory),
+                    use_database=True,
+                    columns=BLASTN_SEGMENT_COLUMNS,
+                )
+            )
+    return hits
+
+
+def multiplexed_blast(query_fastas: list, reference_fasta: Path) -> list:
+    with tempfile.TemporaryDirectory() as directory:
+        return [
+            hits[BLASTN_SEGMENT_COLUMNS]
+            for hits in run_blast_multiplexed(
+                query_fastas=query_fastas,
+                reference_fasta=reference_fasta,
+                working_directory=Path(directory),
+            )
+        ]
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--genomes", type=int, default=50)
+    parser.add_argument("--length", type=int, default=50_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    reference = "".join(rng.choices("ACGT", k=args.length))
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Reference database is built once and shared by both modes
+        settings.WORK_DIRECTORY = Path(directory)
+        settings.CELERY_THREADS_PER_PROCESS = args.threads
+
+        reference_fasta = Path(directory) / "ref.fa"
+        write_fasta(reference_fasta, {"chr1": reference})
+
+        query_fastas = []
+        for i in range(args.genomes):
+            query_fastas.append(Path(directory) / f"genome_{i}.fa")
+            write_fasta(query_fastas[-1], {"contig_1": mutate(rng, reference, 0.05)})
+
+        per_genome_blast(query_fastas[:1], reference_fasta)  # database build
+
+        per_genome_hits, per_genome = timed(
+            per_genome_blast, query_fastas, reference_fasta
+        )
+        multiplexed_hits, multiplexed = timed(
+            multiplexed_blast, query_fastas, reference_fasta
+        )
+
+    assert [len(hits) for hits in per_genome_hits] == [
+        len(hits) for hits in multiplexed_hits
+    ], "hits of multiplexed run differ"
+
+    print(
+        f"{'genomes':>8} {'length':>10} {'per-genome (s)':>15} {'multiplexed (s)':>16} {'speedup':>8}"
+    )
+    print(
+        f"{args.genomes:>8} {args.length:>10,} {per_genome:>15.2f} {multiplexed:>16.2f} {per_genome / multiplexed:>7.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
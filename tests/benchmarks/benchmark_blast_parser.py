@@ -0,0 +1,108 @@
+"""
+Benchmark of the columnar BLAST output parser against the previous per-line parser
+
+python tests/benchmarks/benchmark_blast_parser.py --lines 1000000
+"""
+
+import time
+import random
+import argparse
+import tempfile
+
+from pathlib import Path
+
+from brick.rings import (
+    BlastRing,
+    BlastnEntry,
+    RingReference,
+    RingReferenceSequence,
+)
+
+
+def write_synthetic_blastn_output(path: Path, lines: int, seed: int = 42):
+    rng = random.Random(seed)
+    with path.open("w") as out:
+        for i in range(lines):
+            start = rng.randint(1, 5_000_000)
+            length = rng.randint(20, 5000)
+            out.write(
+                f"contig_{i % 200}\t{rng.choice(['chr1', 'chr1', 'chr1', 'plasmid_1'])}\t"
+                f"{rng.uniform(60, 100):.2f}\t{length}\t{rng.randint(0, 50)}\t{rng.randint(0, 5)}\t"
+                f"1\t{length}\t{start}\t{start + length}\t{rng.choice(['0.0', '1e-50', '2e-5', '0.5', '4.1'])}\t"
+                f"{rng.uniform(20, 9000):.1f}\n"
+            )
+
+
+def legacy_blast_ring(
+    file_path: Path, reference, min_identity, min_alignment, min_evalue
+):
+    """Per-line parser of the previous implementation"""
+    result = []
+    with file_path.open("r") as file:
+        for line in file:
+            fields = line.strip().split("\t")
+            entry = BlastnEntry(
+                query_id=fields[0],
+                subject_id=fields[1],
+                perc_identity=float(fields[2]),
+                alignment_length=int(fields[3]),
+                mismatches=int(fields[4]),
+                gap_opens=int(fields[5]),
+                query_start=int(fields[6]),
+                query_end=int(fields[7]),
+                subject_start=int(fields[8]),
+                subject_end=int(fields[9]),
+                e_value=float(fields[10]),
+                bit_score=float(fields[11]),
+            )
+            if entry.perc_identity < min_identity:
+                continue
+            if entry.alignment_length < min_alignment:
+                continue
+            if entry.e_value > min_evalue:
+                continue
+            if entry.subject_id == reference.sequence.id:
+                result.append(entry)
+
+    return [entry.to_segment() for entry in result]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--min-identity", type=float, default=90)
+    parser.add_argument("--min-alignment", type=int, default=100)
+    parser.add_argument("--min-evalue", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    reference = RingReference(sequence=RingReferenceSequence(id="chr1"))
+    filters = dict(
+        min_identity=args.min_identity,
+        min_alignment=args.min_alignment,
+        min_evalue=args.min_evalue,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "results.tsv"
+        write_synthetic_blastn_output(path=path, lines=args.lines)
+
+        t0 = time.perf_counter()
+        legacy_segments = legacy_blast_ring(path, reference=reference, **filters)
+        legacy_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        ring = BlastRing.from_blast_output(file=path, reference=reference, **filters)
+        columnar_time = time.perf_counter() - t0
+
+    assert [s.model_dump() for s in legacy_segments] == [
+        s.model_dump() for s in ring.data
+    ], "outputs differ"
+
+    print(f"lines: {args.lines:,} - segments: {len(ring.data):,}")
+    print(f"per-line parser:  {legacy_time:8.2f} s")
+    print(f"columnar parser:  {columnar_time:8.2f} s")
+    print(f"speedup:          {legacy_time / columnar_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark of query-chunked BLAST of a large genome across worker processes (as
+Celery workers would execute the chunk tasks) against a single BLAST run of the
+whole genome, requires `blastn` and `makeblastdb` on the path
+
+python tests/benchmarks/benchmark_blast_query_chunks.py --length 20000000 --workers 1 2 4 8
+"""
+
+import time
+import random
+import argparse
+import tempfile
+
+from pathlib import Path
+from multiprocessing import get_context
+
+from brick.api.core.config import settings
+from brick.api.tasks import stream_blast
+from brick.rings import (
+    BLASTN_CHUNK_COLUMNS,
+    BLASTN_SEGMENT_COLUMNS,
+    concat_blastn_hits,
+    load_blastn_hits,
+    save_blastn_hits,
+    unchunk_blastn_hits,
+)
+from brick.utils import plan_fasta_chunks, scan_fasta_records, write_fasta_index
+from brick.utils import write_fasta_slices
+
+
+def write_fasta(path: Path, sequences: dict, line_width: int = 80):
+    with path.open("w") as fasta:
+        for seq_id, sequence in sequences.items():
+            fasta.write(f">{seq_id}\n")
+            for i in range(0, len(sequence), line_width):
+                fasta.write(f"{sequence[i : i + line_width]}\n")
+
+
+def mutate(rng: random.Random, sequence: str, rate: float) -> str:
+    return "".join(
+        rng.choice("ACGT") if rng.random() < rate else base for base in sequence
+    )
+
+
+def whole_genome_blast(query_fasta: Path, reference_fasta: Path):
+    with tempfile.TemporaryDirectory(dir=settings.WORK_DIRECTORY) as directory:
+        return stream_blast(
+            query_fasta=query_fasta,
+            reference_fasta=reference_fasta,
+            working_directory=Path(directory),
+            use_database=True,
+            columns=BLASTN_SEGMENT_COLUMNS,
+        )
+
+
+def blast_chunk(reference_fasta: Path, query_fasta: Path, chunk: list, hits_file: Path):
+    """BLAST of a chunk of query slices as in `process_blast_query_chunk`"""
+    with tempfile.TemporaryDirectory(dir=settings.WORK_DIRECTORY) as directory:
+        chunk_fasta = Path(directory) / "query.fasta"
+        write_fasta_slices(query_fasta, slices=chunk, outfile=chunk_fasta)
+        hits = stream_blast(
+            query_fasta=chunk_fasta,
+            reference_fasta=reference_fasta,
+            working_directory=Path(directory),
+            use_database=True,
+            columns=BLASTN_CHUNK_COLUMNS,
+        )
+    save_blastn_hits(hits=hits, file_path=hits_file)
+
+
+def chunked_blast(query_fasta: Path, reference_fasta: Path, chunks: list, workers: int):
+    with tempfile.TemporaryDirectory(dir=settings.WORK_DIRECTORY) as directory:
+        hits_files = [Path(directory) / f"{i}.npz" for i in range(len(chunks))]
+        with get_context("fork").Pool(workers) as pool:
+            pool.starmap(
+                blast_chunk,
+                [
+                    (reference_fasta, query_fasta, chunk, file)
+                    for chunk, file in zip(chunks, hits_files)
+                ],
+            )
+        return unchunk_blastn_hits(
+            concat_blastn_hits(
+                (load_blastn_hits(file) for file in hits_files),
+                columns=BLASTN_CHUNK_COLUMNS,
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--length", type=int, default=20_000_000)
+    parser.add_argument("--contigs", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    contig_length = args.length // args.contigs
+    reference = {
+        f"contig_{i}": "".join(rng.choices("ACGT", k=contig_length))
+        for i in range(args.contigs)
+    }
+    query = {seq_id: mutate(rng, seq, 0.02) for seq_id, seq in reference.items()}
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings.WORK_DIRECTORY = Path(directory)
+        settings.CELERY_THREADS_PER_PROCESS = 1  # one core per worker process
+
+        reference_fasta, query_fasta = (
+            Path(directory) / "ref.fa",
+            Path(directory) / "qry.fa",
+        )
+        write_fasta(reference_fasta, reference)
+        write_fasta(query_fasta, query)
+        write_fasta_index(query_fasta, list(scan_fasta_records(query_fasta)))
+
+        chunks = plan_fasta_chunks(
+            {seq_id: len(seq) for seq_id, seq in query.items()},
+            chunk_size=settings.BLAST_QUERY_CHUNK_SIZE,
+            overlap=settings.BLAST_QUERY_CHUNK_OVERLAP,
+        )
+
+        t0 = time.perf_counter()
+        whole_hits = whole_genome_blast(query_fasta, reference_fasta)
+        whole = time.perf_counter() - t0
+
+        print(
+            f"{'workers':>8} {'chunks':>7} {'whole (s)':>10} {'chunked (s)':>12} {'hits':>8} {'speedup':>8}"
+        )
+        for workers in args.workers:
+            t0 = time.perf_counter()
+            chunked_hits = chunked_blast(query_fasta, reference_fasta, chunks, workers)
+            chunked = time.perf_counter() - t0
+            print(
+                f"{workers:>8} {len(chunks):>7} {whole:>10.2f} {chunked:>12.2f} {len(chunked_hits):>8} {whole / chunked:>7.1f}x"
+            )
+        print(f"whole genome hits: {len(whole_hits)}")
+
+
+if __name__ == "__main__":
+    main()
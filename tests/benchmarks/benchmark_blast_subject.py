@@ -0,0 +1,82 @@
+"""
+Benchmark of BLAST against the selected reference sequence against BLAST of the whole
+multi-record reference (hits on other sequences are discarded by the ring filters),
+requires `blastn` and `makeblastdb` on the path
+
+python tests/benchmarks/benchmark_blast_subject.py --records 20 --length 500000
+"""
+
+import time
+import random
+import argparse
+import tempfile
+
+from pathlib import Path
+
+from brick.api.core.config import settings
+from brick.api.tasks import stream_blast
+
+
+def write_fasta(path: Path, sequences: dict, line_width: int = 80):
+    with path.open("w") as fasta:
+        for seq_id, sequence in sequences.items():
+            fasta.write(f">{seq_id}\n")
+            for i in range(0, len(sequence), line_width):
+                fasta.write(f"{sequence[i : i + line_width]}\n")
+
+
+def mutate(rng: random.Random, sequence: str, rate: float) -> str:
+    return "".join(
+        rng.choice("ACGT") if rng.random() < rate else base for base in sequence
+    )
+
+
+def timed_blast(query_fasta: Path, reference_fasta: Path, sequence_id: str | None):
+    with tempfile.TemporaryDirectory() as directory:
+        # Separate cache directory for each run so that databases are always built
+        settings.WORK_DIRECTORY = Path(directory)
+        t0 = time.perf_counter()
+        stream_blast(
+            query_fasta=query_fasta,
+            reference_fasta=reference_fasta,
+            working_directory=Path(directory),
+            sequence_id=sequence_id,
+        )
+        return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20)
+    parser.add_argument("--length", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    reference = {
+        f"contig_{i}": "".join(rng.choices("ACGT", k=args.length))
+        for i in range(args.records)
+    }
+    query = {seq_id: mutate(rng, seq, 0.02) for seq_id, seq in reference.items()}
+
+    with tempfile.TemporaryDirectory() as directory:
+        reference_fasta, query_fasta = (
+            Path(directory) / "ref.fa",
+            Path(directory) / "qry.fa",
+        )
+        write_fasta(reference_fasta, reference)
+        write_fasta(query_fasta, query)
+
+        whole = timed_blast(query_fasta, reference_fasta, sequence_id=None)
+        selected = timed_blast(query_fasta, reference_fasta, sequence_id="contig_0")
+
+    print(
+        f"{'records':>8} {'length':>10} {'whole (s)':>10} {'selected (s)':>13} {'speedup':>8}"
+    )
+    print(
+        f"{args.records:>8} {args.length:>10,} {whole:>10.2f} {selected:>13.2f} {whole / selected:>7.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
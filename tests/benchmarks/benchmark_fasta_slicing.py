@@ -0,0 +1,86 @@
+"""
+Benchmark of peak memory and time of slicing a genome into windows with slices held in
+memory (`slice_fasta_sequences`) against slices streamed to the output file as they are
+read (`stream_fasta_slices`), outputs of both are compared byte for byte
+
+python tests/benchmarks/benchmark_fasta_slicing.py --length 100000000 --size 2500
+"""
+
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+from pathlib import Path
+
+from brick.utils import slice_fasta_sequences, stream_fasta_slices
+
+
+def write_fasta(path: Path, sequences: dict, line_width: int = 80):
+    with path.open("w") as fasta:
+        for seq_id, sequence in sequences.items():
+            fasta.write(f">{seq_id}\n")
+            for i in range(0, len(sequence), line_width):
+                fasta.write(f"{sequence[i : i + line_width]}\n")
+
+
+def traced(func, *args, **kwargs):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024**2
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--length", type=int, default=100_000_000)
+    parser.add_argument("--contigs", type=int, default=4)
+    parser.add_argument("--size", type=int, default=2500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    contig_length = args.length // args.contigs
+
+    with tempfile.TemporaryDirectory() as directory:
+        fasta_file = Path(directory) / "genome.fa"
+        write_fasta(
+            fasta_file,
+            {
+                f"contig_{i}": "".join(rng.choices("ACGT", k=contig_length))
+                for i in range(args.contigs)
+            },
+        )
+
+        collected_file, streamed_file = (
+            Path(directory) / "collected.fa",
+            Path(directory) / "streamed.fa",
+        )
+        collected, collected_peak = traced(
+            slice_fasta_sequences,
+            fasta_file,
+            slice_size=args.size,
+            outfile=collected_file,
+        )
+        streamed, streamed_peak = traced(
+            stream_fasta_slices, fasta_file, streamed_file, slice_size=args.size
+        )
+
+        assert (
+            collected_file.read_bytes() == streamed_file.read_bytes()
+        ), "sliced outputs differ"
+
+    print(
+        f"{'length':>12} {'size':>6} {'collected (s)':>14} {'streamed (s)':>13} {'collected (MB)':>15} {'streamed (MB)':>14}"
+    )
+    print(
+        f"{args.length:>12,} {args.size:>6} {collected:>14.2f} {streamed:>13.2f} {collected_peak:>15.1f} {streamed_peak:>14.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark of session endpoint latency against segment count with sessions read by
+partial loaders (`brick.api.core.repository`) and segments in the segment store,
+against the previous full session read with segments stored in the session document,
+requires a MongoDB server at `MONGODB_URL` (a temporary database is dropped after)
+
+MONGODB_URL=mongodb://localhost:27017 python tests/benchmarks/benchmark_session_loading.py --segments 1000 10000 50000
+"""
+
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+
+from httpx import AsyncClient
+
+from brick.api.main import app
+from brick.api.schemas import Session
+from brick.api.core.config import settings
+from brick.api.core.db import async_client, client, store_ring_segments
+
+from benchmark_session_validation import synthetic_session
+
+
+def timed(repeats: int):
+    async def run(func, *args, **kwargs) -> float:
+        """Median of repeats in milliseconds"""
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            await func(*args, **kwargs)
+            times.append(time.perf_counter() - t0)
+        return statistics.median(times) * 1000
+
+    return run
+
+
+async def store_session(segments: int) -> tuple:
+    """Session with segments in the segment store and its previous full document"""
+
+    session = synthetic_session(segments=segments)
+    session_id, legacy_id = str(uuid.uuid4()), str(uuid.uuid4())
+
+    collection = async_client[settings.MONGODB_DATABASE][
+        settings.MONGODB_SESSION_COLLECTION
+    ]
+    await collection.insert_one({**session, "id": legacy_id})
+    generations = {
+        ring["id"]: store_ring_segments(session_id, ring["id"], ring["data"])
+        for ring in session["rings"]
+    }
+    await collection.insert_one(
+        {
+            **session,
+            "id": session_id,
+            "rings": [
+                {
+                    **{key: value for key, value in ring.items() if key != "data"},
+                    "generation": generations[ring["id"]],
+                }
+                for ring in session["rings"]
+            ],
+        }
+    )
+
+    return collection, session_id, legacy_id
+
+
+async def benchmark(segment_counts: list, repeats: int):
+    run = timed(repeats)
+
+    print(
+        f"{'segments':>10} {'previous (ms)':>14} {'session (ms)':>13} {'files (ms)':>11} {'ring (ms)':>10} {'label (ms)':>11}"
+    )
+    async with AsyncClient(app=app, base_url="http://benchmark") as client:
+        for segments in segment_counts:
+            collection, session_id, legacy_id = await store_session(segments)
+
+            async def previous():
+                Session(**await collection.find_one({"id": legacy_id}))
+
+            ring_update = {
+                "id": "0",
+                "index": 1,
+                "visible": None,
+                "color": None,
+                "height": None,
+                "title": None,
+                "index_group": ["0", "1", "2"],
+            }
+            label_update = {"ring_id": "2", "label_id": "2", "textSize": 12}
+
+            previous_time = await run(previous)
+            session_time = await run(client.get, f"/sessions/{session_id}")
+            files_time = await run(client.get, f"/files/{session_id}")
+            ring_time = await run(
+                client.put, f"/sessions/{session_id}/ring", json=ring_update
+            )
+            label_time = await run(
+                client.put, f"/sessions/{session_id}/label", json=label_update
+            )
+
+            print(
+                f"{segments:>10,} {previous_time:>14.1f} {session_time:>13.1f} {files_time:>11.1f} {ring_time:>10.1f} {label_time:>11.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--segments", type=int, nargs="+", default=[1_000, 10_000, 50_000]
+    )
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    settings.MONGODB_DATABASE = f"brick_benchmark_{uuid.uuid4().hex}"
+    try:
+        asyncio.run(benchmark(args.segments, repeats=args.repeats))
+    finally:
+        client.drop_database(settings.MONGODB_DATABASE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Benchmark of session validation against segment count with segments selected by
+their `kind` tag and by the previous validator sniffing subclass specific fields
+
+python tests/benchmarks/benchmark_session_validation.py --segments 1000 10000 100000 500000
+"""
+
+import gc
+import time
+import random
+import argparse
+
+from typing import List
+from pydantic import BaseModel, field_validator
+
+from brick.api.schemas import Session
+from brick.rings import (
+    GenomadSegment,
+    LabelSegment,
+    RingReference,
+    RingReferenceSequence,
+    RingSegment,
+    RingType,
+)
+
+
+class LegacyRingSegment(BaseModel):
+    start: int = 0
+    end: int = 0
+    text: str = ""
+
+
+class LegacyGenomadSegment(LegacyRingSegment):
+    plasmid: float | None = None
+    virus: float | None = None
+    chromosome: float | None = None
+
+
+class LegacyLabelSegment(LegacyRingSegment):
+    labelIdentifier: str
+    lineLength: float | None = None
+    lineWidth: float | None = None
+    lineOpacity: float | None = None
+    lineAngle: float | None = None
+    lineColor: str | None = None
+    textSize: float | None = None
+    textColor: str | None = None
+    textOpacity: str | None = None
+
+
+class LegacyRing(BaseModel):
+    """Ring model of the previous implementation"""
+
+    id: str
+    index: int = -1
+    visible: bool = True
+    color: str = "#d3d3d3"
+    height: int = 20
+    type: RingType = RingType.GENERIC
+    title: str = "Ring"
+    reference: RingReference | None = None
+    data: List[LegacyRingSegment | LegacyLabelSegment | LegacyGenomadSegment] = []
+
+    @field_validator("data", mode="before")
+    @classmethod
+    def set_correct_segment_type(cls, v):
+        return [legacy_segment_type(item) for item in v]
+
+
+def legacy_segment_type(v):
+    if type(v) == dict:
+        if "textSize" in v:
+            return LegacyLabelSegment(**v)
+        elif "plasmid" in v:
+            return LegacyGenomadSegment(**v)
+        else:
+            return LegacyRingSegment(**v)
+    return v
+
+
+class LegacySession(BaseModel):
+    id: str
+    date: str
+    files: List[dict]
+    rings: List[LegacyRing]
+
+
+def synthetic_session(segments: int, seed: int = 42) -> dict:
+    """Session document with an annotation, genomad and label ring sharing the segments"""
+
+    rng = random.Random(seed)
+    reference = RingReference(
+        session_id="session",
+        sequence=RingReferenceSequence(id="chr1", length=5_000_000),
+    )
+
+    def position() -> tuple:
+        start = rng.randint(1, 5_000_000)
+        return start, start + rng.randint(100, 5000)
+
+    annotation, genomad, label = [], [], []
+    for i in range(segments):
+        start, end = position()
+        if i % 3 == 0:
+            annotation.append(RingSegment(start=start, end=end, text=f"gene_{i}"))
+        elif i % 3 == 1:
+            genomad.append(
+                GenomadSegment(
+                    start=start,
+                    end=end,
+                    text="Plasmid (0.91) ",
+                    plasmid=0.91,
+                    virus=0.0,
+                    chromosome=0.0,
+                )
+            )
+        else:
+            label.append(
+                LabelSegment(
+                    start=start, end=end, text=f"label_{i}", labelIdentifier=str(i)
+                )
+            )
+
+    rings = [
+        dict(id=str(i), type=ring_type, reference=reference.model_dump(), data=data)
+        for i, (ring_type, data) in enumerate(
+            [
+                (RingType.ANNOTATION, annotation),
+                (RingType.GENOMAD, genomad),
+                (RingType.LABEL, label),
+            ]
+        )
+    ]
+    return Session(id="session", date="date", files=[], rings=rings).model_dump(
+        mode="json"
+    )
+
+
+def untagged(session: dict) -> dict:
+    """Session document as stored before segments carried their kind"""
+    return {
+        **session,
+        "rings": [
+            {
+                **ring,
+                "data": [
+                    {key: value for key, value in segment.items() if key != "kind"}
+                    for segment in ring["data"]
+                ],
+            }
+            for ring in session["rings"]
+        ],
+    }
+
+
+def timed(func, data: dict, repeats: int) -> float:
+    """Best of repeats with garbage collection disabled (as in `timeit`)"""
+    best = float("inf")
+    for _ in range(repeats):
+        gc.collect()
+        gc.disable()
+        try:
+            t0 = time.perf_counter()
+            func(**data)
+            best = min(best, time.perf_counter() - t0)
+        finally:
+            gc.enable()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--segments", type=int, nargs="+", default=[1_000, 10_000, 100_000, 500_000]
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'segments':>10} {'previous (s)':>14} {'kind (s)':>10} {'untagged (s)':>14} {'speedup':>9}"
+    )
+    for segments in args.segments:
+        tagged_session = synthetic_session(segments=segments)
+        legacy_session = untagged(tagged_session)
+
+        session = Session(**legacy_session)
+        assert session == Session(**tagged_session), "validated sessions differ"
+        assert [[type(s).__name__ for s in ring.data] for ring in session.rings] == [
+            [type(s).__name__.replace("Legacy", "") for s in ring.data]
+            for ring in LegacySession(**legacy_session).rings
+        ], "segment models differ"
+
+        legacy_time = timed(LegacySession, legacy_session, repeats=args.repeats)
+        tagged_time = timed(Session, tagged_session, repeats=args.repeats)
+        untagged_time = timed(Session, legacy_session, repeats=args.repeats)
+
+        print(
+            f"{segments:>10,} {legacy_time:>14.3f} {tagged_time:>10.3f} {untagged_time:>14.3f} {legacy_time / tagged_time:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
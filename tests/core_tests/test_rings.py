@@ -0,0 +1,566 @@
+import os
+import statistics
+import numpy
+import pandas
+import pytest
+
+from pathlib import Path
+from brick.rings import (
+    BLASTN_CHUNK_COLUMNS,
+    BLASTN_SEGMENT_COLUMNS,
+    AnnotationRing,
+    BlastRing,
+    GenomadPredictionClass,
+    GenomadRing,
+    GenomadSegment,
+    LabelRing,
+    LabelSegment,
+    Ring,
+    RingReference,
+    RingReferenceSequence,
+    RingSegment,
+    RingSegmentType,
+    SegmentIndex,
+    SegmentTable,
+    ZoomPyramid,
+    concat_blastn_hits,
+    demultiplex_blastn_hits,
+    get_segment_scores,
+    load_blastn_hits,
+    parse_blastn_output,
+    read_blastn_output,
+    read_blastn_stream,
+    save_blastn_hits,
+    split_seq_name_coordinates,
+    unchunk_blastn_hits,
+)
+
+# Tests for BLAST output parsing
+
+BLASTN_LINES = [
+    "query_1\tchr1\t99.50\t1200\t6\t0\t1\t1200\t101\t1300\t0.0\t2150",
+    "query_1\tchr1\t85.25\t300\t44\t2\t1301\t1600\t2000\t1701\t1e-50\t400",
+    "query_2\tplasmid_1\t100.00\t500\t0\t0\t1\t500\t1\t500\t0.0\t924",
+    "query_2\tchr1\t72.00\t80\t22\t1\t10\t90\t5000\t5080\t0.5\t50.1",
+]
+
+
+@pytest.fixture
+def blastn_output(tmp_path: Path) -> Path:
+    file_path = tmp_path / "results.tsv"
+    file_path.write_text("\n".join(BLASTN_LINES) + "\n")
+    return file_path
+
+
+def test_read_blastn_output_dtypes(blastn_output):
+    hits = read_blastn_output(file_path=blastn_output)
+    assert len(hits) == 4
+    assert hits["subject_start"].dtype == "int64"
+    assert hits["e_value"].dtype == "float64"
+    assert hits["query_id"].tolist() == ["query_1", "query_1", "query_2", "query_2"]
+
+
+def test_read_blastn_output_empty(tmp_path: Path):
+    file_path = tmp_path / "results.tsv"
+    file_path.touch()
+    assert len(read_blastn_output(file_path=file_path)) == 0
+    assert BlastRing.from_blast_output(file=file_path).data == []
+
+
+@pytest.mark.parametrize("chunksize", [1, 3, 10])
+def test_read_blastn_stream(blastn_output, chunksize):
+    with blastn_output.open("rb") as stream:
+        chunks = list(read_blastn_stream(stream, chunksize=chunksize))
+
+    assert [len(chunk) for chunk in chunks][0] == min(chunksize, len(BLASTN_LINES))
+    pandas.testing.assert_frame_equal(
+        concat_blastn_hits(chunks), read_blastn_output(blastn_output)
+    )
+
+    with open(os.devnull, "rb") as stream:
+        pandas.testing.assert_frame_equal(
+            concat_blastn_hits(read_blastn_stream(stream)),
+            read_blastn_output(Path(os.devnull)),
+        )
+
+
+def test_parse_blastn_output_filters(blastn_output):
+    entries = parse_blastn_output(
+        file_path=blastn_output, min_identity=80, min_alignment=100, min_evalue=1e-10
+    )
+    assert [(e.query_id, e.subject_id) for e in entries] == [
+        ("query_1", "chr1"),
+        ("query_1", "chr1"),
+        ("query_2", "plasmid_1"),
+    ]
+    assert entries[1].e_value == 1e-50
+
+
+def test_parse_blastn_output_reference_filter(blastn_output):
+    reference = RingReference(sequence=RingReferenceSequence(id="plasmid_1"))
+    entries = parse_blastn_output(
+        file_path=blastn_output, reference=reference, min_evalue=10
+    )
+    assert [e.subject_id for e in entries] == ["plasmid_1"]
+
+
+def test_blast_ring_segments_match_entries(blastn_output):
+    reference = RingReference(sequence=RingReferenceSequence(id="chr1"))
+    ring = BlastRing.from_blast_output(
+        file=blastn_output, reference=reference, min_evalue=10
+    )
+    entries = parse_blastn_output(
+        file_path=blastn_output, reference=reference, min_evalue=10
+    )
+    assert [s.model_dump() for s in ring.data] == [
+        e.to_segment().model_dump() for e in entries
+    ]
+    assert ring.data[0].text == "99.50% nucleotide identity"
+
+
+# Tests for geNomad output segment extraction
+
+GENOMAD_SCORES = [
+    # chromosome, plasmid, virus
+    (0.9, 0.0, 0.1),
+    (0.1, 0.8, 0.2),
+    (0.2, 0.9, 0.1),
+    (0.9, 0.1, 0.1),
+    (0.1, 0.1, 0.9),
+    (0.0, 0.1, 0.8),
+]
+
+
+@pytest.fixture
+def genomad_output(tmp_path: Path) -> Path:
+    file_path = tmp_path / "sliced_aggregated_classification.tsv"
+    lines = ["seq_name\tchromosome_score\tplasmid_score\tvirus_score"]
+    for i, (chromosome, plasmid, virus) in enumerate(GENOMAD_SCORES):
+        lines.append(
+            f"chr1__{i * 2500}..{(i + 1) * 2500}\t{chromosome}\t{plasmid}\t{virus}"
+        )
+    file_path.write_text("\n".join(lines) + "\n")
+    return file_path
+
+
+def test_split_seq_name_coordinates():
+    coordinates = split_seq_name_coordinates(
+        seq_names=pandas.Series(["chr1__0..2500", "chr1__2500..5000"])
+    )
+    assert coordinates["seq_id"].tolist() == ["chr1", "chr1"]
+    assert coordinates["start"].tolist() == [0, 2500]
+    assert coordinates["end"].tolist() == [2500, 5000]
+
+
+def test_split_seq_name_coordinates_not_sliced():
+    with pytest.raises(IndexError):
+        split_seq_name_coordinates(seq_names=pandas.Series(["chr1"]))
+    with pytest.raises(ValueError):
+        split_seq_name_coordinates(seq_names=pandas.Series(["chr1__0-2500"]))
+
+
+def test_annotation_ring_from_genomad_output(genomad_output):
+    ring = AnnotationRing.from_genomad_output(
+        file=genomad_output,
+        min_window_score=0.5,
+        min_segment_score=0.7,
+        min_segment_length=5000,
+        prediction_classes=[
+            GenomadPredictionClass.PLASMID,
+            GenomadPredictionClass.VIRUS,
+        ],
+    )
+    assert [(s.start, s.end, s.text) for s in ring.data] == [
+        (2500, 7500, "Plasmid (0.85)"),
+        (10000, 15000, "Phage (0.85)"),
+    ]
+
+
+def test_label_ring_from_genomad_output(genomad_output):
+    ring = LabelRing.from_genomad_output(
+        file=genomad_output,
+        min_window_score=0.5,
+        min_segment_score=0.7,
+        min_segment_length=0,
+        prediction_classes=[
+            GenomadPredictionClass.CHROMOSOME,
+            GenomadPredictionClass.PLASMID,
+        ],
+    )
+    assert [(s.start, s.end, s.text) for s in ring.data] == [
+        (0, 2500, "Chromosome (0.90)"),
+        (2500, 7500, "Plasmid (0.85)"),
+        (7500, 10000, "Chromosome (0.90)"),
+    ]
+    assert len({s.labelIdentifier for s in ring.data}) == 3
+
+
+def test_genomad_segment_means_long_runs(tmp_path):
+    rng = numpy.random.default_rng(1)
+    scores = rng.uniform(0.5, 1.0, size=5000)
+    file_path = tmp_path / "sliced_aggregated_classification.tsv"
+    lines = ["seq_name\tchromosome_score\tplasmid_score\tvirus_score"]
+    for i, plasmid in enumerate(scores):
+        lines.append(f"chr1__{i * 100}..{(i + 1) * 100}\t0\t{plasmid!r}\t0")
+    file_path.write_text("\n".join(lines) + "\n")
+
+    ring = AnnotationRing.from_genomad_output(
+        file=file_path,
+        min_window_score=0.5,
+        min_segment_score=0,
+        min_segment_length=0,
+        prediction_classes=[GenomadPredictionClass.PLASMID],
+    )
+    ((start, end, text),) = [(s.start, s.end, s.text) for s in ring.data]
+    assert (start, end) == (0, 500000)
+    assert float(text[len("Plasmid (") : -1]) == pytest.approx(
+        statistics.mean(scores.tolist()), abs=0.005
+    )
+
+
+def test_genomad_segment_mean_at_threshold(tmp_path):
+    # Mean of the run is 0.8 exactly but 0.7999999999999999 if summed in float64
+    file_path = tmp_path / "sliced_aggregated_classification.tsv"
+    lines = ["seq_name\tchromosome_score\tplasmid_score\tvirus_score"]
+    for i, virus in enumerate([1.0, 0.9, 0.5]):
+        lines.append(f"chr1__{i * 2500}..{(i + 1) * 2500}\t0\t0\t{virus!r}")
+    file_path.write_text("\n".join(lines) + "\n")
+
+    ring = AnnotationRing.from_genomad_output(
+        file=file_path,
+        min_window_score=0.5,
+        min_segment_score=0.8,
+        min_segment_length=0,
+        prediction_classes=[GenomadPredictionClass.VIRUS],
+    )
+    assert [(s.start, s.end, s.text) for s in ring.data] == [(0, 7500, "Phage (0.80)")]
+
+
+def test_genomad_ring_from_genomad_output(genomad_output):
+    ring = GenomadRing.from_genomad_output(
+        file=genomad_output,
+        min_window_score=0.5,
+        prediction_classes=[GenomadPredictionClass.PLASMID],
+    )
+    assert len(ring.data) == len(GENOMAD_SCORES)
+    assert ring.data[1] == GenomadSegment(
+        start=2500,
+        end=5000,
+        text="Plasmid (0.80) ",
+        plasmid=0.8,
+        virus=0,
+        chromosome=0,
+    )
+
+
+# Tests for columnar segment storage
+
+
+def test_segment_table_serializes_like_segments():
+    segments = [
+        RingSegment(start=10, end=20, text="a"),
+        RingSegment(start=0, end=5, text="b"),
+        RingSegment(start=30, end=40, text="a"),
+    ]
+    table = SegmentTable.from_segments(segments)
+    assert len(table) == 3
+    assert table.text_values == ["a", "b"]
+    assert table.to_records() == [s.model_dump() for s in segments]
+    assert list(table) == segments
+    assert table.sort().start.tolist() == [0, 10, 30]
+
+
+def test_segment_table_map_texts():
+    table = SegmentTable.from_columns(
+        start=[0, 1], end=[1, 2], text=["<b>x</b>", "<b>x</b>"]
+    )
+    assert table.map_texts(str.upper).text == ["<B>X</B>", "<B>X</B>"]
+
+
+def test_segment_table_session_round_trip(genomad_output):
+    from brick.api.schemas import Session
+
+    ring = GenomadRing.from_genomad_output(
+        file=genomad_output, prediction_classes=list(GenomadPredictionClass)
+    )
+    assert isinstance(ring.data, SegmentTable)
+
+    data = Session(id="session", date="date", files=[], rings=[ring]).model_dump()
+    assert data["rings"][0]["data"][0] == ring.data[0].model_dump()
+
+    session = Session(**data)
+    assert session.model_dump() == data
+    assert isinstance(session.rings[0].data[0], GenomadSegment)
+
+
+# Tests for segment kinds
+
+
+def test_ring_segments_validated_by_kind():
+    ring = Ring(
+        id="ring",
+        data=[
+            {"kind": "segment", "start": 0, "end": 1, "text": "a"},
+            {"kind": "genomad", "start": 1, "end": 2, "plasmid": 0.9},
+            {"kind": "label", "start": 2, "end": 3, "labelIdentifier": "l"},
+        ],
+    )
+    assert [type(s) for s in ring.data] == [RingSegment, GenomadSegment, LabelSegment]
+    assert Ring(**ring.model_dump()) == ring
+
+
+def test_ring_segments_legacy_kind():
+    legacy = [
+        {"start": 0, "end": 1, "text": "a"},
+        {"start": 1, "end": 2, "text": "b", "plasmid": None},
+        {"start": 2, "end": 3, "text": "c", "labelIdentifier": "l", "textSize": None},
+    ]
+    ring = Ring(id="ring", data=legacy)
+    assert [s.kind for s in ring.data] == [
+        RingSegmentType.SEGMENT,
+        RingSegmentType.GENOMAD,
+        RingSegmentType.LABEL,
+    ]
+    assert "kind" not in legacy[0]
+
+
+# Tests for the segment interval index
+
+
+def test_segment_index_matches_scan():
+    rng = numpy.random.default_rng(42)
+    start = rng.integers(0, 100_000, size=2000)
+    end = start + rng.integers(-5000, 5000, size=2000)  # includes reversed segments
+    index = SegmentIndex(start=start, end=end)
+
+    lower, upper = numpy.minimum(start, end), numpy.maximum(start, end)
+    for window_start, window_end in [(0, 1), (500, 5000), (99_000, 200_000), (7, 7)]:
+        expected = numpy.flatnonzero((lower < window_end) & (upper >= window_start))
+        result = index.query(start=window_start, end=window_end)
+        assert sorted(result.tolist()) == expected.tolist()
+        assert numpy.all(numpy.diff(lower[result]) >= 0)  # ordered by segment start
+
+
+def test_segment_index_sorted_segments():
+    rng = numpy.random.default_rng(7)
+    start = numpy.sort(rng.integers(0, 10_000, size=500))
+    end = start + rng.integers(1, 500, size=500)
+
+    # Sorted segments are indexed in their order without sorting
+    index = SegmentIndex(start=start, end=end)
+    assert index.order.tolist() == list(range(500))
+    expected = numpy.flatnonzero((start < 2000) & (end >= 1000))
+    assert index.query(start=1000, end=2000).tolist() == expected.tolist()
+
+
+def test_segment_index_from_segments():
+    segments = [{"start": 30, "end": 40}, {"start": 0, "end": 10}]
+    assert SegmentIndex.from_segments(segments).query(start=10, end=31).tolist() == [
+        1,
+        0,
+    ]
+    assert SegmentIndex.from_segments([]).query(start=0, end=10).tolist() == []
+
+
+def test_blast_ring_segments_sorted(blastn_output):
+    ring = BlastRing.from_blast_output(file=blastn_output)
+    lower = numpy.minimum(ring.data.start, ring.data.end)
+    assert numpy.all(numpy.diff(lower) >= 0)
+
+
+@pytest.mark.parametrize("columns", [None, BLASTN_SEGMENT_COLUMNS])
+def test_blastn_hits_save_load(tmp_path: Path, blastn_output, columns):
+    hits = read_blastn_output(file_path=blastn_output, columns=columns)
+    save_blastn_hits(hits=hits, file_path=tmp_path / "hits.npz")
+    pandas.testing.assert_frame_equal(load_blastn_hits(tmp_path / "hits.npz"), hits)
+
+
+def test_blast_ring_from_cached_hits(tmp_path: Path, blastn_output):
+    save_blastn_hits(
+        hits=read_blastn_output(
+            file_path=blastn_output, columns=BLASTN_SEGMENT_COLUMNS
+        ),
+        file_path=tmp_path / "hits.npz",
+    )
+    reference = RingReference(sequence=RingReferenceSequence(id="chr1", length=6000))
+
+    for filters in [
+        {},
+        {"min_identity": 80, "min_evalue": 1},
+        {"min_alignment": 1000},
+    ]:
+        expected = BlastRing.from_blast_output(
+            file=blastn_output, reference=reference, **filters
+        )
+        ring = BlastRing.from_blast_hits(
+            hits=load_blastn_hits(tmp_path / "hits.npz"),
+            reference=reference,
+            **filters,
+        )
+        assert ring.model_dump()["data"] == expected.model_dump()["data"]
+
+
+def test_demultiplex_blastn_hits(tmp_path: Path):
+    multiplexed_output = tmp_path / "multiplexed.tsv"
+    multiplexed_output.write_text(
+        "".join(
+            f"Q{0 if line.startswith('query_1') else 2}_{line}\n"
+            for line in BLASTN_LINES
+        )
+    )
+
+    hits = demultiplex_blastn_hits(
+        hits=read_blastn_output(file_path=multiplexed_output), queries=3
+    )
+
+    assert len(hits) == 3
+    assert hits[1].empty
+    for query_hits, query_id in zip([hits[0], hits[2]], ["query_1", "query_2"]):
+        query_output = tmp_path / f"{query_id}.tsv"
+        query_output.write_text(
+            "".join(f"{line}\n" for line in BLASTN_LINES if line.startswith(query_id))
+        )
+        pandas.testing.assert_frame_equal(
+            query_hits, read_blastn_output(file_path=query_output)
+        )
+
+    with pytest.raises(ValueError, match="missing the multiplex prefix"):
+        demultiplex_blastn_hits(
+            hits=read_blastn_output(file_path=tmp_path / "query_1.tsv"), queries=1
+        )
+
+
+def test_unchunk_blastn_hits(tmp_path: Path):
+    # Query chr1 sliced into chr1__0..1000 and chr1__800..1800
+    chunked_output = tmp_path / "chunked.tsv"
+    chunked_output.write_text(
+        "".join(
+            f"{line}\n"
+            for line in [
+                # HSP within a slice
+                "chr1__0..1000\tref\t99.0\t201\t0\t0\t100\t300\t5100\t5300\t0\t1",
+                # HSP truncated at the end and start of the slices
+                "chr1__0..1000\tref\t98.0\t101\t0\t0\t900\t1000\t5900\t6000\t0\t1",
+                "chr1__800..1800\tref\t98.0\t201\t0\t0\t100\t300\t5900\t6100\t0\t1",
+                # HSP in the overlap of the slices
+                "chr1__0..1000\tref\t97.0\t101\t0\t0\t850\t950\t200\t300\t0\t1",
+                "chr1__800..1800\tref\t97.0\t101\t0\t0\t50\t150\t200\t300\t0\t1",
+                # HSP of the same query region on another subject region
+                "chr1__800..1800\tref\t90.0\t201\t0\t0\t100\t300\t9000\t9200\t0\t1",
+                # HSP on the minus strand truncated at the end of a slice
+                "chr1__0..1000\tref\t99.0\t51\t0\t0\t950\t1000\t800\t750\t0\t1",
+                "chr1__800..1800\tref\t99.0\t101\t0\t0\t150\t250\t800\t700\t0\t1",
+                "chr2__0..500\tref\t99.0\t400\t0\t0\t1\t400\t1\t400\t0\t1",
+            ]
+        )
+    )
+
+    hits = unchunk_blastn_hits(
+        read_blastn_output(file_path=chunked_output, columns=BLASTN_CHUNK_COLUMNS)
+    )
+
+    assert list(hits.columns) == BLASTN_CHUNK_COLUMNS
+    assert sorted(
+        zip(
+            hits.query_id,
+            hits.query_start,
+            hits.query_end,
+            hits.subject_start,
+            hits.subject_end,
+        )
+    ) == [
+        ("chr1", 100, 300, 5100, 5300),
+        ("chr1", 850, 950, 200, 300),
+        ("chr1", 900, 1100, 5900, 6100),
+        ("chr1", 900, 1100, 9000, 9200),
+        ("chr1", 950, 1050, 800, 700),
+        ("chr2", 1, 400, 1, 400),
+    ]
+
+
+# Tests for zoom level summaries
+
+
+def test_zoom_pyramid_matches_per_base_summary():
+    rng = numpy.random.default_rng(7)
+    length = 5000
+    start = rng.integers(0, length, size=200)
+    end = numpy.clip(start + rng.integers(-200, 200, size=200), 0, length - 1)
+    score = rng.uniform(50, 100, size=200)
+    score[::5] = numpy.nan
+
+    pyramid = ZoomPyramid.from_segments(
+        start=start, end=end, length=length, score=score, base_bin_size=16, min_bins=4
+    )
+    assert pyramid.bin_sizes == [16, 64, 256, 1024, 4096]
+
+    lower, upper = numpy.minimum(start, end), numpy.maximum(start, end)
+    depth, scored, weighted = numpy.zeros((3, length))
+    for a, b, w in zip(lower, upper, score):
+        depth[a : b + 1] += 1
+        if not numpy.isnan(w):
+            scored[a : b + 1] += 1
+            weighted[a : b + 1] += w
+
+    level = 1
+    for i in range(len(pyramid.count[level])):
+        a, b = i * 64, min((i + 1) * 64, length)
+        assert pyramid.count[level][i] == numpy.sum((lower < b) & (upper >= a))
+        assert pyramid.coverage[level][i] == pytest.approx(depth[a:b].mean(), abs=1e-4)
+        if scored[a:b].sum():
+            expected = weighted[a:b].sum() / scored[a:b].sum()
+            assert pyramid.score[level][i] == pytest.approx(expected, rel=1e-4)
+        else:
+            assert numpy.isnan(pyramid.score[level][i])
+
+    assert pyramid.select_level(bases_per_pixel=300) == 2
+    assert pyramid.select_level(bases_per_pixel=1) == 0
+
+
+def test_zoom_pyramid_save_load(tmp_path: Path, blastn_output):
+    ring = BlastRing.from_blast_output(file=blastn_output, min_evalue=1)
+    assert get_segment_scores(ring).tolist() == [100.0, 99.5, 85.25, 72.0]
+
+    pyramid = ZoomPyramid.from_ring(ring)
+    pyramid.save(path=tmp_path / "ring.zoom.npz")
+    loaded = ZoomPyramid.load(path=tmp_path / "ring.zoom.npz")
+    assert loaded.length == pyramid.length == 5081
+    assert loaded.bin_sizes == pyramid.bin_sizes
+    assert all(numpy.array_equal(a, b) for a, b in zip(loaded.count, pyramid.count))
+
+
+# Tests for rings from GenBank files
+
+GENBANK_FEATURES = """LOCUS       chr1                     100 bp    DNA     linear   UNK 01-JAN-1980
+FEATURES             Location/Qualifiers
+     CDS             complement(40..90)
+                     /gene="geneB"
+                     /product="<b>bold</b> protein"
+     CDS             <1..30
+                     /gene="geneA"
+ORIGIN
+        1 acgtacgtac gtacgtacgt acgtacgtac gtacgtacgt acgtacgtac gtacgtacgt
+//
+"""
+
+
+def test_rings_from_genbank_file(tmp_path: Path):
+    file_path = tmp_path / "record.gbk"
+    file_path.write_text(GENBANK_FEATURES)
+
+    ring = AnnotationRing.from_genbank_file(file=file_path, features=["CDS"])
+    assert ring.data.to_records() == [
+        {"kind": "segment", "start": 0, "end": 30, "text": "CDS geneA"},
+        {
+            "kind": "segment",
+            "start": 39,
+            "end": 90,
+            "text": "CDS geneB &lt;b&gt;bold&lt;/b&gt; protein",
+        },
+    ]
+
+    label_ring = LabelRing.from_genbank_file(file=file_path, features=["CDS"])
+    assert [type(s) for s in label_ring.data] == [LabelSegment, LabelSegment]
+    assert [s.text for s in label_ring.data] == [
+        s["text"] for s in ring.data.to_records()
+    ]
@@ -7,6 +7,21 @@ from brick.utils import sanitize_for_mongodb
 from brick.utils import sanitize_svg_content
 from brick.utils import enough_disk_space
 from brick.utils import DANGEROUS_ATTRS, DANGEROUS_TAGS
+from brick.utils import parse_genbank_location, scan_genbank_features
+from brick.utils import (
+    FastaIndex,
+    get_fasta_index_file,
+    iter_fasta_slices,
+    multiplex_fasta_files,
+    plan_fasta_chunks,
+    scan_fasta_records,
+    slice_fasta_sequences,
+    stream_fasta_slices,
+    summarize_genbank_file,
+    write_fasta_index,
+    write_fasta_sequences,
+    write_fasta_slices,
+)
 
 # Tests for `enough_space`
 
@@ -185,3 +200,408 @@ def test_sanitize_svg_content_valid_attributes():
 #     sanitized = sanitize_for_mongodb(input_string)
 #     assert "\uFF04set" in sanitized
 #     assert "\uFF04end" in sanitized
+
+
+# Tests for the GenBank feature scanner
+
+GENBANK_RECORD = """LOCUS       contig_1                 120 bp    DNA     linear   UNK 01-JAN-1980
+DEFINITION  Test record.
+ACCESSION   contig_1
+VERSION     contig_1
+KEYWORDS    .
+SOURCE      .
+  ORGANISM  .
+            .
+FEATURES             Location/Qualifiers
+     source          1..120
+                     /mol_type="genomic DNA"
+     gene            <1..>30
+                     /gene="dnaA"
+     CDS             complement(join(5..10,
+                     20..40))
+                     /gene="dnaB"
+                     /product="replicative DNA helicase with a ""quoted"" name
+                     /slash in the product"
+                     /translation="MKLV
+                     AAAL"
+     CDS             join(complement(50..60),complement(45..48))
+                     /pseudo
+                     /product=unquoted
+                     continuation
+
+     tRNA            70^71
+                     /product="tRNA-Ala"
+     rRNA            (75.78)..(90.95)
+     misc_feature    100
+                     /note="not returned"
+ORIGIN
+        1 acgtacgtac gtacgtacgt acgtacgtac gtacgtacgt acgtacgtac gtacgtacgt
+       61 acgtacgtac gtacgtacgt acgtacgtac gtacgtacgt acgtacgtac gtacgtacgt
+//
+"""
+
+
+@pytest.fixture
+def genbank_file(tmp_path: Path) -> Path:
+    file_path = tmp_path / "record.gbk"
+    file_path.write_text(
+        GENBANK_RECORD + GENBANK_RECORD.replace("contig_1", "contig_2")
+    )
+    return file_path
+
+
+@pytest.mark.parametrize(
+    "location, expected",
+    [
+        ("1..100", (0, 100)),
+        ("<1..>100", (0, 100)),
+        ("complement(5..10)", (4, 10)),
+        ("complement(join(490883..490885,1..879))", (0, 490885)),
+        ("order(1..5,20..30)", (0, 30)),
+        ("42", (41, 42)),
+        ("123^124", (123, 123)),
+        ("(1.5)..(150.160)", (0, 160)),
+        ("join(1..5,J00194.1:100..202)", (0, 202)),
+    ],
+)
+def test_parse_genbank_location(location, expected):
+    from Bio.SeqFeature import Location
+
+    biopython = Location.fromstring(location, 1000)
+    assert parse_genbank_location(location) == expected
+    assert expected == (int(biopython.start), int(biopython.end))
+
+
+def test_scan_genbank_features_matches_biopython(genbank_file: Path):
+    from Bio import SeqIO
+
+    feature_types = ["gene", "CDS", "tRNA", "rRNA"]
+    expected = [
+        (
+            feature.type,
+            int(feature.location.start),
+            int(feature.location.end),
+            {
+                key: feature.qualifiers[key][0]
+                for key in ("gene", "product")
+                if key in feature.qualifiers
+            },
+        )
+        for record in SeqIO.parse(genbank_file, "genbank")
+        for feature in record.features
+        if feature.type in feature_types
+    ]
+
+    features = list(scan_genbank_features(genbank_file, feature_types=feature_types))
+    assert features == expected
+    assert len(features) == 10
+    assert features[1][3]["product"] == (
+        'replicative DNA helicase with a "quoted" name /slash in the product'
+    )
+    assert features[2][3]["product"] == "unquoted continuation"
+
+
+def test_summarize_genbank_file_matches_biopython(genbank_file: Path):
+    from Bio import SeqIO
+
+    records = list(SeqIO.parse(genbank_file, "genbank"))
+    sequences, features, qualifiers = summarize_genbank_file(genbank_file)
+
+    assert sequences == [(r.id, len(r.seq)) for r in records]
+    assert features == {f.type for r in records for f in r.features}
+    assert qualifiers == {q for r in records for f in r.features for q in f.qualifiers}
+    assert not any(q.startswith("slash") for q in qualifiers)  # within quoted value
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "not a genbank file\n",
+        GENBANK_RECORD.replace("//\n", ""),
+        GENBANK_RECORD.split("ORIGIN")[0] + "//\n",
+    ],
+)
+def test_summarize_genbank_file_invalid(tmp_path: Path, text: str):
+    file_path = tmp_path / "invalid.gbk"
+    file_path.write_text(text)
+
+    if not text:
+        assert summarize_genbank_file(file_path) == ([], set(), set())
+    else:
+        with pytest.raises(ValueError):
+            summarize_genbank_file(file_path)
+
+
+# Tests for the FASTA record scanner
+
+FASTA_RECORDS = (
+    "text before the first record\n"
+    ">seq1 description > with sign\r\n"
+    "ACGTNacgtn\r\n"
+    "RYSWKM BDHV\t\n"
+    ">seq2\n"
+    "ACGT-ACGT\n"
+    ">\n"
+    ">seq3\n"
+    "AC\tGT\n"
+    ">seq4\n"
+    "ACGTACGTACGTACGT"
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1024])
+def test_scan_fasta_records_matches_biopython(tmp_path: Path, chunk_size: int):
+    from Bio import SeqIO
+
+    file_path = tmp_path / "records.fasta"
+    file_path.write_bytes(FASTA_RECORDS.encode())
+
+    valid = set("ACGTURYSWKMBDHVN")
+    expected = [
+        (r.id, len(r.seq), all(n in valid for n in str(r.seq).upper()))
+        for r in SeqIO.parse(file_path, "fasta")
+    ]
+
+    records = [
+        record[:3] for record in scan_fasta_records(file_path, chunk_size=chunk_size)
+    ]
+    assert records == expected
+    assert records == [
+        ("seq1", 20, True),
+        ("seq2", 9, False),
+        ("", 0, True),
+        ("seq3", 5, False),
+        ("seq4", 16, True),
+    ]
+
+
+# Tests for the FASTA index
+
+WRAPPED_FASTA_RECORDS = (
+    ">chr1 wrapped at four bases\n"
+    "ACGT\nNNAC\nGT\n"
+    ">chr2 windows line endings\r\n"
+    "AAAC\r\nCCGG\r\n"
+    ">empty\n"
+    ">chr3 without final line feed\n"
+    "ACGTA\nCG"
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1024])
+def test_scan_fasta_records_index_fields(tmp_path: Path, chunk_size: int):
+    file_path = tmp_path / "records.fasta"
+    file_path.write_bytes(WRAPPED_FASTA_RECORDS.encode())
+
+    records = list(scan_fasta_records(file_path, chunk_size=chunk_size))
+    assert [record[3:] for record in records] == [
+        (28, 4, 5),
+        (69, 4, 6),
+        (88, 0, 0),
+        (118, 5, 6),
+    ]
+    assert write_fasta_index(file_path, records).read_text() == (
+        "chr1\t10\t28\t4\t5\n"
+        "chr2\t8\t69\t4\t6\n"
+        "empty\t0\t88\t0\t0\n"
+        "chr3\t7\t118\t5\t6\n"
+    )
+
+
+def test_fasta_index_fetch_matches_biopython(tmp_path: Path):
+    from Bio import SeqIO
+
+    file_path = tmp_path / "records.fasta"
+    file_path.write_bytes(WRAPPED_FASTA_RECORDS.encode())
+    write_fasta_index(file_path, list(scan_fasta_records(file_path)))
+
+    with FastaIndex(file_path) as fasta:
+        for record in SeqIO.parse(file_path, "fasta"):
+            sequence = str(record.seq)
+            assert fasta.length(record.id) == len(sequence)
+            assert fasta.fetch(record.id) == sequence
+            for start in range(len(sequence) + 1):
+                for end in range(start, len(sequence) + 2):
+                    assert fasta.fetch(record.id, start, end) == sequence[start:end]
+
+
+@pytest.mark.parametrize(
+    "records",
+    [
+        ">seq1\nACG\nACGT\n",  # longer line after a shorter line
+        ">seq1\nACGT\n\nACGT\n",  # empty line within the sequence
+        ">seq1\nAC GT\n",  # spaces are removed from sequences
+        ">seq1\nACGT\n>seq1\nACGT\n",  # duplicate identifiers
+    ],
+)
+def test_write_fasta_index_irregular(tmp_path: Path, records: str):
+    file_path = tmp_path / "records.fasta"
+    file_path.write_text(records)
+
+    assert write_fasta_index(file_path, list(scan_fasta_records(file_path))) is None
+    assert not get_fasta_index_file(file_path).exists()
+
+
+def test_slice_fasta_sequences_with_index(tmp_path: Path):
+    file_path = tmp_path / "records.fasta"
+    file_path.write_bytes(WRAPPED_FASTA_RECORDS.encode())
+
+    def sliced(outfile: Path):
+        slices = slice_fasta_sequences(
+            file_path, slice_size=3, sequence_subset=["chr3", "chr1"], outfile=outfile
+        )
+        return {
+            seq_id: [(record.id, str(record.seq)) for record in records]
+            for seq_id, records in slices.items()
+        }
+
+    expected = sliced(tmp_path / "parsed.fasta")
+
+    write_fasta_index(file_path, list(scan_fasta_records(file_path)))
+    assert FastaIndex.available(file_path)
+    assert sliced(tmp_path / "indexed.fasta") == expected
+    assert (tmp_path / "indexed.fasta").read_bytes() == (
+        tmp_path / "parsed.fasta"
+    ).read_bytes()
+    assert expected["chr1"] == [
+        ("chr1__0..3", "ACG"),
+        ("chr1__3..6", "TNN"),
+        ("chr1__6..9", "ACG"),
+        ("chr1__9..12", "T"),
+    ]
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+@pytest.mark.parametrize("sequence_subset", [None, ["chr3", "chr1"]])
+def test_stream_fasta_slices(tmp_path: Path, indexed: bool, sequence_subset: list):
+    from Bio import SeqIO
+
+    file_path = tmp_path / "records.fasta"
+    file_path.write_bytes(WRAPPED_FASTA_RECORDS.encode())
+    if indexed:
+        write_fasta_index(file_path, list(scan_fasta_records(file_path)))
+
+    # Single line records of the slices of the parsed sequences
+    expected = "".join(
+        f">{record.id}__{i}..{i + 3} Slice {i}-{i + 3} of {record.id}\n"
+        f"{record.seq[i : i + 3]}\n"
+        for record in SeqIO.parse(file_path, "fasta")
+        if not sequence_subset or record.id in sequence_subset
+        for i in range(0, len(record), 3)
+    )
+
+    outfile = tmp_path / "sliced.fasta"
+    slices = stream_fasta_slices(
+        file_path, outfile, slice_size=3, sequence_subset=sequence_subset
+    )
+    assert outfile.read_text() == expected
+    assert slices["chr1"] == 4 and "empty" not in slices
+
+    slice_fasta_sequences(
+        file_path,
+        slice_size=3,
+        sequence_subset=sequence_subset,
+        outfile=tmp_path / "collected.fasta",
+    )
+    assert (tmp_path / "collected.fasta").read_bytes() == outfile.read_bytes()
+
+
+def test_iter_fasta_slices_region(tmp_path: Path):
+    file_path = tmp_path / "records.fasta"
+    file_path.write_bytes(WRAPPED_FASTA_RECORDS.encode())
+
+    slices = iter_fasta_slices(file_path, slice_size=3, region=(3, 9))
+    assert [(s.id, bytes(s.bases)) for s in slices if s.seq_id != "chr2"] == [
+        ("chr1__3..6", b"TNN"),
+        ("chr1__6..9", b"ACG"),
+        ("chr3__3..6", b"TAC"),
+        ("chr3__6..9", b"G"),
+    ]
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_write_fasta_sequences(tmp_path: Path, indexed: bool):
+    from Bio import SeqIO
+
+    file_path = tmp_path / "records.fasta"
+    file_path.write_bytes(WRAPPED_FASTA_RECORDS.encode())
+    if indexed:
+        write_fasta_index(file_path, list(scan_fasta_records(file_path)))
+
+    outfile = tmp_path / "subset.fasta"
+    lengths = write_fasta_sequences(
+        file_path, sequence_ids=["chr3", "chr1"], outfile=outfile, line_width=4
+    )
+
+    assert lengths == {"chr1": 10, "chr3": 7}
+    assert outfile.read_text() == ">chr1\nACGT\nNNAC\nGT\n>chr3\nACGT\nACG\n"
+    assert [(r.id, str(r.seq)) for r in SeqIO.parse(outfile, "fasta")] == [
+        ("chr1", "ACGTNNACGT"),
+        ("chr3", "ACGTACG"),
+    ]
+
+    with pytest.raises(ValueError, match="Sequences not found in FASTA file: chr4"):
+        write_fasta_sequences(file_path, sequence_ids=["chr1", "chr4"], outfile=outfile)
+
+
+def test_multiplex_fasta_files(tmp_path: Path):
+    from Bio import SeqIO
+
+    fasta_files = [tmp_path / "genome1.fasta", tmp_path / "genome2.fasta"]
+    fasta_files[0].write_text("comment\n>chr1 description\nACGT\nAC\n>plasmid\nGG")
+    fasta_files[1].write_text(">chr1\nTTTT\n")
+
+    outfile = tmp_path / "multiplexed.fasta"
+    multiplex_fasta_files(fasta_files, outfile=outfile)
+
+    assert [(r.id, str(r.seq)) for r in SeqIO.parse(outfile, "fasta")] == [
+        ("Q0_chr1", "ACGTAC"),
+        ("Q0_plasmid", "GG"),
+        ("Q1_chr1", "TTTT"),
+    ]
+
+
+def test_plan_fasta_chunks():
+    chunks = plan_fasta_chunks(
+        {"chr1": 10, "empty": 0, "plasmid1": 3, "plasmid2": 2}, chunk_size=4, overlap=1
+    )
+
+    assert chunks == [
+        [("chr1", 0, 4)],
+        [("chr1", 3, 7)],
+        [("chr1", 6, 10)],
+        [("plasmid1", 0, 3)],
+        [("plasmid2", 0, 2)],
+    ]
+    assert plan_fasta_chunks({"chr1": 10, "plasmid1": 3}, chunk_size=13) == [
+        [("chr1", 0, 10), ("plasmid1", 0, 3)]
+    ]
+
+    with pytest.raises(ValueError, match="overlap must be smaller"):
+        plan_fasta_chunks({"chr1": 10}, chunk_size=4, overlap=4)
+
+
+def test_write_fasta_slices(tmp_path: Path):
+    from Bio import SeqIO
+
+    file_path = tmp_path / "records.fasta"
+    file_path.write_bytes(WRAPPED_FASTA_RECORDS.encode())
+    write_fasta_index(file_path, list(scan_fasta_records(file_path)))
+
+    outfile = tmp_path / "slices.fasta"
+    write_fasta_slices(
+        file_path,
+        slices=plan_fasta_chunks({"chr1": 10, "chr3": 7}, chunk_size=6, overlap=2)[1],
+        outfile=outfile,
+        line_width=3,
+    )
+
+    assert outfile.read_text() == ">chr1__4..10\nNNA\nCGT\n"
+    write_fasta_slices(
+        file_path, slices=[("chr3", 0, 7), ("chr1", 8, 12)], outfile=outfile
+    )
+    assert [(r.id, str(r.seq)) for r in SeqIO.parse(outfile, "fasta")] == [
+        ("chr3__0..7", "ACGTACG"),
+        ("chr1__8..12", "GT"),
+    ]